@@ -0,0 +1,238 @@
+# Ad-hoc questions over the pipeline output with DuckDB (embedded, columnar)
+# The Parquet output is queried in place (or the JSON/NDJSON when there is no current
+# Parquet), so recurring investigations are one SQL query instead of a throwaway loop.
+# With --desde/--hasta only the month partitions of the period are read (data/movimientos/).
+#
+#   python analytics.py list
+#   python analytics.py top_comercios --desde 2026-01-01 --limit 20
+#   python analytics.py categoria_mes --categoria Restaurantes
+#   python analytics.py sql "select banco, count(*) from movimientos group by 1"
+
+import json
+import os
+import sys
+
+from movimientos_io import (
+    is_ndjson, load_partition_index, parquet_path_for, partition_file, partition_root_for, select_partitions,
+)
+from rollups import rollup_path_for
+from tipo_flags import EXPENSE_TIPOS, FLAG_FIELDS, INCOME_TIPOS, MENTION_FIELDS
+from upload_to_supabase import JSON_FILE
+
+try:
+    import duckdb
+except ImportError:  # Only needed for this module (pip install duckdb)
+    duckdb = None
+
+COLUMNS = {
+    'banco': 'VARCHAR', 'tipo': 'VARCHAR', 'valor': 'DOUBLE', 'fecha': 'DATE',
+    'producto': 'VARCHAR', 'numero_producto': 'VARCHAR', 'detalle': 'VARCHAR', 'categoria': 'VARCHAR',
+    # Flags computed at ingest (see tipo_flags.py)
+    'is_expense': 'BOOLEAN', 'is_income': 'BOOLEAN', 'is_cc_payment': 'BOOLEAN', 'is_interest': 'BOOLEAN',
+    'tipo_class': 'VARCHAR',
+}
+DEFAULT_LIMIT = 20
+
+
+# Every query gets the same filters; unused ones are passed as NULL
+FILTERS = """
+    ($desde::date is null or fecha >= $desde::date)
+    and ($hasta::date is null or fecha <= $hasta::date)
+    and ($categoria::varchar is null or categoria = $categoria::varchar)
+"""
+
+QUERIES = {
+    "top_comercios": ("Comercios con más gasto", f"""
+        select detalle, count(*) as movimientos, round(sum(abs(valor)), 2) as total
+        from movimientos
+        where tipo_class = 'gasto' and {FILTERS}
+        group by detalle
+        order by total desc
+        limit $limit"""),
+    "abonos": ("Abonos a tarjeta vs. intereses", f"""
+        select case when is_interest then 'interes' else 'abono_tc' end as clase,
+               count(*) as movimientos, round(sum(abs(valor)), 2) as total
+        from movimientos
+        where (is_cc_payment or is_interest) and {FILTERS}
+        group by clase
+        order by clase"""),
+    "abonos_detalle": ("Mayores contribuyentes a 'Abono TC'", f"""
+        select tipo, categoria, detalle, count(*) as movimientos, round(sum(abs(valor)), 2) as total
+        from movimientos
+        where tipo_class = 'abono_tc' and {FILTERS}
+        group by all
+        order by total desc
+        limit $limit"""),
+    "otros": ("Comercios sin clasificar (categoría Otros) por frecuencia", f"""
+        select detalle, count(*) as movimientos, round(sum(abs(valor)), 2) as total
+        from movimientos
+        where coalesce(categoria, 'Otros') = 'Otros' and {FILTERS}
+        group by detalle
+        order by movimientos desc, total desc
+        limit $limit"""),
+    "categoria_mes": ("Gasto por mes y categoría", f"""
+        select strftime(fecha, '%Y-%m') as mes, categoria, count(*) as movimientos,
+               round(sum(abs(valor)), 2) as total
+        from movimientos
+        where tipo_class = 'gasto' and {FILTERS}
+        group by mes, categoria
+        order by mes, total desc"""),
+    "duplicados": ("Grupos con misma fecha, valor y detalle", f"""
+        select fecha, valor, detalle, categoria, count(*) as copias
+        from movimientos
+        where {FILTERS}
+        group by all
+        having count(*) > 1
+        order by copias desc, fecha
+        limit $limit"""),
+}
+
+
+def _source_sql(json_path, desde=None, hasta=None):
+    """FROM expression for the output: the Parquet sibling when current, else the JSON itself.
+
+    With a period and month partitions on disk, only the partitions of those months are read.
+    """
+    root = partition_root_for(json_path)
+    if desde or hasta:
+        keys = select_partitions(load_partition_index(root), desde=desde, hasta=hasta)
+        if keys:
+            files = ", ".join(f"'{_escape(partition_file(root, k))}'" for k in keys)
+            return f"read_json([{files}], format='newline_delimited', columns={json.dumps(COLUMNS)})"
+    parquet_file = parquet_path_for(json_path)
+    if os.path.exists(parquet_file) and (
+            not os.path.exists(json_path) or os.path.getmtime(parquet_file) >= os.path.getmtime(json_path)):
+        return f"read_parquet('{_escape(parquet_file)}')"
+    if not os.path.exists(json_path):
+        raise FileNotFoundError(f"No se encontró la salida del pipeline: {json_path}")
+    json_format = 'newline_delimited' if is_ndjson(json_path) else 'array'
+    return f"read_json('{_escape(json_path)}', format='{json_format}', columns={json.dumps(COLUMNS)})"
+
+
+def _escape(path):
+    return path.replace("'", "''")
+
+
+def _sql_list(values):
+    return ", ".join(f"'{_escape(v)}'" for v in sorted(values))
+
+
+def _mentions_sql(word):
+    return "(" + " or ".join(f"contains(lower(coalesce({f}, '')), '{word}')" for f in MENTION_FIELDS) + ")"
+
+
+def _derived_flags():
+    """The flags as SQL over tipo/categoria/detalle (same rules as tipo_flags.compute_flags
+    and movimiento_tipo_class in setup_phase2.sql), for outputs written before the flags."""
+    is_expense = f"coalesce(tipo in ({_sql_list(EXPENSE_TIPOS)}), false)"
+    is_interest = _mentions_sql('interes')
+    is_cc_payment = f"(not {is_interest} and {_mentions_sql('abono')})"
+    is_income = f"(coalesce(tipo in ({_sql_list(INCOME_TIPOS)}), false) and not {is_cc_payment})"
+    tipo_class = (f"case when {is_expense} then 'gasto' when {is_cc_payment} then 'abono_tc'"
+                  f" when {is_income} then 'ingreso' else 'otro' end")
+    return {'is_expense': is_expense, 'is_income': is_income, 'is_cc_payment': is_cc_payment,
+            'is_interest': is_interest, 'tipo_class': tipo_class}
+
+
+def _movimientos_view(conn, source):
+    """SELECT of the movimientos view: the stored flags, derived from tipo/categoria/detalle
+    where they are NULL (pre-flag JSON) or missing (pre-flag Parquet)."""
+    columns = [d[0] for d in conn.execute(f"select * from {source} limit 0").description]
+    derived = _derived_flags()
+    select = [f'"{c}"' for c in columns if c not in FLAG_FIELDS]
+    for f in FLAG_FIELDS:
+        select.append(f"coalesce({f}, {derived[f]}) as {f}" if f in columns else f"{derived[f]} as {f}")
+    return f"select {', '.join(select)} from {source}"
+
+
+def connect(json_path=JSON_FILE, database=':memory:', desde=None, hasta=None):
+    """DuckDB connection with the views movimientos (and rollups, when the file exists).
+
+    desde/hasta limit movimientos to the month partitions of the period (whole months).
+    """
+    if duckdb is None:
+        raise ImportError("duckdb is required for analytics (pip install duckdb)")
+    conn = duckdb.connect(database)
+    source = _source_sql(json_path, desde, hasta)
+    conn.execute(f"create or replace view movimientos as {_movimientos_view(conn, source)}")
+    rollups_file = rollup_path_for(json_path)
+    if os.path.exists(rollups_file):
+        conn.execute(f"create or replace view rollups as select * from read_json_auto('{_escape(rollups_file)}')")
+    return conn
+
+
+def run_query(conn, name, desde=None, hasta=None, categoria=None, limit=DEFAULT_LIMIT):
+    """Runs a prebuilt query; returns (column names, rows)."""
+    if name not in QUERIES:
+        raise KeyError(f"Consulta desconocida: {name} (disponibles: {', '.join(QUERIES)})")
+    sql = QUERIES[name][1]
+    params = {"desde": desde, "hasta": hasta, "categoria": categoria}
+    if "$limit" in sql:
+        params["limit"] = limit
+    return _fetch(conn.execute(sql, params))
+
+
+def run_sql(conn, sql):
+    """Runs arbitrary SQL over the views movimientos and rollups."""
+    return _fetch(conn.execute(sql))
+
+
+def _fetch(cursor):
+    if cursor.description is None:
+        return [], []
+    return [d[0] for d in cursor.description], cursor.fetchall()
+
+
+def _format(value):
+    if isinstance(value, float):
+        return f"{value:,.2f}"
+    return "" if value is None else str(value)
+
+
+def print_table(columns, rows):
+    if not columns:
+        return
+    cells = [[_format(v) for v in row] for row in rows]
+    widths = [max([len(c)] + [len(r[i]) for r in cells]) for i, c in enumerate(columns)]
+    print(" | ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    print("-+-".join("-" * w for w in widths))
+    for r in cells:
+        print(" | ".join(v.ljust(w) for v, w in zip(r, widths)))
+    print(f"({len(rows)} filas)")
+
+
+def _option(argv, flag, default=None):
+    if flag in argv and argv.index(flag) + 1 < len(argv):
+        return argv[argv.index(flag) + 1]
+    return default
+
+
+def main(argv):
+    if len(argv) < 2 or argv[1] in ("list", "--help", "-h"):
+        print("Consultas disponibles (python analytics.py <consulta> [--desde AAAA-MM-DD] [--hasta AAAA-MM-DD]"
+              " [--categoria X] [--limit N] [--json ruta] [--as-json]):")
+        for name, (description, _) in QUERIES.items():
+            print(f"   {name:<16} {description}")
+        print('   sql "<SQL>"      Consulta libre sobre las vistas movimientos y rollups')
+        return
+
+    conn = connect(_option(argv, "--json", JSON_FILE), desde=_option(argv, "--desde"), hasta=_option(argv, "--hasta"))
+    if argv[1] == "sql":
+        if len(argv) < 3:
+            print('❌ Falta la consulta: python analytics.py sql "select ..."')
+            return
+        columns, rows = run_sql(conn, argv[2])
+    else:
+        columns, rows = run_query(conn, argv[1],
+                                  desde=_option(argv, "--desde"), hasta=_option(argv, "--hasta"),
+                                  categoria=_option(argv, "--categoria"),
+                                  limit=int(_option(argv, "--limit", DEFAULT_LIMIT)))
+    if "--as-json" in argv:
+        print(json.dumps([dict(zip(columns, r)) for r in rows], ensure_ascii=False, indent=2, default=str))
+    else:
+        print_table(columns, rows)
+    conn.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,280 @@
+# Benchmarks for the pipeline on synthetic, seeded movimientos
+# python benchmark.py                      -> 10k and 100k rows
+# python benchmark.py --full               -> also 1M rows (the Excel file takes a while to generate)
+# python benchmark.py --sizes 5000,20000   -> custom sizes
+# python benchmark.py --compare old.json new.json
+# Results go to .cache/benchmarks/results/<timestamp>-<commit>.json; generated inputs
+# are kept in .cache/benchmarks/data and reused while GENERATOR_VERSION does not change.
+
+import contextlib
+import datetime
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_DIR = os.path.join(REPO_DIR, ".cache", "benchmarks")
+DATA_DIR = os.path.join(BENCH_DIR, "data")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# Pipeline caches (classification, manifest, Excel) live in a scratch dir so every
+# run starts cold and the real .cache is not touched; set before importing the pipeline.
+WORK_DIR = tempfile.mkdtemp(prefix="finanzas_bench_")
+os.environ["FINANZAS_CACHE_DIR"] = os.path.join(WORK_DIR, "cache")
+
+import classification_cache  # noqa: E402
+import excel_reader  # noqa: E402
+import process_data  # noqa: E402
+import pandas as pd  # noqa: E402
+from normalization import parse_amounts  # noqa: E402
+from category_mapping import CATEGORY_MAPPING, get_category_for_merchant  # noqa: E402
+from upload_to_supabase import BulkUploader, make_session  # noqa: E402
+
+DEFAULT_SIZES = (10_000, 100_000)
+FULL_SIZES = (10_000, 100_000, 1_000_000)
+SEED = 2026
+GENERATOR_VERSION = 1  # Bump when the generator changes so cached inputs are rebuilt
+UNKNOWN_SHARE = 0.15   # Merchants that match nothing in CATEGORY_MAPPING
+STUB_LATENCY = 0.005   # Seconds the upload stub waits per request (network round trip)
+
+BANCOS = ("Bancolombia", "Itaú", "Nu", "Davivienda")
+TIPOS = (("Compra", 70), ("Abono", 8), ("Depósito", 8), ("Retiro", 5), ("Pago", 5),
+         ("Transferencia Recibida", 3), ("Cargo", 1))
+PREFIXES = ("", "", "", "COMPRA EN ", "PAGO EN ")
+NOISE_WORDS = ("TIENDA", "COMERCIAL", "SAS", "LTDA", "INVERSIONES", "DISTRIBUIDORA", "CENTRO",
+               "SERVICIOS", "GRUPO", "MINIMERCADO", "PANADERIA", "FERRETERIA", "BOG", "MED")
+
+
+# ---- Synthetic data ------------------------------------------------------
+
+def generate_movimientos(n, seed=SEED, year=2026):
+    """Yields n movimiento dicts (normalized field names), reproducible for a seed."""
+    rng = random.Random(seed)
+    keywords = [k for values in CATEGORY_MAPPING.values() for k in values]
+    tipos, weights = zip(*TIPOS)
+    start = datetime.date(year, 1, 1).toordinal()
+    for _ in range(n):
+        if rng.random() < UNKNOWN_SHARE:
+            detalle = " ".join(rng.choice(NOISE_WORDS) for _ in range(rng.randint(1, 3))) + f" {rng.randint(1, 9999)}"
+        else:
+            detalle = rng.choice(PREFIXES) + rng.choice(keywords)
+            if rng.random() < 0.3:
+                detalle += f" {rng.randint(1, 999):03d}"  # store/terminal suffix
+        yield {
+            "banco": rng.choice(BANCOS),
+            "tipo": rng.choices(tipos, weights)[0],
+            "valor": round(rng.lognormvariate(10.5, 1.2), -2),  # COP, median ~36k
+            "fecha": datetime.date.fromordinal(start + rng.randrange(365)).isoformat(),
+            "detalle": detalle,
+        }
+
+
+def _cop_text(valor, rng):
+    """Amount as the 2025 CSV writes it ('$ 26.200', '1.800,00', occasionally 'N/A')."""
+    if rng.random() < 0.01:
+        return "N/A"
+    whole = f"{int(valor):,}".replace(",", ".")
+    return f"$ {whole}" if rng.random() < 0.7 else f"{whole},00"
+
+
+def write_csv(path, n, seed=SEED):
+    """2025 email export layout (see process_data.iter_2025_csv)."""
+    import csv
+    rng = random.Random(seed + 1)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Banco", "Tipo de transacción", "Valor", "Día de la transacción",
+                         "Producto", "Número producto", "Detalle"])
+        for m in generate_movimientos(n, seed, year=2025):
+            producto, numero = rng.choice((("Tarjeta de Crédito", "*7729"), ("N/A", "N/A"), ("Cuenta de Ahorros", "*2186")))
+            writer.writerow([m["banco"], m["tipo"], _cop_text(m["valor"], rng), f"{m['fecha']} 10:{rng.randint(0, 59):02d}",
+                             producto, numero, m["detalle"]])
+
+
+def write_excel(path, n, seed=SEED):
+    """'Consolidado' sheet of the bank statement workbook (see process_data.frame_to_movimientos)."""
+    from openpyxl import Workbook
+    rng = random.Random(seed + 2)
+    categories = list(CATEGORY_MAPPING)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Consolidado")
+    ws.append(["Fecha", "Tipo", "Valor", "Detalle", "Banco", "Categoria ", "Producto"])
+    for m in generate_movimientos(n, seed, year=2026):
+        # Most rows are left for auto-mapping, some carry a user category
+        categoria = rng.choice(categories) if rng.random() < 0.2 else None
+        valor = m["valor"] if m["tipo"] not in ("Compra", "Retiro", "Pago", "Cargo") else -m["valor"]
+        ws.append([datetime.datetime.fromisoformat(m["fecha"]), m["tipo"], valor, m["detalle"],
+                   m["banco"], categoria, rng.choice(("Tarjeta Crédito", "Cuenta Ahorros"))])
+    wb.save(path)
+
+
+def dataset(n, kind):
+    """Path of the cached synthetic input ('csv' or 'xlsx'), generating it if needed."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f"movimientos_v{GENERATOR_VERSION}_s{SEED}_{n}.{kind}")
+    if not os.path.exists(path):
+        print(f"🧪 Generating {n} rows -> {path}")
+        tmp = f"{path}.tmp.{kind}"
+        (write_csv if kind == "csv" else write_excel)(tmp, n)
+        os.replace(tmp, path)
+    return path
+
+
+# ---- Local upload stub ---------------------------------------------------
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like PostgREST behind Supabase
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(STUB_LATENCY)
+        self.send_response(201)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+@contextlib.contextmanager
+def upload_stub():
+    """Accepts every POST on a local port; yields the base URL."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+# ---- Timing ----------------------------------------------------------------
+
+def cold_start():
+    """Drops every pipeline cache so the next step measures a first run."""
+    classification_cache.reset_classification_cache()
+    shutil.rmtree(classification_cache.CACHE_DIR, ignore_errors=True)
+
+
+def timed(name, rows, func, repeat=1):
+    """Runs func (pipeline output silenced) and returns the best of repeat runs."""
+    best = None
+    for _ in range(repeat):
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    result = {"name": name, "rows": rows, "seconds": round(best, 4),
+              "rows_per_second": round(rows / best) if best else None}
+    print(f"   {name:<32} {rows:>9} rows  {best:8.3f}s  {result['rows_per_second'] or 0:>10,} rows/s")
+    return result
+
+
+def run_size(n):
+    print(f"\n📏 {n:,} rows")
+    csv_path, excel_path = dataset(n, "csv"), dataset(n, "xlsx")
+    process_data.CSV_2025 = csv_path
+    sample = list(generate_movimientos(n))
+    detalles = [m["detalle"] for m in sample]
+    rng = random.Random(SEED)
+    amounts = [_cop_text(m["valor"], rng) for m in sample]
+    results = []
+
+    results.append(timed("get_category_for_merchant", n, lambda: [get_category_for_merchant(d) for d in detalles]))
+    results.append(timed("parse_amounts", n, lambda: parse_amounts(pd.Series(amounts, dtype=object)), repeat=3))
+
+    cold_start()
+    results.append(timed("process_2025_csv (cold)", n, process_data.process_2025_csv))
+    results.append(timed("process_2025_csv (warm cache)", n, process_data.process_2025_csv))
+
+    cold_start()
+    results.append(timed("process_2026_excel (cold)", n, lambda: process_data.process_2026_excel(excel_path)))
+    results.append(timed("process_2026_excel (warm cache)", n, lambda: process_data.process_2026_excel(excel_path)))
+
+    output = os.path.join(WORK_DIR, f"movimientos_{n}.json")
+    excel_dir = os.path.join(WORK_DIR, f"movimientos_{n}")
+    os.makedirs(excel_dir, exist_ok=True)
+    shutil.copy(excel_path, os.path.join(excel_dir, "movimientos_bancos_estandarizados_v1.xlsx"))
+    process_data.MOVIMIENTOS_DIR = excel_dir
+    cold_start()
+    results.append(timed("process_data (cold)", 2 * n, lambda: process_data.process_data(output)))
+    results.append(timed("process_data (no changes)", 2 * n, lambda: process_data.process_data(output)))
+
+    rows = [dict(m, categoria="Otros") for m in sample]
+    with upload_stub() as base_url:
+        uploader = BulkUploader(f"{base_url}/rest/v1/movimientos", session=make_session())
+        results.append(timed("upload (local stub)", n, lambda: uploader.upload(rows)))
+    return results
+
+
+# ---- Reporting -------------------------------------------------------------
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(old_file, new_file):
+    """Prints the change in seconds per benchmark between two result files."""
+    with open(old_file, encoding="utf-8") as f:
+        old = {(r["name"], r["rows"]): r for r in json.load(f)["results"]}
+    with open(new_file, encoding="utf-8") as f:
+        new = json.load(f)["results"]
+    for r in new:
+        before = old.get((r["name"], r["rows"]))
+        if not before:
+            continue
+        change = (r["seconds"] - before["seconds"]) / before["seconds"] * 100 if before["seconds"] else 0.0
+        flag = "🔺" if change > 10 else ("🔻" if change < -10 else "  ")
+        print(f"{flag} {r['name']:<32} {r['rows']:>9}  {before['seconds']:8.3f}s -> {r['seconds']:8.3f}s ({change:+.1f}%)")
+
+
+def main(argv):
+    if "--compare" in argv:
+        i = argv.index("--compare")
+        compare(argv[i + 1], argv[i + 2])
+        return
+    sizes = FULL_SIZES if "--full" in argv else DEFAULT_SIZES
+    if "--sizes" in argv:
+        sizes = tuple(int(s) for s in argv[argv.index("--sizes") + 1].split(","))
+
+    commit = _git_commit()
+    results = []
+    try:
+        for n in sizes:
+            results.extend(run_size(n))
+    finally:
+        classification_cache.reset_classification_cache()
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    report = {
+        "commit": commit,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "seed": SEED,
+        "generator_version": GENERATOR_VERSION,
+        "excel_engine": excel_reader.default_engine(),
+        "results": results,
+    }
+    path = os.path.join(RESULTS_DIR, f"{datetime.datetime.now():%Y%m%d-%H%M%S}-{commit}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Results written to {path}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -303,37 +303,158 @@ CATEGORY_MAPPING = {
     ],
 }
 
+# Fallback keywords, checked only when no merchant in CATEGORY_MAPPING matches
+FALLBACK_PATTERNS = {
+    "Alimentación": ["RESTAURANTE", "CAFÉ", "COFFEE", "PIZZA", "BURGER", "FOOD", "GRILL", "PANADERIA", "PASTEL"],
+    "Transporte": ["EDS ", "PARKING", "PARQUEADERO", "UBER", "DIDI", "AVIANCA", "AIRLINE"],
+    "Salud": ["FARMACIA", "DROGUERIA", "CRUZ VERDE", "FARMATODO", "MEDIC", "DROG"],
+    "Compras": ["HOMECENTER", "FALABELLA", "ALKOSTO", "AMAZON", "MERCADOLIBRE"],
+    "Servicios": ["EPM", "ENEL", "COMCEL", "CLARO", "UNE", "TELECOMUNICA"],
+    "Suscripciones": ["SPOTIFY", "NETFLIX", "PRIME", "MICROSOFT", "GOOGLE"],
+    "Entretenimiento": ["CINE", "TEATRO", "HOTEL", "AIRBNB"],
+}
+
+
+class MerchantClassifier:
+    """Classifier compiled once from CATEGORY_MAPPING and FALLBACK_PATTERNS.
+
+    Every merchant string gets a rank (category order, then list order) and
+    the lowest-ranked match wins, which is the same first-match order the
+    original nested loops used:
+      - merchant in detalle: Aho-Corasick automaton over the detalle text.
+      - detalle in merchant: lookup in an index of every merchant substring.
+      - fallback keyword in detalle: same automaton, ranked after the mapping.
+    """
+
+    def __init__(self, mapping=None, fallback_patterns=None):
+        mapping = CATEGORY_MAPPING if mapping is None else mapping
+        fallback_patterns = FALLBACK_PATTERNS if fallback_patterns is None else fallback_patterns
+        self.mapping = mapping
+        self.fallback_patterns = fallback_patterns
+
+        self._categories = []
+        self._substring_rank = {}
+        patterns = []
+
+        for category, merchants in mapping.items():
+            for m in merchants:
+                rank = len(self._categories)
+                self._categories.append(category)
+                m_upper = m.upper()
+                patterns.append((m_upper, rank))
+                # Index every substring so "detalle in merchant" is a dict lookup
+                for i in range(len(m_upper) + 1):
+                    for j in range(i, len(m_upper) + 1):
+                        self._substring_rank.setdefault(m_upper[i:j], rank)
+
+        for category, keywords in fallback_patterns.items():
+            for kw in keywords:
+                rank = len(self._categories)
+                self._categories.append(category)
+                patterns.append((kw, rank))
+
+        self._build_automaton(patterns)
+
+    def _build_automaton(self, patterns):
+        # Trie: goto[state] = {char: next_state}, out[state] = best rank ending here
+        goto = [{}]
+        out = [None]
+        for text, rank in patterns:
+            state = 0
+            for ch in text:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append(None)
+                state = nxt
+            if out[state] is None or rank < out[state]:
+                out[state] = rank
+
+        # Failure links (BFS), merging the best output rank along the chain
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            for ch, nxt in goto[state].items():
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                inherited = out[fail[nxt]]
+                if inherited is not None and (out[nxt] is None or inherited < out[nxt]):
+                    out[nxt] = inherited
+                queue.append(nxt)
+
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+
+    def _best_contained_rank(self, text):
+        """Lowest rank of any pattern that occurs inside text."""
+        goto, fail, out = self._goto, self._fail, self._out
+        best = None
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            rank = out[state]
+            if rank is not None and (best is None or rank < best):
+                best = rank
+        return best
+
+    def classify(self, merchant_name):
+        """Returns the category for a given merchant name."""
+        if not merchant_name:
+            return "Otros"
+
+        return self.classify_normalized(merchant_name.upper().strip())
+
+    def classify_normalized(self, merchant_upper):
+        """Classifies text that is already upper-cased and stripped."""
+        best = self._best_contained_rank(merchant_upper)
+        reverse = self._substring_rank.get(merchant_upper)
+        if reverse is not None and (best is None or reverse < best):
+            best = reverse
+
+        if best is None:
+            return "Otros"
+        return self._categories[best]
+
+    def classify_many(self, merchant_names):
+        """Classifies an iterable of merchant names, computing each distinct name once."""
+        seen = {}
+        results = []
+        for name in merchant_names:
+            category = seen.get(name)
+            if category is None:
+                category = self.classify(name)
+                seen[name] = category
+            results.append(category)
+        return results
+
+
+_default_classifier = None
+
+
+def get_classifier():
+    """Returns the shared classifier, compiling it on first use."""
+    global _default_classifier
+    if _default_classifier is None:
+        _default_classifier = MerchantClassifier()
+    return _default_classifier
+
+
 # Reverse mapping: merchant -> category
 def get_category_for_merchant(merchant_name):
     """Returns the category for a given merchant name."""
-    if not merchant_name:
-        return "Otros"
-    
-    merchant_upper = merchant_name.upper().strip()
-    merchant_clean = merchant_name.strip()
-    
-    for category, merchants in CATEGORY_MAPPING.items():
-        for m in merchants:
-            if m.upper() in merchant_upper or merchant_upper in m.upper():
-                return category
-    
-    # Fallback patterns
-    patterns = {
-        "Alimentación": ["RESTAURANTE", "CAFÉ", "COFFEE", "PIZZA", "BURGER", "FOOD", "GRILL", "PANADERIA", "PASTEL"],
-        "Transporte": ["EDS ", "PARKING", "PARQUEADERO", "UBER", "DIDI", "AVIANCA", "AIRLINE"],
-        "Salud": ["FARMACIA", "DROGUERIA", "CRUZ VERDE", "FARMATODO", "MEDIC", "DROG"],
-        "Compras": ["HOMECENTER", "FALABELLA", "ALKOSTO", "AMAZON", "MERCADOLIBRE"],
-        "Servicios": ["EPM", "ENEL", "COMCEL", "CLARO", "UNE", "TELECOMUNICA"],
-        "Suscripciones": ["SPOTIFY", "NETFLIX", "PRIME", "MICROSOFT", "GOOGLE"],
-        "Entretenimiento": ["CINE", "TEATRO", "HOTEL", "AIRBNB"],
-    }
-    
-    for category, keywords in patterns.items():
-        for kw in keywords:
-            if kw in merchant_upper:
-                return category
-    
-    return "Otros"
+    return get_classifier().classify(merchant_name)
+
+
+def classify_many(merchant_names):
+    """Returns the categories for an iterable of merchant names."""
+    return get_classifier().classify_many(merchant_names)
 
 
 if __name__ == "__main__":
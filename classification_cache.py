@@ -0,0 +1,195 @@
+# Persistent cache for merchant classification
+# In-process LRU in front of a small SQLite store, keyed by normalized detalle
+# plus a hash of CATEGORY_MAPPING/FALLBACK_PATTERNS (editing the mapping invalidates it).
+
+import hashlib
+import json
+import os
+import sqlite3
+from collections import OrderedDict
+
+from category_mapping import CATEGORY_MAPPING, FALLBACK_PATTERNS, get_classifier
+
+# FINANZAS_CACHE_DIR moves every pipeline cache (benchmark.py points it at a scratch dir)
+CACHE_DIR = os.environ.get("FINANZAS_CACHE_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+CACHE_FILE = os.path.join(CACHE_DIR, "classification_cache.sqlite3")
+LRU_SIZE = 20000
+FLUSH_EVERY = 1000
+SQLITE_BATCH = 500
+
+
+def mapping_version(mapping=None, fallback_patterns=None):
+    """Hash of the mapping + fallback patterns (order matters for first-match)."""
+    mapping = CATEGORY_MAPPING if mapping is None else mapping
+    fallback_patterns = FALLBACK_PATTERNS if fallback_patterns is None else fallback_patterns
+    payload = json.dumps([list(mapping.items()), list(fallback_patterns.items())], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def classifier_version(classifier):
+    """mapping_version of the mapping a MerchantClassifier was compiled from."""
+    return mapping_version(classifier.mapping, classifier.fallback_patterns)
+
+
+def normalize_detalle(merchant_name):
+    """Key used by the cache; classification only depends on the upper/stripped text."""
+    return merchant_name.upper().strip()
+
+
+class ClassificationCache:
+    """Memoizes get_category_for_merchant across runs."""
+
+    def __init__(self, path=CACHE_FILE, max_entries=LRU_SIZE, classifier=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.classifier = classifier or get_classifier()
+        self.version = classifier_version(self.classifier)
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._lru = OrderedDict()
+        self._pending = {}
+        self._conn = None
+
+    # ---- storage -------------------------------------------------------
+    def _connection(self):
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS classifications ("
+                " version TEXT NOT NULL,"
+                " detalle TEXT NOT NULL,"
+                " categoria TEXT NOT NULL,"
+                " PRIMARY KEY (version, detalle))"
+            )
+            # Entries from older mappings can never be hit again
+            self._conn.execute("DELETE FROM classifications WHERE version != ?", (self.version,))
+            self._conn.commit()
+        return self._conn
+
+    def _remember(self, key, category):
+        self._lru[key] = category
+        self._lru.move_to_end(key)
+        if len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def _load_from_disk(self, keys):
+        """Returns {key: categoria} for the keys present on disk."""
+        found = {}
+        conn = self._connection()
+        keys = list(keys)
+        for i in range(0, len(keys), SQLITE_BATCH):
+            chunk = keys[i:i + SQLITE_BATCH]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT detalle, categoria FROM classifications WHERE version = ? AND detalle IN ({placeholders})",
+                [self.version, *chunk],
+            )
+            found.update(rows)
+        return found
+
+    def flush(self):
+        """Writes newly classified merchants to disk."""
+        if not self._pending:
+            return
+        conn = self._connection()
+        conn.executemany(
+            "INSERT OR REPLACE INTO classifications (version, detalle, categoria) VALUES (?, ?, ?)",
+            [(self.version, k, v) for k, v in self._pending.items()],
+        )
+        conn.commit()
+        self._pending.clear()
+
+    def close(self):
+        self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # ---- lookups -------------------------------------------------------
+    def get_category(self, merchant_name):
+        """Cached equivalent of get_category_for_merchant."""
+        if not merchant_name:
+            return "Otros"
+        return self.classify_keys([normalize_detalle(merchant_name)])[0]
+
+    def classify_many(self, merchant_names):
+        """Classifies an iterable of merchant names, hitting disk once per batch."""
+        keys = [normalize_detalle(n) if n else None for n in merchant_names]
+        unique = [k for k in dict.fromkeys(keys) if k is not None]
+        resolved = dict(zip(unique, self.classify_keys(unique)))
+        return [resolved[k] if k is not None else "Otros" for k in keys]
+
+    def classify_keys(self, keys):
+        """Classifies already-normalized keys."""
+        results = {}
+        missing = []
+        for key in keys:
+            if key in results:
+                continue
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                results[key] = self._lru[key]
+                self.memory_hits += 1
+            elif key in self._pending:
+                results[key] = self._pending[key]
+                self.memory_hits += 1
+            else:
+                missing.append(key)
+
+        if missing:
+            on_disk = self._load_from_disk(missing)
+            for key in missing:
+                category = on_disk.get(key)
+                if category is not None:
+                    self.disk_hits += 1
+                else:
+                    category = self.classifier.classify_normalized(key)
+                    self._pending[key] = category
+                    self.misses += 1
+                results[key] = category
+                self._remember(key, category)
+
+        if len(self._pending) >= FLUSH_EVERY:
+            self.flush()
+        return [results[k] for k in keys]
+
+    # ---- stats ---------------------------------------------------------
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "version": self.version,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+    def print_stats(self):
+        s = self.stats()
+        print(f"🧠 Clasificación cache [{s['version']}]: "
+              f"{s['memory_hits']} memoria + {s['disk_hits']} disco hits, "
+              f"{s['misses']} nuevos comercios ({s['hit_rate'] * 100:.1f}% hit rate)")
+
+
+_shared_cache = None
+
+
+def get_classification_cache():
+    """Returns the cache shared by process_data, find_otros_2026 and debug_mapping."""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = ClassificationCache()
+    return _shared_cache
+
+
+def reset_classification_cache():
+    """Closes the shared cache; the next get_classification_cache() starts a fresh one."""
+    global _shared_cache
+    if _shared_cache is not None:
+        _shared_cache.close()
+        _shared_cache = None
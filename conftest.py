@@ -0,0 +1,152 @@
+# Shared pytest fixtures
+# Tests that need Postgres run against TEST_DATABASE_URL (a throwaway database: the
+# movimientos tables are dropped and recreated from the .sql files) and are skipped without it.
+# Pipeline caches go to a scratch dir like benchmark.py does (set before any pipeline import).
+
+import json
+import os
+import tempfile
+import uuid
+
+import pytest
+
+os.environ.setdefault("FINANZAS_CACHE_DIR", tempfile.mkdtemp(prefix="finanzas-tests-"))
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+SCHEMA_FILES = ("supabase_schema.sql", "setup_phase2.sql")
+
+
+@pytest.fixture
+def pg_dsn():
+    """DSN of a database with a fresh movimientos schema."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL not set")
+    psycopg2 = pytest.importorskip("psycopg2")
+    conn = psycopg2.connect(TEST_DATABASE_URL)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("drop table if exists public.movimientos, public.movimientos_rollups, public.family_members"
+                    " cascade")
+        for name in SCHEMA_FILES:
+            with open(os.path.join(os.path.dirname(__file__), name), encoding="utf-8") as f:
+                cur.execute(f.read())
+    conn.close()
+    return TEST_DATABASE_URL
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, data=None, headers=None):
+        self.status_code = status_code
+        self._data = data
+        self.headers = headers or {}
+        self.text = "" if data is None else json.dumps(data)
+
+    def json(self):
+        return self._data
+
+
+def _parse_filter(value):
+    op, _, arg = value.partition(".")
+    if op == "in":
+        return op, arg.strip("()").split(",")
+    return op, arg
+
+
+def _matches(row, column, value):
+    if column == "and":
+        for condition in value.strip("()").split(","):
+            c, _, v = condition.partition(".")
+            if not _matches(row, c, v):
+                return False
+        return True
+    op, arg = _parse_filter(value)
+    x = row.get(column)
+    x = None if x is None else str(x)
+    if op == "is":
+        return x is None if arg == "null" else x is not None
+    if op == "not":
+        return x is not None  # not.is.null
+    if x is None:
+        return False
+    if op == "in":
+        return x in arg
+    return {"eq": x == arg, "gt": x > arg, "gte": x >= arg, "lte": x <= arg, "lt": x < arg}[op]
+
+
+class FakePostgREST:
+    """In-memory stand-in for the PostgREST endpoints the sync uses (a requests.Session lookalike).
+
+    Supports eq/is/gt/gte/lt/lte/in/and filters, select, order, limit, count=exact,
+    on_conflict with ignore-/merge-duplicates and id defaults.
+    """
+
+    KEYS = {"movimientos": "row_hash", "movimientos_rollups": "group_key"}
+
+    def __init__(self):
+        self.tables = {"movimientos": [], "movimientos_rollups": []}
+        self.headers = {}
+        self.requests = []
+
+    def _table(self, url):
+        return url.split("?")[0].rstrip("/").rsplit("/", 1)[1]
+
+    def _filtered(self, table, params):
+        pairs = list(params.items()) if isinstance(params, dict) else list(params or [])
+        options = {k: v for k, v in pairs if k in ("select", "order", "limit", "on_conflict")}
+        rows = [r for r in self.tables[table]
+                if all(_matches(r, k, v) for k, v in pairs if k not in options)]
+        return rows, options
+
+    def get(self, url, params=None, timeout=None, headers=None):
+        table = self._table(url)
+        self.requests.append(("GET", table, params))
+        rows, options = self._filtered(table, params)
+        if "order" in options:
+            column, _, direction = options["order"].partition(".")
+            rows = sorted(rows, key=lambda r: str(r.get(column)), reverse=direction == "desc")
+        if "limit" in options:
+            rows = rows[:int(options["limit"])]
+        if "select" in options and options["select"] != "*":
+            columns = options["select"].split(",")
+            rows = [{c: r.get(c) for c in columns} for r in rows]
+        return FakeResponse(200, [dict(r) for r in rows])
+
+    def head(self, url, params=None, timeout=None, headers=None):
+        table = self._table(url)
+        rows, _ = self._filtered(table, params)
+        return FakeResponse(200, None, {"Content-Range": f"*/{len(rows)}"})
+
+    def delete(self, url, params=None, timeout=None, headers=None):
+        table = self._table(url)
+        self.requests.append(("DELETE", table, params))
+        rows, _ = self._filtered(table, params)
+        gone = {id(r) for r in rows}
+        self.tables[table] = [r for r in self.tables[table] if id(r) not in gone]
+        return FakeResponse(204, None, {"Content-Range": f"*/{len(rows)}"})
+
+    def post(self, url, json=None, params=None, timeout=None, headers=None):
+        table = self._table(url)
+        self.requests.append(("POST", table, len(json)))
+        prefer = (headers or {}).get("Prefer") or self.headers.get("Prefer", "")
+        key = self.KEYS[table]
+        existing = {r.get(key): r for r in self.tables[table] if r.get(key) is not None}
+        for row in json:
+            current = existing.get(row.get(key))
+            if current is None:
+                row = {"id": str(uuid.uuid4()), **row}
+                self.tables[table].append(row)
+                existing[row.get(key)] = row
+            elif "merge-duplicates" in prefer:
+                current.update(row)
+        return FakeResponse(201)
+
+
+@pytest.fixture
+def postgrest(monkeypatch):
+    """FakePostgREST returned by make_session() in delta_sync and delete_supabase."""
+    import delete_supabase
+    import delta_sync
+    fake = FakePostgREST()
+    for module in (delta_sync, delete_supabase):
+        monkeypatch.setattr(module, "make_session", lambda *args, **kwargs: fake)
+    return fake
@@ -10,7 +10,8 @@ create table public.movimientos (
   valor numeric,
   tipo text,
   categoria text,
-  miembro text -- Agregado para soportar filtro por miembro
+  miembro text, -- Agregado para soportar filtro por miembro
+  row_hash text unique -- Hash del contenido para sync incremental (delta_sync.py)
 );
 
 -- 2. Habilitar Seguridad (RLS)
@@ -1,33 +1,27 @@
-import json
 import collections
 
-# Load data
+from movimientos_io import load_movimientos
+from tipo_flags import ensure_flags
+
+# Load data (only the columns this check needs; Parquet is used when available)
+JSON_PATH = 'c:/Users/Amaya/OneDrive/Documentos/Personal/dashboard_finanzas_2025/data/movimientos.json'
+COLUMNS = ['tipo', 'categoria', 'detalle', 'valor']
 try:
-    with open('c:/Users/Amaya/OneDrive/Documentos/Personal/dashboard_finanzas_2025/data/movimientos.json', 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    try:
+        data = load_movimientos(JSON_PATH, columns=COLUMNS + ['is_cc_payment', 'tipo_class'])
+    except ValueError:  # Parquet written before the flags existed
+        data = load_movimientos(JSON_PATH, columns=COLUMNS)
 except Exception as e:
     print(f"Error loading file: {e}")
     exit()
 
 print(f"Total Transactions: {len(data)}")
 
-# Filter logic matching app.js
-abono_payments = []
-abono_total = 0
-
-for t in data:
-    # Safe checks
-    tipo = (t.get('Tipo') or '').lower()
-    cat = (t.get('Categoria') or '').lower()
-    det = (t.get('Detalle') or '').lower()
-    val = float(t.get('Valor') or 0)
-
-    has_abono = 'abono' in tipo or 'abono' in cat or 'abono' in det
-    is_interest = 'interes' in tipo or 'interes' in cat or 'interes' in det
-    
-    if has_abono and not is_interest:
-        abono_payments.append(t)
-        abono_total += abs(val)
+# The is_cc_payment flag the pipeline stored per row (tipo_flags.py);
+# outputs written before the flags get them computed here
+ensure_flags(data)
+abono_payments = [t for t in data if t.get('is_cc_payment')]
+abono_total = sum(abs(float(t.get('valor') or 0)) for t in abono_payments)
 
 print(f"\nTotal Abono Payments (Calculated): ${abono_total:,.2f}")
 print(f"Count: {len(abono_payments)}")
@@ -35,10 +29,9 @@ print(f"Count: {len(abono_payments)}")
 # Group by category/detail to see what's big
 grouped = collections.defaultdict(float)
 for t in abono_payments:
-    key = f"{t.get('Tipo')} - {t.get('Categoria')} - {t.get('Detalle')}"
-    grouped[key] += abs(float(t.get('Valor') or 0))
+    grouped[(t.get('tipo'), t.get('categoria'), t.get('detalle'))] += abs(float(t.get('valor') or 0))
 
 print("\nTop Contributors to 'Abono TC':")
 sorted_groups = sorted(grouped.items(), key=lambda x: x[1], reverse=True)
-for k, v in sorted_groups[:10]:
-    print(f"${v:,.2f} : {k}")
+for (tipo, cat, det), v in sorted_groups[:10]:
+    print(f"${v:,.2f} : {tipo} - {cat} - {det}")
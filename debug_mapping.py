@@ -1,4 +1,4 @@
-from category_mapping import get_category_for_merchant
+from classification_cache import get_classification_cache
 
 test_cases = [
     "Luis Antonio Amaya Salinas",
@@ -12,6 +12,11 @@ test_cases = [
 print(f"{'MERCHANT':<40} | {'CATEGORY':<20}")
 print("-" * 60)
 
+cache = get_classification_cache()
 for merchant in test_cases:
-    cat = get_category_for_merchant(merchant)
+    cat = cache.get_category(merchant)
     print(f"{merchant:<40} | {cat:<20}")
+
+print()
+cache.print_stats()
+cache.close()
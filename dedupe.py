@@ -0,0 +1,135 @@
+# Duplicate and near-duplicate detection for the pipeline
+# Exact duplicates: O(n) with a set of row digests while streaming.
+# Near-duplicates: sort by (valor, fecha) and sweep a ±N day window, no pairwise comparison.
+
+import datetime
+import hashlib
+import re
+
+from row_keys import natural_key
+
+NEAR_DUPLICATE_DAYS = 2
+MERCHANT_SIMILARITY = 0.5   # Token Jaccard for the same movimiento reported by two sources
+REPORT_EXAMPLES = 10
+MAX_WINDOW_SCAN = 200        # Bound on rows compared per row inside one window
+
+_NON_ALNUM = re.compile(r'[^A-Z0-9]+')
+_PREFIXES = ('COMPRA EN ', 'PAGO EN ')
+
+
+def merchant_key(detalle):
+    """Upper-case alphanumeric tokens, without 'COMPRA EN' style prefixes."""
+    text = _NON_ALNUM.sub(' ', (detalle or '').upper()).strip()
+    for prefix in _PREFIXES:
+        if text.startswith(prefix):
+            text = text[len(prefix):]
+    return text
+
+
+def _similar(a, b):
+    if a == b:
+        return True
+    ta, tb = set(a.split()), set(b.split())
+    if not ta or not tb:
+        return False
+    return len(ta & tb) / len(ta | tb) >= MERCHANT_SIMILARITY
+
+
+def _date_ordinal(fecha):
+    try:
+        return datetime.date.fromisoformat(str(fecha)[:10]).toordinal()
+    except ValueError:
+        return None
+
+
+class Deduplicator:
+    """Streaming duplicate detector; call add() per row, then find_near_duplicates()."""
+
+    def __init__(self, window_days=NEAR_DUPLICATE_DAYS, drop_exact=False):
+        self.window_days = window_days
+        self.drop_exact = drop_exact
+        self.exact_duplicates = []   # (row_no of first copy, row_no of the repeat)
+        self.exact_examples = []
+        self._seen = {}
+        self._entries = []           # compact (valor_cents, ordinal, merchant, source, row_no, digest)
+        self._rows_seen = 0
+        self._kept = 0
+
+    def add(self, m, source):
+        """Registers a row; returns True if it should be kept."""
+        key = natural_key(m) + (m.get('tipo') or '',)
+        digest = hashlib.blake2b("\x1f".join(key).encode('utf-8'), digest_size=16).digest()
+        row_no = self._rows_seen
+        self._rows_seen += 1
+
+        first = self._seen.get(digest)
+        if first is not None:
+            self.exact_duplicates.append((first, row_no))
+            if len(self.exact_examples) < REPORT_EXAMPLES:
+                self.exact_examples.append(m)
+            if self.drop_exact:
+                return False
+        else:
+            self._seen[digest] = row_no
+
+        ordinal = _date_ordinal(m.get('fecha'))
+        if ordinal is not None:
+            try:
+                cents = round(float(m.get('valor') or 0) * 100)
+            except (TypeError, ValueError):
+                cents = None
+            if cents is not None:
+                self._entries.append((cents, ordinal, merchant_key(m.get('detalle')), source, self._kept, digest))
+        self._kept += 1
+        return True
+
+    def find_near_duplicates(self):
+        """Pairs (kept_index_a, kept_index_b, reason) of rows that look like the same movimiento.
+
+        Indexes count only the rows add() kept. Reasons: 'same_merchant' (same valor and
+        merchant within ±window_days) or 'cross_source' (same valor, similar merchant,
+        reported by different sources).
+        """
+        entries = sorted(self._entries)
+        pairs = []
+        start = 0
+        for i, (cents, ordinal, merchant, source, row_no, digest) in enumerate(entries):
+            # Slide the window: same valor and no older than window_days
+            while start < i and (entries[start][0] != cents or entries[start][1] < ordinal - self.window_days):
+                start += 1
+            # Pair each row only with its nearest earlier match of each kind, so a
+            # bucket of many equal rows yields a chain of pairs instead of all pairs
+            found = set()
+            for j in range(i - 1, max(start, i - MAX_WINDOW_SCAN) - 1, -1):
+                _, _, other_merchant, other_source, other_row, other_digest = entries[j]
+                if other_digest == digest:
+                    continue  # exact duplicate, already reported
+                if merchant == other_merchant:
+                    reason = 'same_merchant'
+                elif source != other_source and _similar(merchant, other_merchant):
+                    reason = 'cross_source'
+                else:
+                    continue
+                if reason not in found:
+                    found.add(reason)
+                    pairs.append((min(row_no, other_row), max(row_no, other_row), reason))
+                    if len(found) == 2:
+                        break
+        return pairs
+
+    def report(self, near_pairs):
+        """Prints a summary of both kinds of duplicates."""
+        by_reason = {}
+        for _, _, reason in near_pairs:
+            by_reason[reason] = by_reason.get(reason, 0) + 1
+        action = "eliminados" if self.drop_exact else "conservados"
+        print(f"🧹 Duplicados exactos: {len(self.exact_duplicates)} ({action})")
+        for m in self.exact_examples:
+            print(f"   = {m.get('fecha')} | {m.get('valor')} | {m.get('detalle')} | {m.get('banco')}")
+        print(f"🔎 Posibles duplicados (±{self.window_days} días): {len(near_pairs)} "
+              f"({', '.join(f'{r}: {c}' for r, c in sorted(by_reason.items())) or 'ninguno'})")
+        return {
+            "exact": len(self.exact_duplicates),
+            "near": len(near_pairs),
+            "near_by_reason": by_reason,
+        }
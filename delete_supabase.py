@@ -1,39 +1,172 @@
-import requests
+# Scoped deletes of movimientos through the REST API
+# Rows are selected by family_id, miembro, banco/producto (the statement they came from)
+# and a fecha range, and deleted in id-range chunks so no request holds one huge
+# transaction. Responses only carry counts (count=exact, return=minimal). Only the rollups
+# of the (family, month) groups that lost rows are recomputed afterwards.
+#
+#   python delete_supabase.py --mes 2025-03 --banco Itau --dry-run
+#   python delete_supabase.py [--family <id>] [--miembro <nombre>|--sin-miembro] [--banco <b>]
+#                             [--producto <p>] [--desde YYYY-MM-DD] [--hasta YYYY-MM-DD] [--all] [--dry-run]
+#
+# Without --family the scope is the default family, except with --all: then, like the
+# original delete_all, it covers every family ("--all --family <id>" wipes only that one).
 
-SUPABASE_URL = 'https://iikarklhudhsfvkhhyub.supabase.co'
-SUPABASE_KEY = 'sb_publishable_PIdI08dSRTLPVauDLxX6Hg_yMEsxwU-'
+import sys
+import time
 
-def delete_all():
-    print("🗑️ Deleting all records from 'movimientos'...")
-    
-    headers = {
-        'apikey': SUPABASE_KEY,
-        'Authorization': f'Bearer {SUPABASE_KEY}',
-        'Prefer': 'return=representation' # To get count of deleted rows
-    }
-    
-    # Filter to match all records (id is distinct from null)
-    del_url = f"{SUPABASE_URL}/rest/v1/movimientos?id=not.is.null"
-    
+from delta_sync import fetch_remote_keys, forget_synced_partitions, sync_rollups
+from movimientos_io import month_range
+from rollups import MonthlyRollup
+from row_keys import DEFAULT_FAMILY_ID
+from upload_to_supabase import SUPABASE_URL, TABLE_NAME, UploadAborted, make_session
+
+DELETE_CHUNK = 1000  # Rows per DELETE request (one short transaction each)
+
+
+def scope_filters(family_id=DEFAULT_FAMILY_ID, miembro=None, sin_miembro=False, banco=None, producto=None,
+                  desde=None, hasta=None):
+    """PostgREST filters as (param, value) pairs (a list: fecha may appear twice).
+
+    family_id=None matches every family.
+    """
+    filters = [("family_id", f"eq.{family_id}")] if family_id else []
+    if sin_miembro:
+        filters.append(("miembro", "is.null"))  # Pipeline rows, not the ones loaded from the dashboard
+    elif miembro:
+        filters.append(("miembro", f"eq.{miembro}"))
+    if banco:
+        filters.append(("banco", f"eq.{banco}"))
+    if producto:
+        filters.append(("producto", f"eq.{producto}"))
+    if desde:
+        filters.append(("fecha", f"gte.{desde}"))
+    if hasta:
+        filters.append(("fecha", f"lte.{hasta}"))
+    return filters
+
+
+def _content_range_total(response):
+    """Total from a 'Content-Range: 0-99/1234' (or '*/1234') header."""
+    total = response.headers.get('Content-Range', '').rpartition('/')[2]
+    return int(total) if total.isdigit() else 0
+
+
+def count_rows(session, filters):
+    """Rows matching the scope, without transferring them (HEAD + count=exact)."""
+    response = session.head(f"{SUPABASE_URL}/rest/v1/{TABLE_NAME}", params=filters + [("select", "id")],
+                            headers={"Prefer": "count=exact"}, timeout=60)
+    if response.status_code not in (200, 206):
+        raise UploadAborted(f"❌ Error counting rows: {response.status_code} - {response.text[:200]}")
+    return _content_range_total(response)
+
+
+def delete_chunked(session, filters, chunk=DELETE_CHUNK, touched=None):
+    """Deletes the rows of the scope in id ranges of up to chunk rows; returns the rows deleted.
+
+    Each round reads the next chunk ids (keyset by id) and deletes that id range with the
+    scope filters repeated, so rows outside the scope inside the range are never touched.
+    The (family_id, month) of every deleted row is added to touched.
+    """
+    url = f"{SUPABASE_URL}/rest/v1/{TABLE_NAME}"
+    deleted = 0
+    last_id = None
+    while True:
+        page_filters = filters + ([("id", f"gt.{last_id}")] if last_id else [])
+        response = session.get(url, params=page_filters + [("select", "id,family_id,fecha"), ("order", "id.asc"),
+                                                           ("limit", str(chunk))], timeout=60)
+        if response.status_code != 200:
+            raise UploadAborted(f"❌ Error fetching ids: {response.status_code} - {response.text[:200]}")
+        page = response.json()
+        ids = [r['id'] for r in page]
+        if not ids:
+            return deleted
+        response = session.delete(url, params=filters + [("id", f"gte.{ids[0]}"), ("id", f"lte.{ids[-1]}")],
+                                  headers={"Prefer": "return=minimal,count=exact"}, timeout=60)
+        if response.status_code not in (200, 204):
+            raise UploadAborted(f"❌ Error deleting rows: {response.status_code} - {response.text[:200]}")
+        removed = _content_range_total(response)
+        if removed == 0:
+            # Matching rows that can't be deleted: RLS without a delete policy (enable_delete_policy.sql)
+            raise UploadAborted("⚠️ 0 records deleted. Check RLS policies if you expected data to be deleted.")
+        deleted += removed
+        if touched is not None:
+            touched.update((r['family_id'], str(r['fecha'])[:7]) for r in page)
+        print(f"🗑️ {deleted} filas borradas...")
+        if len(ids) < chunk:
+            return deleted
+        last_id = ids[-1]
+
+
+def refresh_rollups(session, touched):
+    """Recomputes the rollups of the (family_id, month) pairs in touched from what is left in
+    the table; only those months are read and only their changed groups are sent."""
+    by_family = {}
+    for family_id, month in touched:
+        by_family.setdefault(family_id, set()).add(month)
+    for family_id, months in sorted(by_family.items()):
+        rollup = MonthlyRollup()
+        for month in sorted(months):
+            first_day, last_day = month_range(month)
+            for r in fetch_remote_keys(session, family_id, desde=first_day, hasta=last_day).values():
+                rollup.add(r)
+        sync_rollups(session, rollup, family_id, months=sorted(months))
+
+
+def delete_scoped(family_id=DEFAULT_FAMILY_ID, miembro=None, sin_miembro=False, banco=None, producto=None,
+                  desde=None, hasta=None, all_rows=False, dry_run=False, chunk=DELETE_CHUNK):
+    """Deletes the family's movimientos in the scope; returns the rows deleted (None on errors).
+
+    family_id=None covers every family. Without any filter besides the family, all_rows has
+    to be set explicitly.
+    """
+    filters = scope_filters(family_id, miembro, sin_miembro, banco, producto, desde, hasta)
+    if not any(k != "family_id" for k, _ in filters) and not all_rows:
+        print("❌ Sin filtros se borraría toda la familia: usa --all para confirmarlo.")
+        return None
+    scope = ", ".join(f"{k}={v}" for k, v in filters) or "todas las familias"
+    session = make_session(1)
+    started = time.perf_counter()
     try:
-        response = requests.delete(del_url, headers=headers)
-        
-        if response.status_code in [200, 204]:
-            data = response.json()
-            # If RLS blocks delete, this might be empty list []
-            if not data and response.headers.get('Content-Range') != '0-0/*':
-                 # If no content returned, we can't be sure 100% without checking count before/after, 
-                 # but usually [] means 0 deleted if representation was requested.
-                 pass
-            print(f"✅ Executed delete request. Rows returned: {len(data)}")
-            if len(data) == 0:
-                print("⚠️ Warning: 0 records deleted. Check RLS policies if you expected data to be deleted.")
-        else:
-            print(f"❌ Error deleting records: {response.status_code}")
-            print(response.text)
-            
-    except Exception as e:
-        print(f"❌ Exception: {e}")
+        matched = count_rows(session, filters)
+        print(f"🔍 {matched} movimientos en el alcance ({scope})")
+        if dry_run:
+            print("🧪 Dry run: no changes sent.")
+            return 0
+        if not matched:
+            return 0
+        touched = set()
+        deleted = delete_chunked(session, filters, chunk, touched)
+        refresh_rollups(session, touched)
+        # The next partition sync re-uploads these months from the local output
+        forget_synced_partitions(family_id, desde, hasta)
+    except UploadAborted as e:
+        print(e)
+        return None
+    print(f"✅ {deleted} movimientos borrados en {time.perf_counter() - started:.1f}s")
+    return deleted
+
+
+def delete_all():
+    """Every movimiento of every family, in chunks."""
+    return delete_scoped(family_id=None, all_rows=True)
+
+
+def _arg(name):
+    return sys.argv[sys.argv.index(name) + 1] if name in sys.argv else None
+
 
 if __name__ == "__main__":
-    delete_all()
+    desde, hasta = _arg("--desde"), _arg("--hasta")
+    if _arg("--mes"):
+        desde, hasta = month_range(_arg("--mes"))
+    delete_scoped(
+        family_id=_arg("--family") or (None if "--all" in sys.argv else DEFAULT_FAMILY_ID),
+        miembro=_arg("--miembro"),
+        sin_miembro="--sin-miembro" in sys.argv,
+        banco=_arg("--banco"),
+        producto=_arg("--producto"),
+        desde=desde,
+        hasta=hasta,
+        all_rows="--all" in sys.argv,
+        dry_run="--dry-run" in sys.argv,
+    )
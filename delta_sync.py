@@ -0,0 +1,408 @@
+# Idempotent delta sync between the pipeline output and Supabase
+# Every movimiento gets a deterministic row_hash over its natural key; the remote
+# key set is fetched once and only the difference is sent (inserts + deletes).
+
+import hashlib
+import json
+import os
+import sys
+import time
+
+from classification_cache import CACHE_DIR
+from movimientos_io import (
+    UNDATED_MONTH, iter_movimientos, load_movimientos, load_partition_index, month_range, partition_file,
+    partition_root_for, select_partitions, split_partition_key,
+)
+from rollups import MonthlyRollup, diff_rollups
+from row_keys import DEFAULT_FAMILY_ID, NATURAL_KEY_FIELDS, assign_row_hashes, natural_key, row_hash
+from tipo_flags import ensure_flags
+from upload_to_supabase import (
+    JSON_FILE, SUPABASE_URL, TABLE_NAME, BulkUploader, UploadAborted, make_session,
+)
+
+PAGE_SIZE = 1000
+DELETE_CHUNK = 200
+ROLLUP_TABLE = "movimientos_rollups"
+UPDATE_FIELDS = ('tipo', 'categoria')  # Fetched with the keys; a change there is sent as an update
+PARTITION_STATE_FILE = os.path.join(CACHE_DIR, "partition_sync.json")  # partition -> sha256 last synced
+
+
+def fetch_remote_keys(session, family_id=DEFAULT_FAMILY_ID, page_size=PAGE_SIZE, desde=None, hasta=None):
+    """Returns {row_hash: row} for the family (fecha in [desde, hasta] when given), paginating by id (keyset).
+
+    Rows carry id, the natural key fields, tipo and categoria (enough for the rollups).
+    Rows uploaded before row_hash existed get their hash computed locally.
+    """
+    url = f"{SUPABASE_URL}/rest/v1/{TABLE_NAME}"
+    select = "id,row_hash,miembro,tipo,categoria," + ",".join(f for f in NATURAL_KEY_FIELDS if f != 'miembro')
+    remote = {}
+    legacy_seen = {}
+    last_id = None
+    while True:
+        params = {
+            "select": select,
+            "family_id": f"eq.{family_id}",
+            "order": "id.asc",
+            "limit": str(page_size),
+        }
+        if desde and hasta:
+            params["and"] = f"(fecha.gte.{desde},fecha.lte.{hasta})"
+        if last_id:
+            params["id"] = f"gt.{last_id}"
+        response = session.get(url, params=params, timeout=60)
+        if response.status_code != 200:
+            raise UploadAborted(f"❌ Error fetching remote keys: {response.status_code} - {response.text[:200]}")
+        page = response.json()
+        for r in page:
+            h = r.get('row_hash')
+            if not h:
+                key = natural_key(r)
+                occurrence = legacy_seen.get(key, 0)
+                legacy_seen[key] = occurrence + 1
+                h = row_hash(key, occurrence)
+            remote[h] = r
+        if len(page) < page_size:
+            return remote
+        last_id = page[-1]['id']
+
+
+def compute_delta(local_rows, remote, delete_scope_null_miembro=True):
+    """Returns (rows to insert, ids to delete).
+
+    Only rows without miembro are deleted by default: those come from this
+    pipeline, rows with miembro were loaded from the dashboard.
+    """
+    local_hashes = {m['row_hash'] for m in local_rows}
+    to_insert = [m for m in local_rows if m['row_hash'] not in remote]
+    to_delete = [
+        r['id'] for h, r in remote.items()
+        if h not in local_hashes and (not delete_scope_null_miembro or not r.get('miembro'))
+    ]
+    return to_insert, to_delete
+
+
+def delete_ids(session, ids, chunk=DELETE_CHUNK):
+    """Deletes by id in chunks (return=minimal, nothing is sent back)."""
+    url = f"{SUPABASE_URL}/rest/v1/{TABLE_NAME}"
+    deleted = 0
+    for i in range(0, len(ids), chunk):
+        batch = ids[i:i + chunk]
+        response = session.delete(url, params={"id": f"in.({','.join(batch)})"}, timeout=60)
+        if response.status_code not in (200, 204):
+            print(f"❌ Error deleting {len(batch)} rows: {response.status_code} - {response.text[:200]}")
+            continue
+        deleted += len(batch)
+    return deleted
+
+
+def fetch_remote_rollups(session, family_id=DEFAULT_FAMILY_ID, page_size=PAGE_SIZE, months=None):
+    url = f"{SUPABASE_URL}/rest/v1/{ROLLUP_TABLE}"
+    rows = []
+    while True:
+        params = {
+            "select": "group_key,total,total_abs,row_count",
+            "family_id": f"eq.{family_id}",
+            "order": "group_key.asc",
+            "limit": str(page_size),
+        }
+        if months is not None:
+            params["month"] = f"in.({','.join(months)})"
+        if rows:
+            params["group_key"] = f"gt.{rows[-1]['group_key']}"
+        response = session.get(url, params=params, timeout=60)
+        if response.status_code != 200:
+            raise UploadAborted(f"❌ Error fetching rollups: {response.status_code} - {response.text[:200]}")
+        page = response.json()
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+
+
+def sync_rollups(session, rollup, family_id=DEFAULT_FAMILY_ID, dry_run=False, months=None):
+    """Upserts only the rollup groups whose totals changed and deletes the empty ones.
+
+    With months, rollup only covers those months and the other stored groups are left alone.
+    """
+    try:
+        remote = fetch_remote_rollups(session, family_id, months=months)
+    except UploadAborted as e:
+        print(e)
+        return None
+    upserts, stale = diff_rollups(remote, rollup)
+    print(f"📦 Rollups: {len(rollup.groups)} grupos | Actualizar: {len(upserts)} | Borrar: {len(stale)}")
+    if dry_run or (not upserts and not stale):
+        return {"upserted": 0, "deleted": 0}
+
+    url = f"{SUPABASE_URL}/rest/v1/{ROLLUP_TABLE}"
+    headers = {"Prefer": "return=minimal,resolution=merge-duplicates"}
+    for i in range(0, len(upserts), PAGE_SIZE):
+        response = session.post(url, params={"on_conflict": "group_key"}, headers=headers,
+                                json=upserts[i:i + PAGE_SIZE], timeout=60)
+        if response.status_code not in (200, 201, 204):
+            print(f"❌ Error upserting rollups: {response.status_code} - {response.text[:200]}")
+            return None
+    for i in range(0, len(stale), DELETE_CHUNK):
+        response = session.delete(url, params={"group_key": f"in.({','.join(stale[i:i + DELETE_CHUNK])})"}, timeout=60)
+        if response.status_code not in (200, 204):
+            print(f"❌ Error deleting rollups: {response.status_code} - {response.text[:200]}")
+            return None
+    return {"upserted": len(upserts), "deleted": len(stale)}
+
+
+def _differs(m, r):
+    return any((r.get(f) or '') != (m.get(f) or '') for f in UPDATE_FIELDS)
+
+
+def rollup_after_sync(local_rows, remote, deleted_ids, updated=()):
+    """Rollup of what the family's table holds once the delta is applied.
+
+    Rows already in the table that aren't in updated keep their remote tipo/categoria
+    (e.g. a category fixed in the dashboard), so the rollup counts them there.
+    """
+    rollup = MonthlyRollup()
+    local_hashes = set()
+    updated_hashes = {m['row_hash'] for m in updated}
+    for m in local_rows:
+        h = m['row_hash']
+        local_hashes.add(h)
+        r = remote.get(h)
+        if r is not None and h not in updated_hashes and _differs(m, r):
+            m = {**m, **{f: r.get(f) for f in UPDATE_FIELDS}, 'tipo_class': None}
+        rollup.add(m)
+    deleted_ids = set(deleted_ids)
+    for h, r in remote.items():
+        if h not in local_hashes and r['id'] not in deleted_ids:
+            rollup.add(r)
+    return rollup
+
+
+def compute_updates(local_rows, remote, synced):
+    """Rows already in Supabase whose categoria/tipo were re-classified locally since the last sync.
+
+    synced is {row_hash: [tipo, categoria]} as sent by the previous sync of the partition
+    (see save_synced_values). A row whose local values didn't change since then keeps the
+    remote ones even if they differ: they were edited in the dashboard (saveEditCategory).
+    """
+    return [
+        m for m in local_rows
+        if m['row_hash'] in remote and m['row_hash'] in synced
+        and _differs(m, remote[m['row_hash']])
+        and synced[m['row_hash']] != [m.get(f) for f in UPDATE_FIELDS]
+    ]
+
+
+def _cancelled(cancel):
+    if cancel is not None and cancel.is_set():
+        print("⏹️ Sync cancelado, el resto no se envió.")
+        return True
+    return False
+
+
+def insert_rows(session, rows, resolution="ignore-duplicates", cancel=None):
+    """Bulk insert by row_hash; returns (rows sent, batch latencies).
+
+    ignore-duplicates skips rows already present, merge-duplicates updates them.
+    Once cancel (threading.Event) is set no more batches are sent (UploadAborted).
+    """
+    if not rows:
+        return 0, []
+    url = f"{SUPABASE_URL}/rest/v1/{TABLE_NAME}?on_conflict=row_hash"
+    session.headers["Prefer"] = f"return=minimal,resolution={resolution}"
+    uploader = BulkUploader(url, session=session, cancel=cancel)
+    return uploader.upload(rows), uploader.batch_latencies
+
+
+def sync_delta(json_file=JSON_FILE, family_id=DEFAULT_FAMILY_ID, dry_run=False, allow_deletes=True, rows=None,
+               cancel=None):
+    """Brings the family's pipeline rows in Supabase in line with the local output.
+
+    cancel (threading.Event, see sync_dag) stops it between insert batches and before deleting.
+    """
+    started = time.perf_counter()
+    local_rows = rows if rows is not None else load_movimientos(json_file)
+    for m in local_rows:
+        m.setdefault('family_id', family_id)
+    ensure_flags(local_rows)
+    assign_row_hashes(local_rows)
+
+    session = make_session()
+    try:
+        remote = fetch_remote_keys(session, family_id)
+    except UploadAborted as e:
+        print(e)
+        return None
+    to_insert, to_delete = compute_delta(local_rows, remote)
+    if not allow_deletes:
+        to_delete = []
+
+    print(f"🔍 Local: {len(local_rows)} | Remoto: {len(remote)} | "
+          f"Insertar: {len(to_insert)} | Borrar: {len(to_delete)}")
+    if dry_run:
+        sync_rollups(session, rollup_after_sync(local_rows, remote, to_delete), family_id, dry_run=True)
+        print("🧪 Dry run: no changes sent.")
+        return {"inserted": 0, "deleted": 0, "to_insert": len(to_insert), "to_delete": len(to_delete)}
+
+    try:
+        inserted, latencies = insert_rows(session, to_insert, cancel=cancel)
+    except UploadAborted as e:
+        print(e)
+        return None
+    if _cancelled(cancel):
+        return None
+    deleted = delete_ids(session, to_delete) if to_delete else 0
+    sync_rollups(session, rollup_after_sync(local_rows, remote, to_delete), family_id)
+
+    print(f"✅ Delta sync: {inserted} insertados, {deleted} borrados en {time.perf_counter() - started:.1f}s")
+    return {"inserted": inserted, "deleted": deleted, "to_insert": len(to_insert), "to_delete": len(to_delete),
+            "batch_latencies": latencies}
+
+
+def load_partition_state(path=PARTITION_STATE_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_partition_state(state, path=PARTITION_STATE_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+
+def _synced_values_path(key, state_path=PARTITION_STATE_FILE):
+    name = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+    return os.path.join(os.path.splitext(state_path)[0] + "_values", f"{name}.json")
+
+
+def load_synced_values(key, state_path=PARTITION_STATE_FILE):
+    """{row_hash: [tipo, categoria]} of the partition as of its last sync ({} if never synced)."""
+    path = _synced_values_path(key, state_path)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_synced_values(key, rows, state_path=PARTITION_STATE_FILE):
+    path = _synced_values_path(key, state_path)
+    if not rows:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump({m['row_hash']: [m.get(f) for f in UPDATE_FIELDS] for m in rows}, f, ensure_ascii=False)
+    os.replace(f"{path}.tmp", path)
+
+
+def forget_synced_partitions(family_id=DEFAULT_FAMILY_ID, desde=None, hasta=None, path=PARTITION_STATE_FILE):
+    """Marks the partitions in the period as not synced (after deleting remote rows out of band)."""
+    state = load_partition_state(path)
+    forgotten = select_partitions(state, family_id, desde, hasta)
+    for key in forgotten:
+        del state[key]
+        save_synced_values(key, [], path)
+    if forgotten:
+        save_partition_state(state, path)
+    return forgotten
+
+
+def sync_partitions(root, family_id=None, dry_run=False, allow_deletes=True, desde=None, hasta=None, force=False,
+                    state_path=PARTITION_STATE_FILE, cancel=None):
+    """sync_delta restricted to the month partitions whose checksum changed since the last sync.
+
+    Each changed partition is compared with the remote rows of its family and month only
+    (rows re-classified locally since the last sync are updated in place, categories edited
+    in the dashboard are kept); partitions gone from the output have their pipeline rows deleted. Partitions in the
+    period [desde, hasta] are considered (all by default); force re-checks them all.
+    cancel (threading.Event, see sync_dag) stops it between batches and partitions; the
+    partitions already synced stay recorded, the next run resumes with the rest.
+    """
+    started = time.perf_counter()
+    index = load_partition_index(root)
+    if not index:
+        print(f"❌ No hay particiones en {root} (ejecuta process_data.py o sync_data.py primero).")
+        return None
+    state = load_partition_state(state_path)
+    keys = select_partitions(set(index) | set(state), family_id, desde, hasta)
+    pending = [k for k in keys if force or index.get(k, {}).get('sha256') != state.get(k)]
+    print(f"🗂️ Particiones: {len(keys)} en el alcance | con cambios: {len(pending)}")
+
+    session = make_session()
+    totals = {"inserted": 0, "updated": 0, "deleted": 0, "to_insert": 0, "to_update": 0, "to_delete": 0,
+              "batch_latencies": []}
+    for key in pending:
+        if _cancelled(cancel):
+            return None
+        family, month = split_partition_key(key)
+        if month == UNDATED_MONTH:
+            print(f"⚠️ {key}: {index[key]['rows']} filas sin fecha válida, no se suben.")
+            continue
+        local_rows = list(iter_movimientos(partition_file(root, key))) if key in index else []
+        for m in local_rows:
+            m.setdefault('family_id', family)
+        ensure_flags(local_rows)
+        assign_row_hashes(local_rows)  # Equal natural keys share fecha, so hashes match a whole-output sync
+
+        first_day, last_day = month_range(month)
+        try:
+            remote = fetch_remote_keys(session, family, desde=first_day, hasta=last_day)
+        except UploadAborted as e:
+            print(e)
+            return None
+        to_insert, to_delete = compute_delta(local_rows, remote)
+        to_update = compute_updates(local_rows, remote, load_synced_values(key, state_path))
+        if not allow_deletes:
+            to_delete = []
+        totals["to_insert"] += len(to_insert)
+        totals["to_update"] += len(to_update)
+        totals["to_delete"] += len(to_delete)
+        print(f"🔍 {key}: Local: {len(local_rows)} | Remoto: {len(remote)} | "
+              f"Insertar: {len(to_insert)} | Actualizar: {len(to_update)} | Borrar: {len(to_delete)}")
+        if dry_run:
+            continue
+
+        try:
+            inserted, latencies = insert_rows(session, to_insert, cancel=cancel)
+            updated, update_latencies = insert_rows(session, to_update, resolution="merge-duplicates", cancel=cancel)
+        except UploadAborted as e:
+            print(e)
+            return None
+        if _cancelled(cancel):
+            return None
+        totals["inserted"] += inserted
+        totals["updated"] += updated
+        totals["batch_latencies"].extend(latencies + update_latencies)
+        totals["deleted"] += delete_ids(session, to_delete) if to_delete else 0
+        sync_rollups(session, rollup_after_sync(local_rows, remote, to_delete, to_update), family, months=[month])
+        # Saved after every partition: an interrupted sync resumes where it stopped
+        if key in index:
+            state[key] = index[key]['sha256']
+        else:
+            state.pop(key, None)
+        save_synced_values(key, local_rows, state_path)
+        save_partition_state(state, state_path)
+
+    if dry_run:
+        print("🧪 Dry run: no changes sent.")
+        return {**totals, "batch_latencies": []}
+    print(f"✅ Sync por particiones: {totals['inserted']} insertados, {totals['updated']} actualizados, "
+          f"{totals['deleted']} borrados en {time.perf_counter() - started:.1f}s")
+    return totals
+
+
+def _arg(name):
+    return sys.argv[sys.argv.index(name) + 1] if name in sys.argv else None
+
+
+if __name__ == "__main__":
+    # --dry-run only reports the difference; --no-delete never removes remote rows
+    # --partitions only syncs the month partitions that changed (--desde/--hasta limit the period, --force re-checks)
+    if "--partitions" in sys.argv:
+        sync_partitions(partition_root_for(JSON_FILE), dry_run="--dry-run" in sys.argv,
+                        allow_deletes="--no-delete" not in sys.argv, desde=_arg("--desde"), hasta=_arg("--hasta"),
+                        force="--force" in sys.argv)
+    else:
+        sync_delta(dry_run="--dry-run" in sys.argv, allow_deletes="--no-delete" not in sys.argv)
@@ -0,0 +1,108 @@
+# Shared reader for the 'Consolidado' sheet of the bank statement workbooks
+# Reads only the columns the pipeline uses and keeps a binary copy of the parsed
+# sheet keyed by the workbook's content hash (one copy per workbook/sheet: older
+# ones are removed when the workbook changes).
+
+import hashlib
+import os
+
+import pandas as pd
+
+from classification_cache import CACHE_DIR
+from source_manifest import file_sha256
+
+SHEET_NAME = 'Consolidado'
+EXCEL_CACHE_DIR = os.path.join(CACHE_DIR, "excel")
+# Columns process_data uses ('Producto'/'Numero' only if the workbook has them)
+PIPELINE_COLUMNS = ('Fecha', 'Tipo', 'Valor', 'Detalle', 'Banco', 'Categoria', 'Producto', 'Numero')
+
+# calamine (Rust, ~10x faster) when python-calamine is installed, else openpyxl in
+# read-only mode. Whitespace-only cells ('  ') are read as empty with both engines
+# (calamine can't tell them apart), so the engine doesn't change the output.
+EXCEL_ENGINE = None  # 'calamine' / 'openpyxl' to force one
+# Bump when the cached DataFrames change shape or content
+CACHE_VERSION = 2
+
+try:
+    import python_calamine  # noqa: F401
+    CALAMINE_AVAILABLE = True
+except ImportError:
+    CALAMINE_AVAILABLE = False
+
+
+def default_engine():
+    return EXCEL_ENGINE or ('calamine' if CALAMINE_AVAILABLE else 'openpyxl')
+
+
+def _column_filter(columns):
+    """usecols callable; header names are compared stripped ('Categoria ' has a trailing space)."""
+    if columns is None:
+        return None
+    wanted = {c.strip() for c in columns}
+    return lambda name: str(name).strip() in wanted
+
+
+def _blank_to_na(df):
+    """Whitespace-only text cells -> NaN (what calamine returns for them)."""
+    for name in df.columns:
+        column = df[name]
+        if column.dtype == object or pd.api.types.is_string_dtype(column):
+            blank = column.map(lambda v: isinstance(v, str) and not v.strip(), na_action='ignore')
+            blank = blank.fillna(False).astype(bool)
+            if blank.any():
+                df[name] = column.mask(blank)
+    return df
+
+
+def _cache_prefix(excel_file, sheet_name, columns, engine):
+    """Identifies the workbook/sheet/read options (not the content) in the cache file names."""
+    key = f"{os.path.abspath(excel_file)}|{sheet_name}|{','.join(columns) if columns else '*'}|{engine}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+
+
+def _cache_path(excel_file, sheet_name, columns, engine):
+    content = hashlib.sha256(f"{CACHE_VERSION}|{file_sha256(excel_file)}".encode('utf-8')).hexdigest()[:16]
+    return os.path.join(EXCEL_CACHE_DIR, f"{_cache_prefix(excel_file, sheet_name, columns, engine)}-{content}.pkl")
+
+
+def _prune_cache(cache_file):
+    """Removes the other cached copies of the same workbook/sheet (earlier versions of its content)."""
+    prefix = os.path.basename(cache_file).split('-')[0] + '-'
+    for name in os.listdir(EXCEL_CACHE_DIR):
+        path = os.path.join(EXCEL_CACHE_DIR, name)
+        if name.startswith(prefix) and name.endswith('.pkl') and path != cache_file:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def read_consolidado(excel_file, columns=PIPELINE_COLUMNS, sheet_name=SHEET_NAME, engine=None, use_cache=True):
+    """Reads the sheet as a DataFrame.
+
+    columns=None reads every column. With use_cache, an unchanged workbook is loaded
+    from the pickled DataFrame in .cache/excel instead of being parsed again.
+    """
+    engine = engine or default_engine()
+    if engine == 'calamine' and not CALAMINE_AVAILABLE:
+        print("⚠️ Warning: python-calamine not installed, reading with openpyxl")
+        engine = 'openpyxl'
+    cache_file = _cache_path(excel_file, sheet_name, columns, engine) if use_cache else None
+    if cache_file and os.path.exists(cache_file):
+        try:
+            return pd.read_pickle(cache_file)
+        except Exception as e:
+            print(f"⚠️ Warning: ignoring unreadable Excel cache {cache_file}: {e}")
+
+    engine_kwargs = {'read_only': True, 'data_only': True} if engine == 'openpyxl' else None
+    df = pd.read_excel(excel_file, sheet_name=sheet_name, usecols=_column_filter(columns), engine=engine,
+                       engine_kwargs=engine_kwargs)
+    df = _blank_to_na(df)
+
+    if cache_file:
+        os.makedirs(EXCEL_CACHE_DIR, exist_ok=True)
+        tmp = f"{cache_file}.{os.getpid()}.tmp"
+        df.to_pickle(tmp)
+        os.replace(tmp, cache_file)
+        _prune_cache(cache_file)
+    return df
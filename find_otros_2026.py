@@ -1,25 +1,28 @@
-import pandas as pd
-from category_mapping import get_category_for_merchant
+from excel_reader import read_consolidado
+from classification_cache import get_classification_cache
+from merchant_index import MerchantIndex, print_clusters
+from normalization import parse_amounts
+from source_manifest import file_sha256
 
 EXCEL_2026 = r"C:\Users\Amaya\OneDrive\Documentos\Personal\Movimientos\movimientos_bancos_estandarizados_v2.xlsx"
 
 def find_unclassified():
-    df = pd.read_excel(EXCEL_2026, sheet_name='Consolidado')
-    
-    otros_counts = {}
-    
-    for detalle in df['Detalle']:
-        detalle = str(detalle)
-        cat = get_category_for_merchant(detalle)
-        if cat == 'Otros':
-            otros_counts[detalle] = otros_counts.get(detalle, 0) + 1
-            
-    # Sort by count
-    sorted_otros = sorted(otros_counts.items(), key=lambda x: x[1], reverse=True)
-    
-    print("Top 20 Unclassified Merchants (2026):")
-    for det, count in sorted_otros[:20]:
-        print(f"{count} | {det}")
+    # The workbook is only re-read when its content changed since the last run
+    index = MerchantIndex()
+    sha256 = file_sha256(EXCEL_2026)
+    if not index.is_current(EXCEL_2026, sha256):
+        df = read_consolidado(EXCEL_2026, columns=['Detalle', 'Valor'])
+        # Text amounts ("$ 1.234,56") are parsed like process_data does; unparseable ones count as 0
+        valores = parse_amounts(df['Valor']).fillna(0.0)
+        index.update_source(EXCEL_2026, sha256, zip(df['Detalle'].astype(str), valores))
+
+    cache = get_classification_cache()
+    # Near-variants grouped, with a suggested category from similar classified merchants
+    print_clusters(index.clusters(cache), limit=20)
+
+    cache.print_stats()
+    cache.close()
+    index.close()
 
 if __name__ == "__main__":
     find_unclassified()
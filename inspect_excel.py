@@ -1,9 +1,9 @@
-import pandas as pd
+from excel_reader import read_consolidado
 
 EXCEL_PATH = r"C:\Users\Amaya\OneDrive\Documentos\Personal\Movimientos\movimientos_bancos_estandarizados_v2.xlsx"
 
 try:
-    df = pd.read_excel(EXCEL_PATH, sheet_name='Consolidado')
+    df = read_consolidado(EXCEL_PATH, columns=None)
     print("Columns found in Excel:")
     print(df.columns.tolist())
     
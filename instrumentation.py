@@ -0,0 +1,251 @@
+# Lightweight per-stage instrumentation for pipeline runs
+# Wall/self time, rows in/out, rows per second, peak memory and HTTP latency
+# percentiles per stage, saved as a JSON run report in .cache/runs.
+# Streaming stages are measured by wrapping their iterators: time spent producing
+# a row is charged to the innermost stage, so read, dedupe and write add up.
+
+import contextlib
+import cProfile
+import datetime
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+from classification_cache import CACHE_DIR
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+REPORTS_DIR = os.path.join(CACHE_DIR, "runs")
+REPORTS_KEEP = 50  # Per run name; older reports (and their .prof files) are deleted
+
+
+def peak_rss_mb():
+    """Process high-water mark of resident memory (None where it is not available)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if os.uname().sysname == "Darwin" else 1024), 1)
+
+
+def percentiles(values, points=(50, 90, 99)):
+    """{'count', 'p50', 'p90', 'p99', 'max'} in milliseconds (nearest rank)."""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    out = {"count": len(ordered)}
+    for p in points:
+        rank = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered) + 0.5) - 1))
+        out[f"p{p}"] = round(ordered[rank] * 1000, 1)
+    out["max"] = round(ordered[-1] * 1000, 1)
+    return out
+
+
+class StageMetrics:
+    def __init__(self, name):
+        self.name = name
+        self.wall_seconds = 0.0
+        self.self_seconds = 0.0
+        self.rows_in = None
+        self.rows_out = 0
+        self.peak_rss_mb = None
+        self.traced_peak_mb = None
+        self.http = None
+        self.profile = None
+
+    def to_dict(self):
+        seconds = self.self_seconds
+        return {
+            "name": self.name,
+            "wall_seconds": round(self.wall_seconds, 4),
+            "self_seconds": round(seconds, 4),
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "rows_per_second": round(self.rows_out / seconds) if seconds and self.rows_out else None,
+            "peak_rss_mb": self.peak_rss_mb,
+            "traced_peak_mb": self.traced_peak_mb,
+            "http": self.http,
+            "profile": self.profile,
+        }
+
+
+class _Frame:
+    __slots__ = ("metrics", "child_seconds")
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.child_seconds = 0.0
+
+
+class RunReport:
+    """Collects StageMetrics for one run.
+
+    trace_memory turns on tracemalloc (slower, per-stage Python heap peaks; stages
+    running at the same time share the counter). profile_stage names one stage to
+    run under cProfile; its .prof file is written next to the report.
+    """
+
+    def __init__(self, name, trace_memory=False, profile_stage=None, reports_dir=REPORTS_DIR):
+        self.name = name
+        self.trace_memory = trace_memory
+        self.profile_stage = profile_stage
+        self.reports_dir = reports_dir
+        self.started_at = datetime.datetime.now()
+        self.stages = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started = time.perf_counter()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _metrics(self, name):
+        with self._lock:
+            if name not in self.stages:
+                self.stages[name] = StageMetrics(name)
+            return self.stages[name]
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _enter(self, metrics):
+        frame = _Frame(metrics)
+        self._stack().append(frame)
+        return frame, time.perf_counter()
+
+    def _exit(self, frame, started):
+        elapsed = time.perf_counter() - started
+        stack = self._stack()
+        stack.pop()
+        frame.metrics.wall_seconds += elapsed
+        frame.metrics.self_seconds += elapsed - frame.child_seconds
+        if stack:
+            stack[-1].child_seconds += elapsed
+
+    @contextlib.contextmanager
+    def stage(self, name, rows_in=None):
+        """Times a block; set .rows_out (and .rows_in) on the yielded StageMetrics."""
+        metrics = self._metrics(name)
+        if rows_in is not None:
+            metrics.rows_in = rows_in
+        profiler = cProfile.Profile() if name == self.profile_stage else None
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        frame, started = self._enter(metrics)
+        if profiler:
+            profiler.enable()
+        try:
+            yield metrics
+        finally:
+            if profiler:
+                profiler.disable()
+                metrics.profile = self._dump_profile(profiler, name)
+            self._exit(frame, started)
+            self._sample_memory(metrics)
+
+    def iter_stage(self, name, iterable):
+        """Yields from iterable, charging the time spent producing each item to stage name."""
+        # Registered now (not on the first next()) so the report lists stages in pipeline order
+        return self._iter_stage(self._metrics(name), iter(iterable))
+
+    def _iter_stage(self, metrics, iterator):
+        # Profiled only while producing items, not while the consumer works on them
+        profiler = cProfile.Profile() if metrics.name == self.profile_stage else None
+        try:
+            while True:
+                frame, started = self._enter(metrics)
+                if profiler:
+                    profiler.enable()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    if profiler:
+                        profiler.disable()
+                    self._exit(frame, started)
+                metrics.rows_out += 1
+                yield item
+        finally:
+            if profiler:
+                metrics.profile = self._dump_profile(profiler, metrics.name)
+            self._sample_memory(metrics)
+
+    def record_http(self, name, latencies):
+        """Adds per-request latencies (seconds) to a stage."""
+        self._metrics(name).http = percentiles(latencies)
+
+    def _sample_memory(self, metrics):
+        metrics.peak_rss_mb = peak_rss_mb()
+        if self.trace_memory and tracemalloc.is_tracing():
+            metrics.traced_peak_mb = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+
+    def _dump_profile(self, profiler, stage):
+        os.makedirs(self.reports_dir, exist_ok=True)
+        path = os.path.join(self.reports_dir, f"{self._file_stem()}-{stage}.prof")
+        profiler.dump_stats(path)
+        return path
+
+    def _file_stem(self):
+        return f"{self.name}-{self.started_at:%Y%m%d-%H%M%S-%f}"
+
+    def to_dict(self):
+        return {
+            "run": self.name,
+            "started": self.started_at.isoformat(timespec="seconds"),
+            "total_seconds": round(time.perf_counter() - self._started, 4),
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": [m.to_dict() for m in self.stages.values()],
+        }
+
+    def save(self, path=None):
+        """Writes the JSON report, prints a summary and returns the path."""
+        report = self.to_dict()
+        path = path or os.path.join(self.reports_dir, f"{self._file_stem()}.json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+        print(f"\n⏱️ {self.name}: {report['total_seconds']:.2f}s"
+              + (f", pico {report['peak_rss_mb']} MB" if report['peak_rss_mb'] else ""))
+        for s in report["stages"]:
+            line = f"   {s['name']:<24} {s['self_seconds']:8.3f}s"
+            if s["rows_out"]:
+                line += f"  {s['rows_out']:>9} filas"
+                if s["rows_per_second"]:
+                    line += f"  {s['rows_per_second']:>10,} filas/s"
+            if s["http"] and s["http"]["count"]:
+                line += f"  HTTP p50 {s['http']['p50']}ms p99 {s['http']['p99']}ms"
+            print(line)
+        print(f"📝 Reporte: {path}")
+        if self.trace_memory:
+            tracemalloc.stop()
+        self._prune()
+        return path
+
+    def _prune(self):
+        prefix = f"{self.name}-"
+        try:
+            names = sorted(n for n in os.listdir(self.reports_dir) if n.startswith(prefix) and n.endswith(".json"))
+        except OSError:
+            return
+        for old in names[:-REPORTS_KEEP]:
+            stem = old[:-len(".json")]
+            for n in os.listdir(self.reports_dir):
+                if n == old or (n.startswith(stem + "-") and n.endswith(".prof")):
+                    os.remove(os.path.join(self.reports_dir, n))
+
+
+def report_options(argv):
+    """RunReport kwargs from the CLI: --trace-memory, --profile <stage>."""
+    options = {"trace_memory": "--trace-memory" in argv}
+    if "--profile" in argv and argv.index("--profile") + 1 < len(argv):
+        options["profile_stage"] = argv[argv.index("--profile") + 1]
+    return options
@@ -9,6 +9,8 @@ let currentView = 'resumen';
 let currentFamilyMembers = []; // Dynamic members from DB
 let charts = {};
 let selectedMembers = []; // Empty means all members selected
+let monthlyRollups = []; // Pre-aggregated by the pipeline (see rollups.py)
+let rollupFilter = () => true; // (month 'YYYY-MM', miembro) -> in current filters
 let pagination = {
     gastos: { page: 1, perPage: CONFIG.ITEMS_PER_PAGE, total: 0 },
     ingresos: { page: 1, perPage: CONFIG.ITEMS_PER_PAGE, total: 0 }
@@ -194,36 +196,62 @@ function updateMemberDropdowns() {
 // Load data from Supabase
 // DATA HANDLING
 // =========================================
+
+// Class flags: the pipeline stores them per row (tipo_flags.py has the rules). This is
+// only for rows without them: uploaded from the browser or loaded before the migration.
+const EXPENSE_TIPOS = new Set(['Compra', 'Retiro', 'Débito', 'Gasto', 'Pago', 'Cargo']);
+const INCOME_TIPOS = new Set(['Depósito', 'Transferencia Recibida', 'Ingreso', 'Sueldo', 'Salario']);
+
+function computeTipoFlags(tipo, categoria, detalle) {
+    const text = `${tipo || ''} ${categoria || ''} ${detalle || ''}`.toLowerCase();
+    const is_expense = EXPENSE_TIPOS.has(tipo);
+    const is_interest = text.includes('interes');
+    const is_cc_payment = !is_interest && text.includes('abono');
+    const is_income = INCOME_TIPOS.has(tipo) && !is_cc_payment;
+    const tipo_class = is_expense ? 'gasto' : is_cc_payment ? 'abono_tc' : is_income ? 'ingreso' : 'otro';
+    return { is_expense, is_income, is_cc_payment, is_interest, tipo_class };
+}
+
 async function loadData(silent = false) {
     try {
         if (!silent) console.log('📥 Fetching data from Supabase...');
         const familyId = getCurrentFamilyId();
 
-        // Filter by FAMILY ID
-        const { data, error } = await supabaseClient
-            .from('movimientos')
-            .select('*')
-            .eq('family_id', familyId);
-
-        if (error) throw error;
+        // Filter by FAMILY ID (paged: a single select stops at the PostgREST row limit)
+        const data = await fetchAllMovimientos(familyId);
 
         if (data) {
             // Normalize data keys (DB is snake_case, App uses PascalCase)
-            allTransactions = data.map(t => ({
-                id: t.id, // Keep ID for updates
-                Fecha: t.fecha,
-                Tipo: t.tipo,
-                Valor: typeof t.valor === 'string' ? parseFloat(t.valor.replace(/\./g, '').replace(',', '.')) : (t.valor || 0),
-                Categoria: t.categoria || 'Otros',
-                Banco: t.banco || '--',
-                Detalle: t.detalle || '',
-                Producto: t.producto || '',
-                NumeroProducto: t.numero_producto || '',
-                Miembro: t.miembro || ''
-            }));
+            allTransactions = data.map(t => {
+                const flags = t.tipo_class ? t : computeTipoFlags(t.tipo, t.categoria, t.detalle);
+                return {
+                    id: t.id, // Keep ID for updates
+                    Fecha: t.fecha,
+                    Tipo: t.tipo,
+                    Valor: typeof t.valor === 'string' ? parseFloat(t.valor.replace(/\./g, '').replace(',', '.')) : (t.valor || 0),
+                    Categoria: t.categoria || 'Otros',
+                    Banco: t.banco || '--',
+                    Detalle: t.detalle || '',
+                    Producto: t.producto || '',
+                    NumeroProducto: t.numero_producto || '',
+                    Miembro: t.miembro || '',
+                    IsExpense: Boolean(flags.is_expense),
+                    IsIncome: Boolean(flags.is_income),
+                    IsCcPayment: Boolean(flags.is_cc_payment),
+                    IsInterest: Boolean(flags.is_interest),
+                    TipoClass: flags.tipo_class
+                };
+            });
             if (!silent) console.log(`📊 Loaded ${allTransactions.length} transactions from Supabase for family: ${familyId}`);
         }
 
+        // Monthly rollups: optional, the summaries fall back to scanning transactions
+        const { data: rollups, error: rollupError } = await supabaseClient
+            .from('movimientos_rollups')
+            .select('group_key,month,miembro,categoria,tipo_class,total,total_abs,row_count')
+            .eq('family_id', familyId);
+        monthlyRollups = rollupError ? [] : (rollups || []);
+
     } catch (error) {
         console.error('Error loading data from Supabase:', error);
         showNotification('Error cargando datos: ' + error.message, 'error');
@@ -232,10 +260,35 @@ async function loadData(silent = false) {
 
     // Initialize filteredTransactions with all data (before filters are applied)
     filteredTransactions = allTransactions;
+    rollupFilter = () => true;
 
     renderAll();
 }
 
+// Keyset pagination by (fecha, id), newest first; uses the (family_id, fecha, id) index
+async function fetchAllMovimientos(familyId) {
+    const rows = [];
+    let last = null;
+    while (true) {
+        let query = supabaseClient
+            .from('movimientos')
+            .select('*')
+            .eq('family_id', familyId)
+            .order('fecha', { ascending: false })
+            .order('id', { ascending: false })
+            .limit(CONFIG.LOAD_PAGE_SIZE);
+        if (last) {
+            query = query.or(`fecha.lt.${last.fecha},and(fecha.eq.${last.fecha},id.lt.${last.id})`);
+        }
+
+        const { data, error } = await query;
+        if (error) throw error;
+        rows.push(...data);
+        if (data.length < CONFIG.LOAD_PAGE_SIZE) return rows;
+        last = data[data.length - 1];
+    }
+}
+
 // Save transactions is now handled via direct DB updates
 function saveTransactions() {
     // Deprecated for bulk saves, use specific update functions
@@ -423,31 +476,45 @@ function applyFilters() {
             startDate = new Date(0);
     }
 
-    // Map selectedMembers (which are member IDs) to a set for quick lookup
-    const selectedMemberIds = new Set(selectedMembers);
-
     filteredTransactions = allTransactions.filter(t => {
         const date = new Date(t.Fecha);
         const dateInRange = date >= startDate && date <= endDate;
 
-        // Filter by members if specific members are selected
-        // If selectedMembers is empty, it means "all members" are selected.
-        const memberMatch = selectedMemberIds.size === 0 || selectedMemberIds.has(t.Miembro);
-
-        // Fallback for legacy data where Miembro might be a name string instead of an ID
-        // This checks if the transaction's Miembro (name or ID) corresponds to any of the selected members.
-        const legacyMemberMatch = selectedMemberIds.size === 0 || currentFamilyMembers.some(m =>
-            selectedMemberIds.has(m.id) && (m.id === t.Miembro || m.name.toLowerCase() === (t.Miembro || '').toLowerCase())
-        );
-
-        return dateInRange && (memberMatch || legacyMemberMatch);
+        return dateInRange && matchesSelectedMembers(t.Miembro);
     });
 
+    const startMonth = toMonthKey(startDate);
+    const endMonth = toMonthKey(endDate);
+    rollupFilter = (month, miembro) => month >= startMonth && month <= endMonth && matchesSelectedMembers(miembro);
+
     // Reset pagination
     pagination.gastos.page = 1;
     pagination.ingresos.page = 1;
 }
 
+// If selectedMembers is empty, it means "all members" are selected.
+function matchesSelectedMembers(miembro) {
+    if (selectedMembers.length === 0 || selectedMembers.includes(miembro)) return true;
+
+    // Fallback for legacy data where Miembro might be a name string instead of an ID
+    return currentFamilyMembers.some(m =>
+        selectedMembers.includes(m.id) && (m.id === miembro || m.name.toLowerCase() === (miembro || '').toLowerCase())
+    );
+}
+
+function toMonthKey(date) {
+    return `${date.getFullYear()}-${String(date.getMonth() + 1).padStart(2, '0')}`;
+}
+
+// Rollups matching the current filters, or null when they do not cover every
+// loaded transaction (e.g. rows uploaded from the dashboard after the last sync)
+function getFilteredRollups() {
+    if (!monthlyRollups.length) return null;
+    const covered = monthlyRollups.reduce((sum, r) => sum + r.row_count, 0);
+    if (covered !== allTransactions.length) return null;
+    return monthlyRollups.filter(r => rollupFilter(r.month, r.miembro));
+}
+
 function changePage(type, delta) {
     const pag = pagination[type];
     const totalPages = Math.ceil(pag.total / pag.perPage);
@@ -478,52 +545,37 @@ function renderAll() {
 
 // KPIs
 function renderKPIs() {
-    // Include all common expense types (including Abono - credit card payments)
-    // Include all common expense types (including Abono - credit card payments)
-    const gastos = filteredTransactions.filter(t => {
-        const includeAbonoTC = document.getElementById('include-abono-check')?.checked ?? false;
-
-        const isExpenseType = t.Tipo === 'Compra' || t.Tipo === 'Retiro' || t.Tipo === 'Débito' ||
-            t.Tipo === 'Gasto' || t.Tipo === 'Pago' || t.Tipo === 'Cargo'; // Removed 'Abono' from here to control it via toggle
-
-        // Check for Abono (Credit Card Payment) but EXCLUDE Interest/Yields
-        const hasAbonoKeyword = (t.Tipo && t.Tipo.toLowerCase().includes('abono')) ||
-            (t.Categoria && t.Categoria.toLowerCase().includes('abono')) ||
-            (t.Detalle && t.Detalle.toLowerCase().includes('abono'));
-
-        const isInterest = (t.Tipo && t.Tipo.toLowerCase().includes('interes')) ||
-            (t.Categoria && t.Categoria.toLowerCase().includes('interes')) ||
-            (t.Detalle && t.Detalle.toLowerCase().includes('interes'));
-
-        const isAbonoPayment = hasAbonoKeyword && !isInterest;
-
-        return isExpenseType || (includeAbonoTC && isAbonoPayment);
-    });
-
-    // Include all common income types (Abono excluded - TC payments are not income)
-    const ingresos = filteredTransactions.filter(t => {
-        // Base income types
-        const isIncomeType = t.Tipo === 'Depósito' || t.Tipo === 'Transferencia Recibida' ||
-            t.Tipo === 'Ingreso' || t.Tipo === 'Sueldo' || t.Tipo === 'Salario';
-
-        // STRICT EXCLUSION: Any reference to Abono matches here
-        const hasAbonoKeyword = (t.Tipo && t.Tipo.toLowerCase().includes('abono')) ||
-            (t.Categoria && t.Categoria.toLowerCase().includes('abono')) ||
-            (t.Detalle && t.Detalle.toLowerCase().includes('abono'));
+    const includeAbonoTC = document.getElementById('include-abono-check')?.checked ?? false;
+    let totalGastos = 0;
+    let totalIngresos = 0;
+    const categorySums = {};
 
-        const isInterest = (t.Tipo && t.Tipo.toLowerCase().includes('interes')) ||
-            (t.Categoria && t.Categoria.toLowerCase().includes('interes')) ||
-            (t.Detalle && t.Detalle.toLowerCase().includes('interes'));
+    const rollups = getFilteredRollups();
+    if (rollups) {
+        // Pre-aggregated groups: same classification as the scan below (see rollups.py)
+        rollups.forEach(r => {
+            if (r.tipo_class === 'gasto' || (includeAbonoTC && r.tipo_class === 'abono_tc')) {
+                totalGastos += Number(r.total) || 0;
+                categorySums[r.categoria] = (categorySums[r.categoria] || 0) + (Number(r.total_abs) || 0);
+            } else if (r.tipo_class === 'ingreso') {
+                totalIngresos += Number(r.total) || 0;
+            }
+        });
+    } else {
+        // Flags computed once per row at ingest (tipo_flags.py); Abono TC only with the toggle
+        const gastos = filteredTransactions.filter(t => t.IsExpense || (includeAbonoTC && t.IsCcPayment));
 
-        // It is a credit card payment (to exclude) ONLY if it says Abono AND is NOT interest
-        const isCreditCardPayment = hasAbonoKeyword && !isInterest;
+        // Income types, never credit card payments
+        const ingresos = filteredTransactions.filter(t => t.IsIncome);
 
-        // Must be income type AND NOT a credit card payment
-        return isIncomeType && !isCreditCardPayment;
-    });
+        totalGastos = gastos.reduce((sum, t) => sum + (parseFloat(t.Valor) || 0), 0);
+        totalIngresos = ingresos.reduce((sum, t) => sum + (parseFloat(t.Valor) || 0), 0);
 
-    const totalGastos = gastos.reduce((sum, t) => sum + (parseFloat(t.Valor) || 0), 0);
-    const totalIngresos = ingresos.reduce((sum, t) => sum + (parseFloat(t.Valor) || 0), 0);
+        gastos.forEach(t => {
+            const cat = t.Categoria || 'Otros';
+            categorySums[cat] = (categorySums[cat] || 0) + Math.abs(parseFloat(t.Valor) || 0);
+        });
+    }
     const balance = totalIngresos - totalGastos;
 
     // Update KPI values
@@ -544,11 +596,6 @@ function renderKPIs() {
     if (dailyAvg) dailyAvg.textContent = formatCurrency(totalGastos / daysInPeriod);
 
     // Top category
-    const categorySums = {};
-    gastos.forEach(t => {
-        const cat = t.Categoria || 'Otros';
-        categorySums[cat] = (categorySums[cat] || 0) + Math.abs(parseFloat(t.Valor) || 0);
-    });
     const topCategory = Object.entries(categorySums).sort((a, b) => b[1] - a[1])[0];
     const topCatEl = document.getElementById('gastos-top-category');
     if (topCatEl) {
@@ -586,22 +633,7 @@ function renderIncomeMembersChart() {
     const ctx = canvas.getContext('2d');
 
     // Filter income transactions
-    const ingresos = filteredTransactions.filter(t => {
-        const isIncomeType = t.Tipo === 'Depósito' || t.Tipo === 'Transferencia Recibida' ||
-            t.Tipo === 'Ingreso' || t.Tipo === 'Sueldo' || t.Tipo === 'Salario';
-
-        const hasAbonoKeyword = (t.Tipo && t.Tipo.toLowerCase().includes('abono')) ||
-            (t.Categoria && t.Categoria.toLowerCase().includes('abono')) ||
-            (t.Detalle && t.Detalle.toLowerCase().includes('abono'));
-
-        const isInterest = (t.Tipo && t.Tipo.toLowerCase().includes('interes')) ||
-            (t.Categoria && t.Categoria.toLowerCase().includes('interes')) ||
-            (t.Detalle && t.Detalle.toLowerCase().includes('interes'));
-
-        const isCreditCardPayment = hasAbonoKeyword && !isInterest;
-
-        return isIncomeType && !isCreditCardPayment;
-    });
+    const ingresos = filteredTransactions.filter(t => t.IsIncome);
 
     // Group by member
     const memberTotals = {};
@@ -708,49 +740,36 @@ function renderIncomeVsExpensesChart() {
 
     // Group by month
     const monthlyData = {};
-    filteredTransactions.forEach(t => {
-        const date = new Date(t.Fecha);
-        const monthKey = `${date.getFullYear()} -${String(date.getMonth() + 1).padStart(2, '0')} `;
-        if (!monthlyData[monthKey]) {
-            monthlyData[monthKey] = { income: 0, expenses: 0 };
-        }
-        const value = Math.abs(parseFloat(t.Valor) || 0);
-        // Income types (must match renderKPIs and table logic)
-        // Note: 'Abono' removed as TC payments are not income
-        const isIncomeType = t.Tipo === 'Depósito' ||
-            t.Tipo === 'Transferencia Recibida' ||
-            t.Tipo === 'Ingreso' ||
-            t.Tipo === 'Sueldo' ||
-            t.Tipo === 'Salario';
-
-        const hasAbonoKeyword = (t.Tipo && t.Tipo.toLowerCase().includes('abono')) ||
-            (t.Categoria && t.Categoria.toLowerCase().includes('abono')) ||
-            (t.Detalle && t.Detalle.toLowerCase().includes('abono'));
-
-        const isInterest = (t.Tipo && t.Tipo.toLowerCase().includes('interes')) ||
-            (t.Categoria && t.Categoria.toLowerCase().includes('interes')) ||
-            (t.Detalle && t.Detalle.toLowerCase().includes('interes'));
-
-        const isCreditCardPayment = hasAbonoKeyword && !isInterest;
-
-        const isIncome = isIncomeType && !isCreditCardPayment;
-
-        if (isIncome) {
-            monthlyData[monthKey].income += value;
-        } else {
-            // Expenses: Check toggle
-            const includeAbonoTC = document.getElementById('include-abono-check')?.checked ?? false;
-
-            // Check if it is a valid expense
-            const isExpenseType = t.Tipo === 'Compra' || t.Tipo === 'Retiro' || t.Tipo === 'Débito' ||
-                t.Tipo === 'Gasto' || t.Tipo === 'Pago' || t.Tipo === 'Cargo';
-
-            // It is an expense if it is standard expense OR (it is Abono Payment AND we want to include it)
-            if (isExpenseType || (includeAbonoTC && isCreditCardPayment)) {
+    const includeAbonoTC = document.getElementById('include-abono-check')?.checked ?? false;
+    const rollups = getFilteredRollups();
+    if (rollups) {
+        rollups.forEach(r => {
+            if (!monthlyData[r.month]) {
+                monthlyData[r.month] = { income: 0, expenses: 0 };
+            }
+            const value = Number(r.total_abs) || 0;
+            if (r.tipo_class === 'ingreso') {
+                monthlyData[r.month].income += value;
+            } else if (r.tipo_class === 'gasto' || (includeAbonoTC && r.tipo_class === 'abono_tc')) {
+                monthlyData[r.month].expenses += value;
+            }
+        });
+    } else {
+        filteredTransactions.forEach(t => {
+            const date = new Date(t.Fecha);
+            const monthKey = `${date.getFullYear()} -${String(date.getMonth() + 1).padStart(2, '0')} `;
+            if (!monthlyData[monthKey]) {
+                monthlyData[monthKey] = { income: 0, expenses: 0 };
+            }
+            const value = Math.abs(parseFloat(t.Valor) || 0);
+            // Same flags as renderKPIs (Abono TC payments are never income)
+            if (t.IsIncome) {
+                monthlyData[monthKey].income += value;
+            } else if (t.IsExpense || (includeAbonoTC && t.IsCcPayment)) {
                 monthlyData[monthKey].expenses += value;
             }
-        }
-    });
+        });
+    }
 
     const sortedMonths = Object.keys(monthlyData).sort();
     const labels = sortedMonths.map(m => {
@@ -812,24 +831,8 @@ function renderDailyExpensesChart(expenseData = null) {
 
     // Use provided data or filter from global filteredTransactions
     // Use provided data or filter from global filteredTransactions
-    const expenses = expenseData || filteredTransactions.filter(t => {
-        const includeAbonoTC = document.getElementById('include-abono-check')?.checked ?? false;
-
-        const isExpenseType = t.Tipo === 'Compra' || t.Tipo === 'Retiro' || t.Tipo === 'Débito' ||
-            t.Tipo === 'Gasto' || t.Tipo === 'Pago' || t.Tipo === 'Cargo';
-
-        const hasAbonoKeyword = (t.Tipo && t.Tipo.toLowerCase().includes('abono')) ||
-            (t.Categoria && t.Categoria.toLowerCase().includes('abono')) ||
-            (t.Detalle && t.Detalle.toLowerCase().includes('abono'));
-
-        const isInterest = (t.Tipo && t.Tipo.toLowerCase().includes('interes')) ||
-            (t.Categoria && t.Categoria.toLowerCase().includes('interes')) ||
-            (t.Detalle && t.Detalle.toLowerCase().includes('interes'));
-
-        const isAbonoPayment = hasAbonoKeyword && !isInterest;
-
-        return isExpenseType || (includeAbonoTC && isAbonoPayment);
-    });
+    const includeAbonoTC = document.getElementById('include-abono-check')?.checked ?? false;
+    const expenses = expenseData || filteredTransactions.filter(t => t.IsExpense || (includeAbonoTC && t.IsCcPayment));
 
     // Group by date (day level)
     const dailyData = {};
@@ -899,20 +902,20 @@ function renderCategoryDonut() {
         charts.categoryDonut.destroy();
     }
 
-    const gastos = filteredTransactions.filter(t => {
-        // In Resumen view, we don't include Abono TC by default
-        // This matches the default behavior of Gastos view (checkbox unchecked)
-        const isExpenseType = t.Tipo === 'Compra' || t.Tipo === 'Retiro' || t.Tipo === 'Débito' ||
-            t.Tipo === 'Gasto' || t.Tipo === 'Pago' || t.Tipo === 'Cargo';
-
-        // We explicitly exclude Abono TC payments from Resumen's category donut
-        return isExpenseType;
-    });
     const categorySums = {};
-    gastos.forEach(t => {
-        const cat = t.Categoria || 'Otros';
-        categorySums[cat] = (categorySums[cat] || 0) + Math.abs(parseFloat(t.Valor) || 0);
-    });
+    const rollups = getFilteredRollups();
+    if (rollups) {
+        rollups.filter(r => r.tipo_class === 'gasto').forEach(r => {
+            categorySums[r.categoria] = (categorySums[r.categoria] || 0) + (Number(r.total_abs) || 0);
+        });
+    } else {
+        // In Resumen view Abono TC payments are excluded from the category donut
+        const gastos = filteredTransactions.filter(t => t.IsExpense);
+        gastos.forEach(t => {
+            const cat = t.Categoria || 'Otros';
+            categorySums[cat] = (categorySums[cat] || 0) + Math.abs(parseFloat(t.Valor) || 0);
+        });
+    }
 
     const sorted = Object.entries(categorySums).sort((a, b) => b[1] - a[1]).slice(0, 6);
     const labels = sorted.map(([cat]) => cat);
@@ -1002,21 +1005,8 @@ function renderFamilyIncome() {
     const container = document.getElementById('family-income-list');
     if (!container) return;
 
-    const ingresos = filteredTransactions.filter(t => {
-        const isIncomeType = t.Tipo === 'Depósito' || t.Tipo === 'Transferencia Recibida';
-
-        const hasAbonoKeyword = (t.Tipo && t.Tipo.toLowerCase().includes('abono')) ||
-            (t.Categoria && t.Categoria.toLowerCase().includes('abono')) ||
-            (t.Detalle && t.Detalle.toLowerCase().includes('abono'));
-
-        const isInterest = (t.Tipo && t.Tipo.toLowerCase().includes('interes')) ||
-            (t.Categoria && t.Categoria.toLowerCase().includes('interes')) ||
-            (t.Detalle && t.Detalle.toLowerCase().includes('interes'));
-
-        const isCreditCardPayment = hasAbonoKeyword && !isInterest;
-
-        return isIncomeType && !isCreditCardPayment;
-    });
+    const ingresos = filteredTransactions.filter(t =>
+        (t.Tipo === 'Depósito' || t.Tipo === 'Transferencia Recibida') && !t.IsCcPayment);
     const totalIncome = ingresos.reduce((sum, t) => sum + Math.abs(parseFloat(t.Valor) || 0), 0);
 
     // Distribute total income among currentFamilyMembers for display purposes
@@ -1063,19 +1053,7 @@ function renderAccounts() {
         const member = t.Miembro || 'Desconocido';
         const key = `${bank}|${member}`; // Unique key per bank+member
         const value = parseFloat(t.Valor) || 0;
-        const isIncomeType = t.Tipo === 'Depósito' || t.Tipo === 'Transferencia Recibida';
-
-        const hasAbonoKeyword = (t.Tipo && t.Tipo.toLowerCase().includes('abono')) ||
-            (t.Categoria && t.Categoria.toLowerCase().includes('abono')) ||
-            (t.Detalle && t.Detalle.toLowerCase().includes('abono'));
-
-        const isInterest = (t.Tipo && t.Tipo.toLowerCase().includes('interes')) ||
-            (t.Categoria && t.Categoria.toLowerCase().includes('interes')) ||
-            (t.Detalle && t.Detalle.toLowerCase().includes('interes'));
-
-        const isCreditCardPayment = hasAbonoKeyword && !isInterest;
-
-        const isIncome = isIncomeType && !isCreditCardPayment;
+        const isIncome = (t.Tipo === 'Depósito' || t.Tipo === 'Transferencia Recibida') && !t.IsCcPayment;
 
         if (!accountBalances[key]) {
             accountBalances[key] = { bank, member, balance: 0 };
@@ -1127,25 +1105,8 @@ function renderGastosTable() {
 
     // Start with expense-type transactions from all (not just filtered by global period)
     // Start with expense-type transactions from all (not just filtered by global period)
-    let gastos = allTransactions.filter(t => {
-        const includeAbonoTC = document.getElementById('include-abono-check')?.checked ?? false;
-
-        const isExpenseType = t.Tipo === 'Compra' || t.Tipo === 'Retiro' || t.Tipo === 'Débito' ||
-            t.Tipo === 'Gasto' || t.Tipo === 'Pago' || t.Tipo === 'Cargo';
-
-        const hasAbonoKeyword = (t.Tipo && t.Tipo.toLowerCase().includes('abono')) ||
-            (t.Categoria && t.Categoria.toLowerCase().includes('abono')) ||
-            (t.Detalle && t.Detalle.toLowerCase().includes('abono'));
-
-        // Robust interest check
-        const isInterest = (t.Tipo && t.Tipo.toLowerCase().includes('interes')) ||
-            (t.Categoria && t.Categoria.toLowerCase().includes('interes')) ||
-            (t.Detalle && t.Detalle.toLowerCase().includes('interes'));
-
-        const isAbonoPayment = hasAbonoKeyword && !isInterest;
-
-        return isExpenseType || (includeAbonoTC && isAbonoPayment);
-    });
+    const includeAbonoTC = document.getElementById('include-abono-check')?.checked ?? false;
+    let gastos = allTransactions.filter(t => t.IsExpense || (includeAbonoTC && t.IsCcPayment));
 
     // Apply advanced filters
     gastos = filterByAdvancedCriteria(gastos, filters);
@@ -1254,23 +1215,7 @@ function renderIngresosTable() {
     const filters = getIngresosFilterValues();
 
     // Start with income-type transactions from all (Abono excluded - TC payments are not income)
-    let ingresos = allTransactions.filter(t => {
-        const isIncomeType = t.Tipo === 'Depósito' || t.Tipo === 'Transferencia Recibida' ||
-            t.Tipo === 'Ingreso' || t.Tipo === 'Sueldo' || t.Tipo === 'Salario';
-        // Exclude any transaction with 'Abono' in Tipo, Categoria, or Detalle
-        const hasAbonoKeyword = (t.Tipo && t.Tipo.toLowerCase().includes('abono')) ||
-            (t.Categoria && t.Categoria.toLowerCase().includes('abono')) ||
-            (t.Detalle && t.Detalle.toLowerCase().includes('abono'));
-
-        const isInterest = (t.Tipo && t.Tipo.toLowerCase().includes('interes')) ||
-            (t.Categoria && t.Categoria.toLowerCase().includes('interes')) ||
-            (t.Detalle && t.Detalle.toLowerCase().includes('interes'));
-
-        // It is a credit card payment (to exclude) ONLY if it says Abono AND is NOT interest
-        const isCreditCardPayment = hasAbonoKeyword && !isInterest;
-
-        return isIncomeType && !isCreditCardPayment;
-    });
+    let ingresos = allTransactions.filter(t => t.IsIncome);
 
     // Apply advanced filters
     ingresos = filterByAdvancedCriteria(ingresos, filters);
@@ -1389,42 +1334,13 @@ async function fetchAIRecommendations() {
     `;
 
     // Calculate summary data
-    const gastos = filteredTransactions.filter(t => {
-        const includeAbonoTC = document.getElementById('include-abono-check')?.checked ?? false;
-
-        const isExpenseType = t.Tipo === 'Compra' || t.Tipo === 'Retiro' || t.Tipo === 'Débito' ||
-            t.Tipo === 'Gasto' || t.Tipo === 'Pago' || t.Tipo === 'Cargo';
+    const includeAbonoTC = document.getElementById('include-abono-check')?.checked ?? false;
+    const gastos = filteredTransactions.filter(t => t.IsExpense || (includeAbonoTC && t.IsCcPayment));
 
-        const hasAbonoKeyword = (t.Tipo && t.Tipo.toLowerCase().includes('abono')) ||
-            (t.Categoria && t.Categoria.toLowerCase().includes('abono')) ||
-            (t.Detalle && t.Detalle.toLowerCase().includes('abono'));
-
-        const isInterest = (t.Tipo && t.Tipo.toLowerCase().includes('interes')) ||
-            (t.Categoria && t.Categoria.toLowerCase().includes('interes')) ||
-            (t.Detalle && t.Detalle.toLowerCase().includes('interes'));
-
-        const isAbonoPayment = hasAbonoKeyword && !isInterest;
-
-        return isExpenseType || (includeAbonoTC && isAbonoPayment);
-    });
 
 
-
-    const ingresos = filteredTransactions.filter(t => {
-        const isIncomeType = t.Tipo === 'Depósito' || t.Tipo === 'Transferencia Recibida';
-
-        const hasAbonoKeyword = (t.Tipo && t.Tipo.toLowerCase().includes('abono')) ||
-            (t.Categoria && t.Categoria.toLowerCase().includes('abono')) ||
-            (t.Detalle && t.Detalle.toLowerCase().includes('abono'));
-
-        const isInterest = (t.Tipo && t.Tipo.toLowerCase().includes('interes')) ||
-            (t.Categoria && t.Categoria.toLowerCase().includes('interes')) ||
-            (t.Detalle && t.Detalle.toLowerCase().includes('interes'));
-
-        const isCreditCardPayment = hasAbonoKeyword && !isInterest;
-
-        return isIncomeType && !isCreditCardPayment;
-    });
+    const ingresos = filteredTransactions.filter(t =>
+        (t.Tipo === 'Depósito' || t.Tipo === 'Transferencia Recibida') && !t.IsCcPayment);
     const totalGastos = gastos.reduce((sum, t) => sum + Math.abs(parseFloat(t.Valor) || 0), 0);
     const totalIngresos = ingresos.reduce((sum, t) => sum + Math.abs(parseFloat(t.Valor) || 0), 0);
 
@@ -1712,7 +1628,8 @@ async function handleFile(file) {
             producto: t.Producto,
             numero_producto: t.NumeroProducto,
             miembro: t.Miembro,
-            family_id: getCurrentFamilyId() // Add Family ID
+            family_id: getCurrentFamilyId(), // Add Family ID
+            ...computeTipoFlags(t.Tipo, t.Categoria, t.Detalle)
         }));
 
         console.log('📤 Uploading to Supabase...', payload.length);
@@ -1919,17 +1836,16 @@ function applyResumenFilters() {
         if (yearFilter !== 'all' && date.getFullYear() !== parseInt(yearFilter)) return false;
 
         // Member filter (from selectedMembers global)
-        // If selectedMembers is empty, it means "all members" are selected.
-        const memberMatch = selectedMembers.length === 0 || selectedMembers.includes(t.Miembro);
-
-        // Fallback for legacy data where Miembro might be a name string instead of an ID
-        const legacyMemberMatch = selectedMembers.length === 0 || currentFamilyMembers.some(m =>
-            selectedMembers.includes(m.id) && (m.id === t.Miembro || m.name.toLowerCase() === (t.Miembro || '').toLowerCase())
-        );
-
-        return memberMatch || legacyMemberMatch;
+        return matchesSelectedMembers(t.Miembro);
     });
 
+    rollupFilter = (month, miembro) => {
+        const [year, monthNumber] = month.split('-').map(Number);
+        if (monthFilter !== 'all' && monthNumber - 1 !== parseInt(monthFilter)) return false;
+        if (yearFilter !== 'all' && year !== parseInt(yearFilter)) return false;
+        return matchesSelectedMembers(miembro);
+    };
+
     // Re-render affected components
     renderKPIs();
     renderCharts();
@@ -2272,6 +2188,59 @@ function onCategorySelectChange() {
     }
 }
 
+// Same id as rollups.group_key: sha256 of the group fields joined by \x1f, first 32 hex chars
+async function rollupGroupKey(familyId, month, miembro, categoria, tipoClass) {
+    const payload = new TextEncoder().encode([familyId, month, miembro, categoria, tipoClass].join('\x1f'));
+    const digest = await crypto.subtle.digest('SHA-256', payload);
+    return Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, '0')).join('').slice(0, 32);
+}
+
+// A category edit moves the row to another rollup group: both groups are adjusted in
+// movimientos_rollups and in monthlyRollups, otherwise the KPIs and the donut keep the
+// old category (the row count doesn't change, so getFilteredRollups can't notice).
+// On any error the rollups are dropped and the summaries scan allTransactions instead.
+async function moveRollupRow(transaction, from, to) {
+    if (from.categoria === to.categoria && from.tipo_class === to.tipo_class) return;
+    const familyId = getCurrentFamilyId();
+    const month = String(transaction.Fecha || '').slice(0, 7);
+    const miembro = transaction.Miembro || '';
+    const valor = Number(transaction.Valor) || 0;
+    try {
+        const moves = [];
+        for (const [group, sign] of [[from, -1], [to, 1]]) {
+            const key = await rollupGroupKey(familyId, month, miembro, group.categoria || 'Otros', group.tipo_class);
+            moves.push({ key, group, sign });
+        }
+        const { data: current, error } = await supabaseClient
+            .from('movimientos_rollups')
+            .select('group_key,month,miembro,categoria,tipo_class,total,total_abs,row_count')
+            .in('group_key', moves.map(m => m.key));
+        if (error) throw error;
+
+        for (const { key, group, sign } of moves) {
+            const row = (current || []).find(r => r.group_key === key) || {
+                group_key: key, month, miembro, categoria: group.categoria || 'Otros',
+                tipo_class: group.tipo_class, total: 0, total_abs: 0, row_count: 0
+            };
+            row.total = Math.round((Number(row.total) + sign * valor) * 100) / 100;
+            row.total_abs = Math.round((Number(row.total_abs) + sign * Math.abs(valor)) * 100) / 100;
+            row.row_count += sign;
+
+            const result = row.row_count > 0
+                ? await supabaseClient.from('movimientos_rollups')
+                    .upsert({ ...row, family_id: familyId }, { onConflict: 'group_key' })
+                : await supabaseClient.from('movimientos_rollups').delete().eq('group_key', key);
+            if (result.error) throw result.error;
+
+            monthlyRollups = monthlyRollups.filter(r => r.group_key !== key);
+            if (row.row_count > 0) monthlyRollups.push(row);
+        }
+    } catch (error) {
+        console.warn('Rollups not updated, summaries will scan transactions:', error);
+        monthlyRollups = [];
+    }
+}
+
 async function saveEditCategory() {
     const indexStr = document.getElementById('edit-transaction-index').value;
     const index = parseInt(indexStr, 10);
@@ -2298,9 +2267,11 @@ async function saveEditCategory() {
     // Update transaction in Supabase
     const transaction = allTransactions[index];
     if (transaction && transaction.id) {
+        // The flags look at categoria too ('Abono TC', 'Intereses')
+        const flags = computeTipoFlags(transaction.Tipo, newCategory, transaction.Detalle);
         const { error } = await supabaseClient
             .from('movimientos')
-            .update({ categoria: newCategory })
+            .update({ categoria: newCategory, ...flags })
             .eq('id', transaction.id);
 
         if (error) {
@@ -2309,8 +2280,18 @@ async function saveEditCategory() {
             return;
         }
 
+        const previous = { categoria: transaction.Categoria, tipo_class: transaction.TipoClass };
+        await moveRollupRow(transaction, previous, { categoria: newCategory, tipo_class: flags.tipo_class });
+
         // Update local state
-        allTransactions[index].Categoria = newCategory;
+        Object.assign(allTransactions[index], {
+            Categoria: newCategory,
+            IsExpense: flags.is_expense,
+            IsIncome: flags.is_income,
+            IsCcPayment: flags.is_cc_payment,
+            IsInterest: flags.is_interest,
+            TipoClass: flags.tipo_class
+        });
         applyFilters();
         renderAll();
         closeEditCategoryModal();
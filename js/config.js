@@ -17,6 +17,7 @@ const CONFIG = {
 
     // App Settings
     ITEMS_PER_PAGE: 10,
+    LOAD_PAGE_SIZE: 1000, // Rows per request when loading movimientos (PostgREST max-rows)
     DEFAULT_PERIOD: '6months',
     CURRENCY: 'COP',
     LOCALE: 'es-CO',
@@ -0,0 +1,296 @@
+# Incremental index of unclassified merchants ('Otros')
+# Frequency and total value per normalized detalle, kept per source in SQLite so a
+# source is only re-read when its content changes. Near-variants ("COMPRA EN NOVAVENTA",
+# "NOVAVENTA BOG", "R06 CREPESYWAFFLES WTC") are grouped with MinHash signatures over
+# character 3-grams and LSH banding (no pairwise comparison), and every cluster gets a
+# suggested category from the classified merchants (and CATEGORY_MAPPING) in its buckets.
+
+import os
+import re
+import sqlite3
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+from category_mapping import CATEGORY_MAPPING
+from classification_cache import CACHE_DIR, get_classification_cache, normalize_detalle
+from dedupe import merchant_key
+
+INDEX_FILE = os.path.join(CACHE_DIR, "merchant_index.sqlite3")
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+BANDS, BAND_ROWS = 16, 4        # Pairs above ~0.5 Jaccard share a bucket with high probability
+CLUSTER_SIMILARITY = 0.5        # Estimated Jaccard to join two Otros detalles in one cluster
+SUGGEST_SIMILARITY = 0.4        # Estimated Jaccard for a classified neighbour to vote
+MAX_BUCKET_SCAN = 50            # Classified neighbours looked at per bucket
+SIGNATURE_VERSION = f"{SHINGLE_SIZE}:{NUM_PERM}:1"
+SQLITE_BATCH = 500
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.RandomState(20260101)  # Fixed seed: signatures are stored across runs
+_PERM_A = _rng.randint(1, _PRIME, NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, _PRIME, NUM_PERM).astype(np.uint64)
+_DIGITS = re.compile(r'\d+')
+
+
+def cluster_text(detalle):
+    """Text compared between merchants: merchant_key without store/account numbers or spaces."""
+    tokens = merchant_key(detalle).split()
+    kept = [t for t in (_DIGITS.sub('', t) for t in tokens) if len(t) > 1] or tokens
+    return "".join(kept)
+
+
+def shingles(text):
+    if len(text) <= SHINGLE_SIZE:
+        return {text}
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text):
+    """NUM_PERM uint32 minimums of (a*h + b) mod p over the shingle hashes."""
+    hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) % _PRIME for s in shingles(text)), dtype=np.uint64)
+    return ((np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard of the shingle sets."""
+    return float(np.count_nonzero(sig_a == sig_b)) / NUM_PERM
+
+
+def _bands(signature):
+    raw = signature.tobytes()
+    width = BAND_ROWS * 4
+    return [(b, raw[b * width:(b + 1) * width]) for b in range(BANDS)]
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, x):
+        parent = self.parent
+        parent.setdefault(x, x)
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[rb] = ra
+
+
+class MerchantIndex:
+    """Per-source merchant stats plus cached MinHash signatures, in one SQLite file."""
+
+    def __init__(self, path=INDEX_FILE):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS sources (source TEXT PRIMARY KEY, sha256 TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS merchant_stats ("
+            " source TEXT NOT NULL, detalle TEXT NOT NULL, sample TEXT NOT NULL,"
+            " count INTEGER NOT NULL, total REAL NOT NULL, PRIMARY KEY (source, detalle));"
+            "CREATE TABLE IF NOT EXISTS signatures ("
+            " version TEXT NOT NULL, text TEXT NOT NULL, signature BLOB NOT NULL,"
+            " PRIMARY KEY (version, text));"
+        )
+        self.conn.execute("DELETE FROM signatures WHERE version != ?", (SIGNATURE_VERSION,))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    # ---- incremental stats ---------------------------------------------
+    def is_current(self, source, sha256):
+        row = self.conn.execute("SELECT sha256 FROM sources WHERE source = ?", (source,)).fetchone()
+        return row is not None and row[0] == sha256
+
+    def update_source(self, source, sha256, rows):
+        """Replaces the stats of one source with rows of (detalle, valor)."""
+        stats = {}
+        for detalle, valor in rows:
+            detalle = '' if detalle is None else str(detalle)
+            key = normalize_detalle(detalle)
+            try:
+                valor = float(valor or 0)
+            except (TypeError, ValueError):
+                valor = 0.0
+            if valor != valor:
+                valor = 0.0
+            s = stats.get(key)
+            if s is None:
+                stats[key] = [detalle.strip(), 1, abs(valor)]
+            else:
+                s[1] += 1
+                s[2] += abs(valor)
+        with self.conn:
+            self.conn.execute("DELETE FROM merchant_stats WHERE source = ?", (source,))
+            self.conn.executemany(
+                "INSERT INTO merchant_stats (source, detalle, sample, count, total) VALUES (?, ?, ?, ?, ?)",
+                [(source, k, sample, count, total) for k, (sample, count, total) in stats.items()],
+            )
+            self.conn.execute("INSERT OR REPLACE INTO sources (source, sha256) VALUES (?, ?)", (source, sha256))
+        return len(stats)
+
+    def merchants(self):
+        """{normalized detalle: [sample, count, total]} over every indexed source."""
+        out = {}
+        for key, sample, count, total in self.conn.execute(
+                "SELECT detalle, sample, SUM(count), SUM(total) FROM merchant_stats GROUP BY detalle"):
+            out[key] = [sample, count, total]
+        return out
+
+    # ---- signatures ----------------------------------------------------
+    def signatures(self, texts):
+        """{text: signature}, computing (and storing) only the ones not seen before."""
+        texts = list(texts)
+        found = {}
+        for i in range(0, len(texts), SQLITE_BATCH):
+            chunk = texts[i:i + SQLITE_BATCH]
+            placeholders = ",".join("?" * len(chunk))
+            for text, blob in self.conn.execute(
+                    f"SELECT text, signature FROM signatures WHERE version = ? AND text IN ({placeholders})",
+                    [SIGNATURE_VERSION, *chunk]):
+                found[text] = np.frombuffer(blob, dtype=np.uint32)
+        missing = [t for t in texts if t not in found]
+        for t in missing:
+            found[t] = minhash(t)
+        if missing:
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO signatures (version, text, signature) VALUES (?, ?, ?)",
+                    [(SIGNATURE_VERSION, t, found[t].tobytes()) for t in missing],
+                )
+        return found
+
+    # ---- clusters ------------------------------------------------------
+    def clusters(self, cache=None):
+        """Otros merchants grouped by similarity, most frequent first.
+
+        Each cluster: {label, count, total, variants [(sample, count, total)],
+        suggested, confidence, neighbour}.
+        """
+        cache = cache or get_classification_cache()
+        merchants = self.merchants()
+        keys = list(merchants)
+        categories = dict(zip(keys, cache.classify_keys(keys)))
+
+        # Classified references: indexed merchants with a category, plus the mapping itself
+        references = {}
+        for key, categoria in categories.items():
+            if categoria != 'Otros':
+                references.setdefault(cluster_text(key), (categoria, merchants[key][1], merchants[key][0]))
+        for categoria, names in CATEGORY_MAPPING.items():
+            for name in names:
+                references.setdefault(cluster_text(name), (categoria, 1, name))
+        references.pop('', None)
+
+        otros = defaultdict(list)  # cluster text -> detalle keys
+        for key, categoria in categories.items():
+            if categoria == 'Otros':
+                otros[cluster_text(key)].append(key)
+
+        signatures = self.signatures(t for t in set(otros) | set(references) if t)
+
+        # LSH: one pass over the bands, each Otros text is compared with its bucket's first member only
+        uf = _UnionFind()
+        otros_buckets = {}
+        reference_buckets = defaultdict(list)
+        for text in references:
+            for band in _bands(signatures[text]):
+                bucket = reference_buckets[band]
+                if len(bucket) < MAX_BUCKET_SCAN:
+                    bucket.append(text)
+        for text in otros:
+            uf.find(text)
+            if not text:
+                continue
+            for band in _bands(signatures[text]):
+                first = otros_buckets.setdefault(band, text)
+                if first != text and similarity(signatures[first], signatures[text]) >= CLUSTER_SIMILARITY:
+                    uf.union(first, text)
+
+        members = defaultdict(list)
+        for text in otros:
+            members[uf.find(text)].append(text)
+
+        result = []
+        for texts in members.values():
+            variants = sorted((merchants[k] for t in texts for k in otros[t]), key=lambda v: (-v[1], -v[2]))
+            cluster = {
+                "label": variants[0][0] or "(sin detalle)",
+                "count": sum(v[1] for v in variants),
+                "total": round(sum(v[2] for v in variants), 2),
+                "variants": [tuple(v) for v in variants],
+                "suggested": None,
+                "confidence": 0.0,
+                "neighbour": None,
+            }
+            cluster.update(self._suggest(texts, signatures, references, reference_buckets))
+            result.append(cluster)
+        result.sort(key=lambda c: (-c["count"], -c["total"]))
+        return result
+
+    def _suggest(self, texts, signatures, references, reference_buckets):
+        """Category voted by the classified neighbours sharing an LSH bucket with the cluster."""
+        votes = defaultdict(float)
+        best = (0.0, None)
+        for text in texts:
+            if not text:
+                continue
+            seen = set()
+            for band in _bands(signatures[text]):
+                for ref in reference_buckets.get(band, ()):
+                    if ref in seen:
+                        continue
+                    seen.add(ref)
+                    sim = similarity(signatures[text], signatures[ref])
+                    if sim < SUGGEST_SIMILARITY:
+                        continue
+                    categoria, count, sample = references[ref]
+                    votes[categoria] += sim * count
+                    if sim > best[0]:
+                        best = (sim, sample)
+        if not votes:
+            return {}
+        suggested = max(votes, key=votes.get)
+        return {"suggested": suggested,
+                "confidence": round(votes[suggested] / sum(votes.values()), 2),
+                "neighbour": best[1]}
+
+
+def print_clusters(clusters, limit=20):
+    print(f"Top {limit} Unclassified Merchant Clusters ({len(clusters)} clusters):")
+    for c in clusters[:limit]:
+        extra = f" (+{len(c['variants']) - 1} variantes)" if len(c['variants']) > 1 else ""
+        line = f"{c['count']} | ${c['total']:,.0f} | {c['label']}{extra}"
+        if c["suggested"]:
+            line += f"  -> {c['suggested']} ({c['confidence']:.0%}, como '{c['neighbour']}')"
+        print(line)
+        for sample, count, _ in c["variants"][1:4]:
+            print(f"      {count} | {sample}")
+
+
+if __name__ == "__main__":
+    # python merchant_index.py [movimientos.json]  ->  index the pipeline output and print clusters
+    import sys
+    from movimientos_io import load_movimientos
+    from source_manifest import file_sha256
+    from upload_to_supabase import JSON_FILE
+
+    json_file = sys.argv[1] if len(sys.argv) > 1 else JSON_FILE
+    index = MerchantIndex()
+    sha256 = file_sha256(json_file)
+    if not index.is_current(json_file, sha256):
+        rows = load_movimientos(json_file, columns=['detalle', 'valor'])
+        n = index.update_source(json_file, sha256, ((m['detalle'], m['valor']) for m in rows))
+        print(f"📇 Indexed {n} distinct detalles from {json_file}")
+    print_clusters(index.clusters())
+    index.close()
@@ -0,0 +1,374 @@
+# Compact in-memory store for movimientos
+# Columnar and typed instead of one dict per row: text columns are dictionary-encoded
+# (int32 codes into a list of distinct values), fecha is an int32 day number and valor
+# is int64 centavos. A row costs ~40 bytes instead of ~1.5 KB of dict + strings, and
+# aggregations run over NumPy arrays of the codes.
+# Values the typed columns can't hold exactly (NaN, more than 2 decimals, fechas that
+# are not ISO dates) and rows with other keys are kept as-is in small side tables, so
+# iterating gives back exactly the dicts that went in.
+
+import datetime
+import os
+from array import array
+
+import numpy as np
+
+from tipo_flags import FLAG_FIELDS
+
+FIELDS = ('banco', 'tipo', 'valor', 'fecha', 'producto', 'numero_producto', 'detalle', 'categoria')
+TEXT_FIELDS = ('banco', 'tipo', 'producto', 'numero_producto', 'detalle', 'categoria')
+NULL_DAY = -2 ** 31          # fecha None
+OTHER_DAY = -2 ** 31 + 1     # fecha kept in the side table
+NULL_CENTS = -2 ** 63        # valor None
+OTHER_CENTS = -2 ** 63 + 1   # valor kept in the side table
+EPOCH = datetime.date(1970, 1, 1).toordinal()
+
+
+class _Dictionary:
+    """Distinct values of one column; a code is the position in values."""
+
+    __slots__ = ("values", "index")
+
+    def __init__(self):
+        self.values = []
+        self.index = {}
+
+    def code(self, value):
+        # Keyed with the type so 1 / 1.0 / True stay apart; every NaN shares one code
+        key = (type(value), 'nan' if value != value else value)
+        c = self.index.get(key)
+        if c is None:
+            c = self.index[key] = len(self.values)
+            self.values.append(value)
+        return c
+
+
+def _days(fecha):
+    if fecha is None:
+        return NULL_DAY
+    if type(fecha) is str and len(fecha) == 10:
+        try:
+            return datetime.date.fromisoformat(fecha).toordinal() - EPOCH
+        except ValueError:
+            pass
+    return OTHER_DAY
+
+
+def _cents(valor):
+    if valor is None:
+        return NULL_CENTS
+    if type(valor) is float and valor == valor:
+        cents = round(valor * 100)
+        if cents / 100 == valor and abs(cents) < 2 ** 62:
+            return cents
+    return OTHER_CENTS
+
+
+def _exact_cents(cents, exact, is_null):
+    """int64 column from rounded float cents (sentinels set directly: they don't survive a float)."""
+    out = np.full(len(cents), OTHER_CENTS, dtype=np.int64)
+    out[is_null] = NULL_CENTS
+    out[exact] = cents[exact].astype(np.int64)
+    return out
+
+
+class MovimientoStore:
+    """Append-only columnar list of movimientos; iterating yields dicts."""
+
+    def __init__(self):
+        self.dictionaries = {f: _Dictionary() for f in TEXT_FIELDS}
+        self.codes = {f: array('i') for f in TEXT_FIELDS}
+        self.fecha = array('i')
+        self.valor = array('q')
+        self.tags = array('h')   # optional small label per row (e.g. the source), -1 = none
+        self.tag_names = _Dictionary()
+        self._other_fecha = {}   # row -> original fecha
+        self._other_valor = {}   # row -> original valor
+        self._irregular = {}     # row -> original dict (keys other than FIELDS, in order)
+        self._fecha_text = {}
+
+    def __len__(self):
+        return len(self.valor)
+
+    # ---- building ------------------------------------------------------
+    def append(self, m, tag=None):
+        i = len(self.valor)
+        get = m.get
+        for f in TEXT_FIELDS:
+            self.codes[f].append(self.dictionaries[f].code(get(f)))
+        days = _days(get('fecha'))
+        if days == OTHER_DAY:
+            self._other_fecha[i] = m['fecha']
+        self.fecha.append(days)
+        cents = _cents(get('valor'))
+        if cents == OTHER_CENTS:
+            self._other_valor[i] = m['valor']
+        self.valor.append(cents)
+        if len(m) != len(FIELDS) or tuple(m) != FIELDS:
+            self._irregular[i] = dict(m)
+        self.tags.append(-1 if tag is None else self.tag_names.code(tag))
+
+    def extend(self, movimientos, tag=None):
+        for m in movimientos:
+            self.append(m, tag)
+        return self
+
+    @classmethod
+    def from_movimientos(cls, movimientos):
+        return cls().extend(movimientos)
+
+    @classmethod
+    def from_frame(cls, df):
+        """Same rows as df[list(FIELDS)].to_dict('records'), built column-wise without the dicts."""
+        import pandas as pd
+        store = cls()
+        n = len(df)
+        for f in TEXT_FIELDS:
+            column = df[f]
+            codes, uniques = pd.factorize(column)
+            store._set_codes(f, codes, uniques.tolist() + [None])
+            # factorize folds None and NaN together: code missing values from the originals
+            d, field_codes = store.dictionaries[f], store.codes[f]
+            missing = np.flatnonzero(codes == -1)
+            if not len(missing):
+                continue
+            values = column.to_numpy(dtype=object)[missing]
+            is_none = np.equal(values, None)
+            np.frombuffer(field_codes, dtype=np.int32)[missing[is_none]] = d.code(None)
+            for i, value in zip(missing[~is_none].tolist(), values[~is_none].tolist()):
+                field_codes[i] = d.code(value.item() if isinstance(value, np.generic) else value)
+
+        fecha = df['fecha']
+        parsed = pd.to_datetime(fecha, format='%Y-%m-%d', errors='coerce')
+        iso = (parsed.notna() & fecha.map(lambda v: type(v) is str and len(v) == 10)).to_numpy()
+        days = np.where(fecha.isna().to_numpy(), NULL_DAY, OTHER_DAY).astype(np.int64)
+        days[iso] = parsed[iso].to_numpy().astype('datetime64[D]').astype(np.int64)
+        store.fecha = array('i', days.astype(np.int32).tobytes())
+        for i in np.flatnonzero(days == OTHER_DAY).tolist():
+            store._other_fecha[i] = fecha.iat[i]
+
+        valor = df['valor'].to_numpy(dtype=float)
+        with np.errstate(invalid='ignore'):
+            cents = np.round(valor * 100)
+            exact = np.isfinite(valor) & (cents / 100 == valor) & (np.abs(cents) < 2 ** 62)
+        store.valor = array('q', _exact_cents(cents, exact, np.zeros(n, dtype=bool)).tobytes())
+        for i in np.flatnonzero(~exact).tolist():
+            store._other_valor[i] = float(valor[i])
+        store.tags = array('h', [-1]) * n
+        return store
+
+    @classmethod
+    def from_arrow(cls, table):
+        """From a pyarrow Table of the Parquet output (dictionary columns are reused as-is).
+        Columns missing from the table come back as None."""
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        store = cls()
+        n = table.num_rows
+        for f in TEXT_FIELDS:
+            if f not in table.column_names:
+                store._set_codes(f, np.zeros(n, dtype=np.int64), [None])
+                continue
+            column = table.column(f).combine_chunks()
+            if not pa.types.is_dictionary(column.type):
+                column = column.dictionary_encode()
+            # Nulls get code len(dictionary) -> None
+            values = column.dictionary.to_pylist() + [None]
+            codes = pc.fill_null(column.indices, len(values) - 1).to_numpy(zero_copy_only=False)
+            store._set_codes(f, codes, values)
+
+        if 'fecha' in table.column_names:
+            fecha = table.column('fecha').combine_chunks()
+            days = pc.fill_null(fecha.cast(pa.int32()), NULL_DAY).to_numpy(zero_copy_only=False)
+        else:
+            days = np.full(n, NULL_DAY, dtype=np.int32)
+        store.fecha = array('i', days.astype(np.int32).tobytes())
+
+        if 'valor' in table.column_names:
+            valor = table.column('valor').combine_chunks()
+            floats = pc.fill_null(valor, np.nan).to_numpy(zero_copy_only=False)
+            is_null = valor.is_null().to_numpy(zero_copy_only=False)
+        else:
+            floats, is_null = np.full(n, np.nan), np.ones(n, dtype=bool)
+        with np.errstate(invalid='ignore'):
+            cents = np.round(floats * 100)
+            exact = np.isfinite(floats) & (cents / 100 == floats) & (np.abs(cents) < 2 ** 62)
+        store.valor = array('q', _exact_cents(cents, exact, is_null).tobytes())
+        for i in np.flatnonzero(~exact & ~is_null).tolist():
+            store._other_valor[i] = float(floats[i])
+        store.tags = array('h', [-1]) * n
+        return store
+
+    def _set_codes(self, field, codes, values):
+        d = self.dictionaries[field]
+        remap = np.array([d.code(v) for v in values], dtype=np.int32)
+        self.codes[field] = array('i', remap[np.asarray(codes, dtype=np.int64)].tobytes())
+
+    # ---- rows ----------------------------------------------------------
+    def _fecha_value(self, i):
+        days = self.fecha[i]
+        if days == NULL_DAY:
+            return None
+        if days == OTHER_DAY:
+            return self._other_fecha[i]
+        text = self._fecha_text.get(days)
+        if text is None:
+            text = self._fecha_text[days] = datetime.date.fromordinal(days + EPOCH).isoformat()
+        return text
+
+    def _valor_value(self, i):
+        cents = self.valor[i]
+        if cents == NULL_CENTS:
+            return None
+        if cents == OTHER_CENTS:
+            return self._other_valor[i]
+        return cents / 100
+
+    def row(self, i):
+        """The movimiento dict of row i (a fresh dict: changes do not go back to the store)."""
+        if i in self._irregular:
+            return dict(self._irregular[i])
+        d, c = self.dictionaries, self.codes
+        return {
+            "banco": d['banco'].values[c['banco'][i]],
+            "tipo": d['tipo'].values[c['tipo'][i]],
+            "valor": self._valor_value(i),
+            "fecha": self._fecha_value(i),
+            "producto": d['producto'].values[c['producto'][i]],
+            "numero_producto": d['numero_producto'].values[c['numero_producto'][i]],
+            "detalle": d['detalle'].values[c['detalle'][i]],
+            "categoria": d['categoria'].values[c['categoria'][i]],
+        }
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.row(i)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.row(i)
+
+    def tagged_rows(self):
+        """Yields (tag, movimiento)."""
+        names = self.tag_names.values
+        for i in range(len(self)):
+            t = self.tags[i]
+            yield (names[t] if t >= 0 else None), self.row(i)
+
+    # ---- updates -------------------------------------------------------
+    def fill_categoria(self, classify_many, missing=(None, 'Otros', 'nan')):
+        """Classifies the rows whose categoria is in missing, once per distinct detalle."""
+        pending = np.flatnonzero(self.isin('categoria', set(missing)))
+        if not len(pending):
+            return 0
+        detalle_codes = self.column_codes('detalle')[pending]
+        distinct = np.unique(detalle_codes).tolist()
+        detalles = self.values('detalle')
+        by_detalle = dict(zip(distinct, classify_many([detalles[c] for c in distinct])))
+        d, codes = self.dictionaries['categoria'], self.codes['categoria']
+        for i, c in zip(pending.tolist(), detalle_codes.tolist()):
+            categoria = by_detalle[c]
+            codes[i] = d.code(categoria)
+            if i in self._irregular:
+                self._irregular[i]['categoria'] = categoria
+        return len(pending)
+
+    # ---- columnar access -----------------------------------------------
+    def values(self, field):
+        """Distinct values of a text column (indexed by its codes)."""
+        return self.dictionaries[field].values
+
+    def column_codes(self, field):
+        """int32 codes of a text column, as a NumPy copy."""
+        return np.array(self.codes[field], dtype=np.int32)
+
+    def amounts(self):
+        """valor as float64 (NaN where it is missing or not a number)."""
+        cents = np.array(self.valor, dtype=np.int64)
+        out = cents / 100
+        out[cents == NULL_CENTS] = np.nan
+        for i, v in self._other_valor.items():
+            try:
+                out[i] = float(v)
+            except (TypeError, ValueError):
+                out[i] = np.nan
+        return out
+
+    def months(self):
+        """fecha as YYYYMM integers (0 where it is not an ISO date)."""
+        days = np.array(self.fecha, dtype=np.int64)
+        valid = (days != NULL_DAY) & (days != OTHER_DAY)
+        months = np.zeros(len(days), dtype=np.int32)
+        ym = days[valid].astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        months[valid] = (ym // 12 + 1970) * 100 + ym % 12 + 1
+        return months
+
+    def isin(self, field, wanted):
+        """Boolean mask of the rows whose field value is in wanted (tested once per distinct value)."""
+        hits = np.array([v in wanted for v in self.values(field)], dtype=bool)
+        return hits[self.column_codes(field)] if hits.size else np.zeros(len(self), dtype=bool)
+
+    def mentions(self, fields, word):
+        """Boolean mask: the lower-case word appears in any of the text fields."""
+        mask = np.zeros(len(self), dtype=bool)
+        for f in fields:
+            hits = np.array([isinstance(v, str) and word in v.lower() for v in self.values(f)], dtype=bool)
+            if hits.any():
+                mask |= hits[self.column_codes(f)]
+        return mask
+
+    def group_sum(self, fields, weights, mask=None):
+        """{(value, ...): (sum of weights, row count)} grouped by text fields, over the rows in mask."""
+        # One int64 key per row (mixed radix over the codes), then a 1-D unique + bincount
+        key = np.zeros(len(self), dtype=np.int64)
+        radixes = [len(self.values(f)) for f in fields]
+        for f, radix in zip(fields, radixes):
+            key = key * radix + self.column_codes(f)
+        if mask is not None:
+            key, weights = key[mask], weights[mask]
+        if not len(key):
+            return {}
+        groups, inverse = np.unique(key, return_inverse=True)
+        sums = np.bincount(inverse, weights=weights, minlength=len(groups))
+        counts = np.bincount(inverse, minlength=len(groups))
+        out = {}
+        for g, total, count in zip(groups.tolist(), sums.tolist(), counts.tolist()):
+            values = []
+            for f, radix in zip(reversed(fields), reversed(radixes)):
+                g, code = divmod(g, radix)
+                values.append(self.values(f)[code])
+            out[tuple(reversed(values))] = (total, count)
+        return out
+
+    def nbytes(self):
+        """Size of the typed columns (the distinct values are not counted)."""
+        columns = list(self.codes.values()) + [self.fecha, self.valor, self.tags]
+        return sum(len(c) * c.itemsize for c in columns)
+
+
+def load_store(json_path, columns=None):
+    """MovimientoStore of the pipeline output: straight from the Parquet copy when it is
+    current (only the requested columns), else streamed from the JSON/NDJSON."""
+    from movimientos_io import iter_movimientos, pa, parquet_path_for, read_table
+    parquet_file = parquet_path_for(json_path)
+    if pa is not None and os.path.exists(parquet_file) and (
+            not os.path.exists(json_path) or os.path.getmtime(parquet_file) >= os.path.getmtime(json_path)):
+        return MovimientoStore.from_arrow(read_table(parquet_file, columns=columns))
+    store = MovimientoStore()
+    for m in iter_movimientos(json_path):
+        if not columns:
+            # Derived from tipo/categoria/detalle (see tipo_flags.flag_masks); kept out of the layout
+            for f in FLAG_FIELDS:
+                m.pop(f, None)
+        store.append({f: m.get(f) for f in FIELDS} if columns else m)
+    return store
+
+
+def as_store(movimientos):
+    """movimientos as a MovimientoStore (returned unchanged when it already is one)."""
+    if isinstance(movimientos, MovimientoStore):
+        return movimientos
+    return MovimientoStore.from_movimientos(movimientos)
@@ -0,0 +1,368 @@
+# Incremental readers/writers for the pipeline output (movimientos.json / .ndjson)
+# Rows are written one at a time so memory does not grow with the full history.
+# The same rows are also split per family and month (data/movimientos/<family>/<YYYY>/<MM>.ndjson)
+# with a checksum per partition, so later steps only touch the months that changed.
+
+import calendar
+import hashlib
+import json
+import os
+import re
+
+from row_keys import DEFAULT_FAMILY_ID
+
+NDJSON_EXTENSIONS = ('.ndjson', '.jsonl')
+
+
+def is_ndjson(path):
+    return path.lower().endswith(NDJSON_EXTENSIONS)
+
+
+class JsonArrayWriter:
+    """Writes a JSON array one movimiento at a time (same layout as json.dump(indent=2))."""
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._tmp_path = f"{path}.tmp"
+        self._f = None
+
+    def __enter__(self):
+        self._f = open(self._tmp_path, 'w', encoding='utf-8')
+        self._f.write('[')
+        return self
+
+    def write(self, movimiento):
+        body = json.dumps(movimiento, ensure_ascii=False, indent=2).replace('\n', '\n  ')
+        self._f.write(('\n  ' if self.count == 0 else ',\n  ') + body)
+        self.count += 1
+
+    def __exit__(self, exc_type, exc, tb):
+        self._f.write('\n]' if self.count else ']')
+        self._f.close()
+        if exc_type is None:
+            # Only replace the previous output once the new one is complete
+            os.replace(self._tmp_path, self.path)
+        else:
+            os.remove(self._tmp_path)
+        return False
+
+
+class NdjsonWriter(JsonArrayWriter):
+    """Writes one JSON object per line."""
+
+    def __enter__(self):
+        self._f = open(self._tmp_path, 'w', encoding='utf-8')
+        return self
+
+    def write(self, movimiento):
+        self._f.write(json.dumps(movimiento, ensure_ascii=False) + '\n')
+        self.count += 1
+
+    def __exit__(self, exc_type, exc, tb):
+        self._f.close()
+        if exc_type is None:
+            os.replace(self._tmp_path, self.path)
+        else:
+            os.remove(self._tmp_path)
+        return False
+
+
+def open_writer(path):
+    """Picks the writer from the file extension (.ndjson/.jsonl or .json)."""
+    return NdjsonWriter(path) if is_ndjson(path) else JsonArrayWriter(path)
+
+
+def iter_movimientos(path):
+    """Yields movimientos from a .json array or an .ndjson file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        if is_ndjson(path):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from json.load(f)
+
+
+# ---- Columnar output (optional, needs pyarrow) ---------------------------
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional
+    pa = None
+
+PARQUET_BATCH = 50000
+# Low-cardinality columns are dictionary-encoded
+DICTIONARY_COLUMNS = ('banco', 'tipo', 'producto', 'numero_producto', 'categoria', 'tipo_class')
+
+
+def parquet_path_for(json_path):
+    """data/movimientos.json -> data/movimientos.parquet"""
+    return os.path.splitext(json_path)[0] + '.parquet'
+
+
+def _movimientos_schema():
+    dict_string = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('banco', dict_string),
+        ('tipo', dict_string),
+        ('valor', pa.float64()),
+        ('fecha', pa.date32()),
+        ('producto', dict_string),
+        ('numero_producto', dict_string),
+        ('detalle', pa.string()),
+        ('categoria', dict_string),
+        ('is_expense', pa.bool_()),
+        ('is_income', pa.bool_()),
+        ('is_cc_payment', pa.bool_()),
+        ('is_interest', pa.bool_()),
+        ('tipo_class', dict_string),
+    ])
+
+
+class ParquetWriter:
+    """Buffers movimientos and writes them as Parquet row groups with typed columns."""
+
+    def __init__(self, path, batch_size=PARQUET_BATCH):
+        if pa is None:
+            raise ImportError("pyarrow is required for Parquet output (pip install pyarrow)")
+        self.path = path
+        self.batch_size = batch_size
+        self.count = 0
+        self.schema = _movimientos_schema()
+        self._tmp_path = f"{path}.tmp"
+        self._buffer = []
+        self._writer = None
+
+    def __enter__(self):
+        self._writer = pq.ParquetWriter(self._tmp_path, self.schema, compression='zstd')
+        return self
+
+    def write(self, movimiento):
+        self._buffer.append(movimiento)
+        self.count += 1
+        if len(self._buffer) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        columns = {name: [m.get(name) for m in self._buffer] for name in self.schema.names}
+        arrays = []
+        for field in self.schema:
+            values = columns[field.name]
+            if field.name == 'fecha':
+                text = pa.array([v[:10] if v else None for v in values], pa.string())
+                arrays.append(pc.cast(pc.strptime(text, format='%Y-%m-%d', unit='s', error_is_null=True), pa.date32()))
+            elif field.name in DICTIONARY_COLUMNS:
+                arrays.append(pa.array(values, pa.string()).dictionary_encode())
+            else:
+                arrays.append(pa.array(values, field.type))
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+        self._buffer = []
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self._flush()
+        self._writer.close()
+        if exc_type is None:
+            os.replace(self._tmp_path, self.path)
+        else:
+            os.remove(self._tmp_path)
+        return False
+
+
+class FanoutWriter:
+    """Writes every movimiento to several writers (e.g. JSON + Parquet)."""
+
+    def __init__(self, *writers):
+        self.writers = writers
+        self.count = 0
+
+    def __enter__(self):
+        for w in self.writers:
+            w.__enter__()
+        return self
+
+    def write(self, movimiento):
+        for w in self.writers:
+            w.write(movimiento)
+        self.count += 1
+
+    def __exit__(self, exc_type, exc, tb):
+        for w in self.writers:
+            w.__exit__(exc_type, exc, tb)
+        return False
+
+
+def read_table(path, columns=None, filters=None):
+    """Reads the Parquet output as a pyarrow Table (memory-mapped, only the requested columns)."""
+    if pa is None:
+        raise ImportError("pyarrow is required to read Parquet output (pip install pyarrow)")
+    return pq.read_table(path, columns=columns, filters=filters, memory_map=True)
+
+
+def load_movimientos(json_path, columns=None):
+    """Loads movimientos as dicts, preferring the Parquet sibling of json_path when it is current.
+
+    With columns, only those fields are read from Parquet (and kept from JSON).
+    """
+    parquet_file = parquet_path_for(json_path)
+    use_parquet = (
+        pa is not None
+        and os.path.exists(parquet_file)
+        and (not os.path.exists(json_path) or os.path.getmtime(parquet_file) >= os.path.getmtime(json_path))
+    )
+    if use_parquet:
+        table = read_table(parquet_file, columns=columns)
+        if 'fecha' in table.column_names:
+            idx = table.column_names.index('fecha')
+            table = table.set_column(idx, 'fecha', pc.strftime(table.column('fecha'), format='%Y-%m-%d'))
+        return table.to_pylist()
+
+    rows = iter_movimientos(json_path)
+    if columns:
+        return [{c: m.get(c) for c in columns} for m in rows]
+    return list(rows)
+
+
+# ---- Partitioned output (family/year/month NDJSON + checksum index) -------
+
+PARTITION_INDEX = 'index.json'
+_MONTH = re.compile(r'\d{4}-\d{2}')
+UNDATED_MONTH = '0000-00'  # Rows whose fecha isn't a date still land in a partition
+
+
+def partition_root_for(json_path):
+    """data/movimientos.json -> data/movimientos/ (holds <family>/<YYYY>/<MM>.ndjson and index.json)"""
+    return os.path.splitext(json_path)[0]
+
+
+def partition_index_path(json_path):
+    return os.path.join(partition_root_for(json_path), PARTITION_INDEX)
+
+
+def partition_key(movimiento):
+    """'<family_id>/<YYYY-MM>' of a movimiento."""
+    month = str(movimiento.get('fecha') or '')[:7]
+    return f"{movimiento.get('family_id') or DEFAULT_FAMILY_ID}/{month if _MONTH.fullmatch(month) else UNDATED_MONTH}"
+
+
+def split_partition_key(key):
+    """'default/2026-01' -> ('default', '2026-01')"""
+    family_id, _, month = key.rpartition('/')
+    return family_id, month
+
+
+def month_range(month):
+    """'2025-03' -> ('2025-03-01', '2025-03-31')"""
+    year, mon = (int(p) for p in month.split('-'))
+    return f"{month}-01", f"{month}-{calendar.monthrange(year, mon)[1]:02d}"
+
+
+def partition_file(root, key):
+    family_id, month = split_partition_key(key)
+    year, mm = month.split('-')
+    return os.path.join(root, family_id, year, f"{mm}.ndjson")
+
+
+def load_partition_index(root):
+    """{key: {"file", "rows", "sha256"}} of the partitions written by PartitionedWriter."""
+    path = os.path.join(root, PARTITION_INDEX)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f).get('partitions', {})
+
+
+def select_partitions(keys, family_id=None, desde=None, hasta=None):
+    """Keys of the family whose month overlaps [desde, hasta] (whole months, dates as 'YYYY-MM-DD')."""
+    selected = []
+    for key in sorted(keys):
+        family, month = split_partition_key(key)
+        if family_id and family != family_id:
+            continue
+        if (desde and month < desde[:7]) or (hasta and month > hasta[:7]):
+            continue
+        selected.append(key)
+    return selected
+
+
+def load_partitions(root, family_id=None, desde=None, hasta=None):
+    """Movimientos of the partitions in the period; only their files are read."""
+    rows = []
+    for key in select_partitions(load_partition_index(root), family_id, desde, hasta):
+        rows.extend(iter_movimientos(partition_file(root, key)))
+    return rows
+
+
+class PartitionedWriter:
+    """Writes one NDJSON file per family and month, plus index.json with a sha256 per partition.
+
+    Partitions whose content didn't change keep their file (and mtime) untouched; after a
+    clean exit .changed and .removed hold the keys that differ from the previous index, so
+    consumers (delta_sync.sync_partitions, analytics) only touch those.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.count = 0
+        self.changed = []
+        self.removed = []
+        self._open = {}  # key -> [file, tmp path, sha256, rows]
+
+    def __enter__(self):
+        self._previous = load_partition_index(self.root)
+        return self
+
+    def write(self, movimiento):
+        key = partition_key(movimiento)
+        part = self._open.get(key)
+        if part is None:
+            path = partition_file(self.root, key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            part = self._open[key] = [open(f"{path}.tmp", 'w', encoding='utf-8', newline='\n'),
+                                      f"{path}.tmp", hashlib.sha256(), 0]
+        line = json.dumps(movimiento, ensure_ascii=False) + '\n'
+        part[0].write(line)
+        part[2].update(line.encode('utf-8'))
+        part[3] += 1
+        self.count += 1
+
+    def pending_removals(self):
+        """Keys of the previous index that nothing was written to so far (removed on a clean exit)."""
+        return sorted(set(self._previous) - set(self._open))
+
+    def __exit__(self, exc_type, exc, tb):
+        for f, _, _, _ in self._open.values():
+            f.close()
+        if exc_type is not None:
+            for _, tmp_path, _, _ in self._open.values():
+                os.remove(tmp_path)
+            return False
+
+        index = {}
+        for key, (_, tmp_path, sha, rows) in sorted(self._open.items()):
+            path = partition_file(self.root, key)
+            entry = {"file": os.path.relpath(path, self.root).replace(os.sep, '/'), "rows": rows,
+                     "sha256": sha.hexdigest()}
+            if self._previous.get(key, {}).get('sha256') == entry['sha256'] and os.path.exists(path):
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, path)
+                self.changed.append(key)
+            index[key] = entry
+        for key in sorted(set(self._previous) - set(index)):
+            path = partition_file(self.root, key)
+            if os.path.exists(path):
+                os.remove(path)
+            self.removed.append(key)
+
+        os.makedirs(self.root, exist_ok=True)
+        index_path = os.path.join(self.root, PARTITION_INDEX)
+        with open(f"{index_path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump({"partitions": index}, f, ensure_ascii=False, indent=2)
+        os.replace(f"{index_path}.tmp", index_path)
+        return False
@@ -0,0 +1,223 @@
+# Column-wise normalization shared by the 2025 CSV and the 2026 Excel readers
+# Amounts, dates and product inference run over whole pandas columns (amount text with
+# pyarrow compute kernels when pyarrow is installed, dates once per distinct day).
+# Values that can't be parsed are counted in a NormalizationReport instead of silently
+# turning into 0.0.
+
+import datetime
+import re
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # pyarrow is optional: same rules through pandas .str
+    pa = None
+
+# Bank -> (producto, numero_producto) for statements that don't carry them; first match wins
+BANK_PRODUCT_RULES = (
+    ("Bancolombia", "Cuenta Bancolombia", ""),
+    ("Itaú", "Tarjeta Crédito", "*7729"),
+    ("Itau", "Tarjeta Crédito", "*7729"),
+)
+# Email (2025 CSV) rows without a product number are the debit card
+MISSING_PRODUCT_DEFAULT = ("Tarjeta Débito", "*2186")
+MISSING_TEXT = ("", "N/A")
+REPORT_EXAMPLES = 5
+
+# Amount text, after removing '$' and whitespace
+_DOT_GROUPS = r'^[-+]?[1-9]\d{0,2}(?:\.\d{3})+$'    # 26.200 / 1.234.567: dots are thousands
+_COMMA_GROUPS = r'^[-+]?[1-9]\d{0,2}(?:,\d{3})+$'   # 1,800: commas are thousands
+_COMMA_LAST = r',[^.]*$'                            # 1.800,00: the comma is the decimal point
+_NUMBER = r'^[-+]?(?:\d+\.?\d*|\.\d+)$'
+_ISO_DATE = re.compile(r'(\d{4})-(\d{2})-(\d{2})')
+_DAY_FIRST_DATE = re.compile(r'(\d{1,2})[/-](\d{1,2})[/-](\d{4})')
+_DATE_TOKEN = r'[\sT]'
+
+
+class NormalizationReport:
+    """Rejected values per (column, reason), with a few distinct examples each."""
+
+    def __init__(self, source):
+        self.source = source
+        self.rejected = {}  # (column, reason) -> [count, examples]
+
+    def reject(self, column, reason, values):
+        """Records the rejected values of a column (a Series, one item per row)."""
+        if not len(values):
+            return
+        entry = self.rejected.setdefault((column, reason), [0, []])
+        entry[0] += len(values)
+        for value in values.drop_duplicates().tolist():
+            if len(entry[1]) >= REPORT_EXAMPLES:
+                break
+            if not any(value is e or value == e for e in entry[1]):
+                entry[1].append(value)
+
+    @property
+    def total(self):
+        return sum(count for count, _ in self.rejected.values())
+
+    def print(self):
+        if not self.rejected:
+            return
+        print(f"⚠️ {self.source}: {self.total} valores no normalizados")
+        for (column, reason), (count, examples) in sorted(self.rejected.items()):
+            print(f"   {column} ({reason}): {count} | ej. {', '.join(repr(e) for e in examples)}")
+
+
+def _type_mask(series, test):
+    values = series.to_numpy(dtype=object)
+    return np.fromiter((test(v) for v in values), dtype=bool, count=len(values))
+
+
+def _text_mask(series):
+    if pd.api.types.infer_dtype(series, skipna=False) == 'string':
+        return np.ones(len(series), dtype=bool)
+    return _type_mask(series, lambda v: type(v) is str)
+
+
+def _parse_amount_texts(texts):
+    """Amount strings -> (float64 array, NaN when they don't parse; blank mask).
+
+    '1.800,00' / '1,800.00' / '$ 26.200' / '12,5': the separator that comes last is the
+    decimal one when both appear; a lone separator followed by groups of exactly three
+    digits is a thousands separator, otherwise it is the decimal point.
+    """
+    if pa is not None:
+        t = pc.replace_substring_regex(pa.array(texts, pa.string()), r'[\s$]', '')
+        blank = pc.is_in(t, pa.array(MISSING_TEXT)).to_numpy(zero_copy_only=False)
+        has_comma = pc.match_substring(t, ',')
+        decimal_comma = pc.and_(pc.and_(has_comma, pc.match_substring_regex(t, _COMMA_LAST)),
+                                pc.invert(pc.match_substring_regex(t, _COMMA_GROUPS)))
+        dots_are_thousands = pc.or_(decimal_comma, pc.match_substring_regex(t, _DOT_GROUPS))
+        t = pc.if_else(dots_are_thousands, pc.replace_substring(t, '.', ''), t)
+        t = pc.if_else(decimal_comma, pc.replace_substring(t, ',', '.'), pc.replace_substring(t, ',', ''))
+        valid = pc.match_substring_regex(t, _NUMBER)
+        return pc.cast(pc.if_else(valid, t, None), pa.float64()).to_numpy(zero_copy_only=False), blank
+
+    t = pd.Series(texts, dtype=object).str.replace(r'[\s$]', '', regex=True)
+    blank = t.isin(MISSING_TEXT).to_numpy()
+    has_comma = t.str.contains(',', regex=False)
+    decimal_comma = has_comma & t.str.contains(_COMMA_LAST) & ~t.str.contains(_COMMA_GROUPS)
+    dots_are_thousands = decimal_comma | t.str.contains(_DOT_GROUPS)
+    t = t.mask(dots_are_thousands, t.str.replace('.', '', regex=False))
+    t = t.str.replace(',', '', regex=False).mask(decimal_comma, t.str.replace(',', '.', regex=False))
+    return pd.to_numeric(t.where(t.str.contains(_NUMBER)), errors='coerce').to_numpy(dtype=float), blank
+
+
+def parse_amounts(series, report=None, column='valor'):
+    """Amounts (numbers or text) -> float column; missing and unparseable values are NaN."""
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        values = series.astype(float)
+        if report is not None:
+            report.reject(column, "vacío", series[values.isna()])
+        return values
+
+    values = np.full(len(series), np.nan)
+    is_text = _text_mask(series)
+    is_number = np.zeros(len(series), dtype=bool)
+    if not is_text.all():
+        is_number = _type_mask(series, lambda v: isinstance(v, (int, float)) and not isinstance(v, bool))
+        values[is_number] = series[is_number].astype(float).to_numpy()
+    text_idx = np.flatnonzero(is_text)
+    blank = np.zeros(0, dtype=bool)
+    if len(text_idx):
+        # Amounts repeat a lot: each distinct text is parsed once
+        codes, uniques = pd.factorize(series.to_numpy(dtype=object)[text_idx])
+        parsed, blank = _parse_amount_texts(uniques.tolist())
+        values[text_idx], blank = parsed[codes], blank[codes]
+    if report is not None:
+        # Blank text ('', '$', 'N/A') is missing, not invalid
+        missing = (~is_text & ~is_number) | (is_number & np.isnan(values))
+        missing[text_idx[blank]] = True
+        report.reject(column, "vacío", series[missing])
+        report.reject(column, "inválido", series[np.isnan(values) & ~missing])
+    return pd.Series(values, index=series.index)
+
+
+def _parse_date(value):
+    """ISO date string, or None when the value is not a date."""
+    if isinstance(value, (datetime.date, pd.Timestamp)) and value is not pd.NaT:
+        return value.strftime('%Y-%m-%d')
+    if not isinstance(value, str):
+        return None
+    match = _ISO_DATE.fullmatch(value)
+    if match:
+        year, month, day = (int(g) for g in match.groups())
+    else:
+        match = _DAY_FIRST_DATE.fullmatch(value)
+        if not match:
+            return None
+        day, month, year = (int(g) for g in match.groups())
+    try:
+        return datetime.date(year, month, day).isoformat()
+    except ValueError:
+        return None
+
+
+def _map_distinct(values, func):
+    """func applied once per distinct value (object array in, object array out)."""
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    mapped = np.empty(len(uniques), dtype=object)
+    mapped[:] = [func(v) for v in uniques.tolist()]
+    return mapped[codes]
+
+
+def _date_tokens(texts):
+    """First whitespace/'T'-separated token of each (stripped) string."""
+    if pa is not None:
+        parts = pc.split_pattern_regex(pc.utf8_trim_whitespace(pa.array(texts.tolist(), pa.string())),
+                                       _DATE_TOKEN, max_splits=1)
+        return pd.Series(pc.list_element(parts, 0).to_pylist(), index=texts.index, dtype=object)
+    return texts.str.strip().str.split(_DATE_TOKEN, n=1, regex=True).str[0]
+
+
+def parse_dates(series, report=None, column='fecha'):
+    """Dates (datetimes, 'YYYY-MM-DD[ hh:mm]', 'DD/MM/YYYY') -> 'YYYY-MM-DD' strings.
+
+    Values that aren't dates keep their first 10 characters (as the readers always did)
+    and are reported.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        out = series.dt.strftime('%Y-%m-%d').astype(object)
+        rejected = series.isna()
+        out[rejected] = 'NaT'
+    else:
+        values = series.to_numpy(dtype=object)
+        is_text = _text_mask(series)
+        out = np.empty(len(values), dtype=object)
+        # Strings: only the date token ("2025-03-01 10:00" -> "2025-03-01"); few distinct days
+        tokens = _date_tokens(series[is_text]).to_numpy(dtype=object)
+        out[is_text] = _map_distinct(tokens, _parse_date)
+        if not is_text.all():
+            out[~is_text] = _map_distinct(values[~is_text], _parse_date)
+        rejected = pd.isna(out)
+        text_index = np.cumsum(is_text) - 1
+        for i in np.flatnonzero(rejected).tolist():
+            out[i] = tokens[text_index[i]][:10] if is_text[i] else str(values[i])[:10]
+        out = pd.Series(out, index=series.index, dtype=object)
+    if report is not None:
+        report.reject(column, "inválido", series[rejected])
+    return out
+
+
+def apply_bank_product_rules(banco, producto, numero, rules=BANK_PRODUCT_RULES):
+    """(producto, numero) with the rule of the first bank pattern contained in banco."""
+    matched = pd.Series(False, index=banco.index)
+    for pattern, rule_producto, rule_numero in rules:
+        hit = banco.str.contains(pattern, regex=False).fillna(False) & ~matched
+        producto = producto.mask(hit, rule_producto)
+        numero = numero.mask(hit, rule_numero)
+        matched |= hit
+    return producto, numero
+
+
+def fill_missing_product(producto, numero, default=MISSING_PRODUCT_DEFAULT):
+    """Rows without a product number get default; their product name too if it is missing."""
+    numero = numero.fillna('').astype(str).str.strip()
+    no_number = numero.isin(MISSING_TEXT)
+    no_name = producto.isna() | producto.isin(MISSING_TEXT)
+    return producto.mask(no_number & no_name, default[0]), numero.mask(no_number, default[1])
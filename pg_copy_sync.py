@@ -0,0 +1,246 @@
+# Bulk load of the pipeline output over a direct Postgres connection
+# Instead of JSON batches through the REST API, the rows are streamed with
+# COPY FROM STDIN into a temporary staging table and merged into movimientos with a
+# single INSERT ... ON CONFLICT (row_hash) DO NOTHING, all in one transaction. Same
+# semantics as delta_sync.sync_delta (pipeline rows missing locally are deleted, rows
+# loaded from the dashboard are kept, rollups only touch the groups that changed).
+#
+#   SUPABASE_DB_URL=postgresql://postgres:<password>@db.<project>.supabase.co:5432/postgres \
+#   python pg_copy_sync.py [--dry-run] [--no-delete] [--dsn <url>]
+
+import os
+import re
+import sys
+import time
+
+try:
+    import psycopg2
+    from psycopg2.extras import execute_values
+except ImportError:  # Only needed for the copy backend (pip install psycopg2-binary)
+    psycopg2 = None
+
+from delta_sync import ROLLUP_TABLE
+from movimientos_io import load_movimientos
+from rollups import MonthlyRollup, diff_rollups
+from row_keys import DEFAULT_FAMILY_ID, NATURAL_KEY_FIELDS, assign_row_hashes, natural_key, row_hash
+from tipo_flags import FLAG_FIELDS, ensure_flags
+from upload_to_supabase import JSON_FILE, TABLE_NAME
+
+DATABASE_URL = os.environ.get("SUPABASE_DB_URL")  # Direct connection string (Project Settings > Database)
+STAGING_TABLE = "movimientos_staging"
+COPY_COLUMNS = ('fecha', 'detalle', 'banco', 'producto', 'numero_producto', 'valor', 'tipo', 'categoria',
+                'miembro', 'family_id') + FLAG_FIELDS + ('row_hash',)
+COPY_BUFFER = 1 << 16
+ROLLUP_SELECT = "fecha, valor, detalle, miembro, family_id, tipo, categoria, tipo_class"
+_ISO_DATE = re.compile(r'\d{4}-\d{2}-\d{2}')
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+class CopyAborted(Exception):
+    pass
+
+
+def _copy_value(value):
+    """A value in COPY text format (\\N is NULL)."""
+    if value is None:
+        return '\\N'
+    if value is True:
+        return 't'
+    if value is False:
+        return 'f'
+    if isinstance(value, float):
+        return '\\N' if value != value else repr(value)
+    return str(value).translate(_COPY_ESCAPES)
+
+
+class CopyStream:
+    """File-like object over the rows (read() is what copy_expert calls), so the COPY
+    payload is generated while it is sent instead of being built in memory."""
+
+    def __init__(self, rows, columns=COPY_COLUMNS):
+        self._lines = ('\t'.join(_copy_value(m.get(c)) for c in columns) + '\n' for m in rows)
+        self._buffer = ''
+
+    def read(self, size=COPY_BUFFER):
+        parts = [self._buffer]
+        length = len(self._buffer)
+        for line in self._lines:
+            parts.append(line)
+            length += len(line)
+            if length >= size:
+                break
+        data = ''.join(parts)
+        self._buffer = data[size:]
+        return data[:size]
+
+
+def connect(dsn=None):
+    if psycopg2 is None:
+        raise CopyAborted("❌ psycopg2 no está instalado (pip install psycopg2-binary)")
+    dsn = dsn or DATABASE_URL
+    if not dsn:
+        raise CopyAborted("❌ Falta la conexión directa a Postgres (SUPABASE_DB_URL o --dsn)")
+    try:
+        return psycopg2.connect(dsn)
+    except psycopg2.Error as e:
+        raise CopyAborted(f"❌ Error connecting to Postgres: {e}")
+
+
+def copy_to_staging(cur, rows):
+    """Streams rows into a temporary table shaped like movimientos (dropped on commit)."""
+    cols = ", ".join(COPY_COLUMNS)
+    cur.execute(f"create temp table {STAGING_TABLE} on commit drop as "
+                f"select {cols} from public.{TABLE_NAME} with no data")
+    cur.copy_expert(f"copy {STAGING_TABLE} ({cols}) from stdin", CopyStream(rows))
+    cur.execute(f"create unique index on {STAGING_TABLE} (row_hash)")
+    cur.execute(f"analyze {STAGING_TABLE}")
+
+
+def backfill_row_hashes(cur, family_id):
+    """Sets row_hash on the family's rows uploaded before it existed; returns how many.
+
+    Same hashes as delta_sync.fetch_remote_keys (natural key, occurrence counted in id order),
+    so the merge recognizes them instead of inserting a second copy. A row whose hash is
+    already taken by another row is a duplicate and keeps row_hash null.
+    """
+    cur.execute(f"select id, {', '.join(NATURAL_KEY_FIELDS)} from public.{TABLE_NAME} "
+                f"where family_id = %s and row_hash is null order by id", (family_id,))
+    names = [d[0] for d in cur.description]
+    hashes = []
+    seen = {}
+    for row in cur.fetchall():
+        r = dict(zip(names, row))
+        key = natural_key(r)
+        occurrence = seen.get(key, 0)
+        seen[key] = occurrence + 1
+        hashes.append((str(r['id']), row_hash(key, occurrence)))
+    if not hashes:
+        return 0
+    cur.execute(f"select row_hash from public.{TABLE_NAME} where row_hash = any(%s)", ([h for _, h in hashes],))
+    taken = {r[0] for r in cur.fetchall()}
+    hashes = [(i, h) for i, h in hashes if h not in taken]
+    execute_values(cur, f"""
+        update public.{TABLE_NAME} m set row_hash = v.row_hash
+        from (values %s) as v (id, row_hash)
+        where m.id = v.id::uuid
+    """, hashes)
+    return len(hashes)
+
+
+def merge_staging(cur, family_id, allow_deletes=True):
+    """Returns (inserted, deleted). Only rows without miembro are deleted (see delta_sync.compute_delta).
+
+    Rows uploaded before row_hash existed get their hash first (see backfill_row_hashes), with
+    or without deletes: the insert then skips them instead of duplicating them.
+    """
+    backfilled = backfill_row_hashes(cur, family_id)
+    if backfilled:
+        print(f"🔑 {backfilled} filas antiguas recibieron su row_hash")
+    deleted = 0
+    if allow_deletes:
+        cur.execute(f"""
+            delete from public.{TABLE_NAME} m
+            where m.family_id = %s and coalesce(m.miembro, '') = ''
+              and (m.row_hash is null
+                   or not exists (select 1 from {STAGING_TABLE} s where s.row_hash = m.row_hash))
+        """, (family_id,))
+        deleted = cur.rowcount
+    cols = ", ".join(COPY_COLUMNS)
+    cur.execute(f"""
+        insert into public.{TABLE_NAME} ({cols})
+        select {cols} from {STAGING_TABLE}
+        on conflict (row_hash) do nothing
+    """)
+    return cur.rowcount, deleted
+
+
+def sync_rollups_sql(cur, local_rows, family_id):
+    """Same diff as delta_sync.sync_rollups, over the open transaction."""
+    rollup = MonthlyRollup()
+    for m in local_rows:
+        rollup.add(m)
+    # Family rows that aren't in the output (dashboard uploads) are still in the table
+    cur.execute(f"""
+        select {ROLLUP_SELECT} from public.{TABLE_NAME} m
+        where m.family_id = %s
+          and (m.row_hash is null
+               or not exists (select 1 from {STAGING_TABLE} s where s.row_hash = m.row_hash))
+    """, (family_id,))
+    names = [d[0] for d in cur.description]
+    for row in cur:
+        rollup.add(dict(zip(names, row)))
+
+    cur.execute(f"select group_key, total, total_abs, row_count from public.{ROLLUP_TABLE} "
+                f"where family_id = %s", (family_id,))
+    remote = [dict(zip(('group_key', 'total', 'total_abs', 'row_count'), r)) for r in cur.fetchall()]
+    upserts, stale = diff_rollups(remote, rollup)
+    print(f"📦 Rollups: {len(rollup.groups)} grupos | Actualizar: {len(upserts)} | Borrar: {len(stale)}")
+    if upserts:
+        fields = list(upserts[0])
+        execute_values(cur, f"""
+            insert into public.{ROLLUP_TABLE} ({", ".join(fields)}) values %s
+            on conflict (group_key) do update set
+              total = excluded.total, total_abs = excluded.total_abs, row_count = excluded.row_count,
+              updated_at = timezone('utc'::text, now())
+        """, [tuple(r[f] for f in fields) for r in upserts])
+    if stale:
+        cur.execute(f"delete from public.{ROLLUP_TABLE} where group_key = any(%s)", (stale,))
+
+
+def copy_sync(json_file=JSON_FILE, family_id=DEFAULT_FAMILY_ID, dry_run=False, allow_deletes=True,
+              rows=None, dsn=None, cancel=None):
+    """COPY-backed sync_delta: one transaction, rolled back on a dry run.
+
+    If cancel (threading.Event, see sync_dag) is set before the commit, the transaction is rolled back.
+    """
+    started = time.perf_counter()
+    local_rows = rows if rows is not None else load_movimientos(json_file)
+    for m in local_rows:
+        m.setdefault('family_id', family_id)
+    ensure_flags(local_rows)
+    assign_row_hashes(local_rows)
+    # fecha is a not null date column: one bad value would abort the whole COPY
+    invalid = [m for m in local_rows if not _ISO_DATE.fullmatch(str(m.get('fecha') or ''))]
+    if invalid:
+        print(f"⚠️ {len(invalid)} filas con fecha inválida omitidas (ej. {invalid[0].get('fecha')!r})")
+        local_rows = [m for m in local_rows if _ISO_DATE.fullmatch(str(m.get('fecha') or ''))]
+
+    try:
+        conn = connect(dsn)
+    except CopyAborted as e:
+        print(e)
+        return None
+    try:
+        with conn.cursor() as cur:
+            copy_started = time.perf_counter()
+            copy_to_staging(cur, local_rows)
+            copied = time.perf_counter() - copy_started
+            inserted, deleted = merge_staging(cur, family_id, allow_deletes)
+            sync_rollups_sql(cur, local_rows, family_id)
+        if cancel is not None and cancel.is_set():
+            conn.rollback()
+            print("⏹️ COPY sync cancelado, transacción revertida.")
+            return None
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"❌ Error en COPY/merge, nada se aplicó: {e}")
+        return None
+    finally:
+        conn.close()
+
+    print(f"🔍 Local: {len(local_rows)} | Insertar: {inserted} | Borrar: {deleted} (COPY en {copied:.1f}s)")
+    if dry_run:
+        print("🧪 Dry run: transacción revertida, no changes sent.")
+        return {"inserted": 0, "deleted": 0, "to_insert": inserted, "to_delete": deleted}
+    print(f"✅ COPY sync: {inserted} insertados, {deleted} borrados en {time.perf_counter() - started:.1f}s")
+    return {"inserted": inserted, "deleted": deleted, "to_insert": inserted, "to_delete": deleted}
+
+
+if __name__ == "__main__":
+    # --dry-run runs the merge and rolls it back; --no-delete never removes remote rows
+    dsn = sys.argv[sys.argv.index("--dsn") + 1] if "--dsn" in sys.argv else None
+    copy_sync(dry_run="--dry-run" in sys.argv, allow_deletes="--no-delete" not in sys.argv, dsn=dsn)
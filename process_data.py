@@ -1,10 +1,24 @@
-import json
 import pandas as pd
 import csv
 import os
-import re
 import glob
-from category_mapping import get_category_for_merchant
+import itertools
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from classification_cache import get_classification_cache
+from movimientos_io import (
+    FanoutWriter, ParquetWriter, PartitionedWriter, open_writer, parquet_path_for, partition_index_path,
+    partition_root_for,
+)
+from source_manifest import SourceManifest
+from dedupe import Deduplicator
+from movimiento_store import MovimientoStore
+from normalization import (NormalizationReport, apply_bank_product_rules, fill_missing_product,
+                           parse_amounts, parse_dates)
+from excel_reader import read_consolidado
+from instrumentation import RunReport, report_options
+from rollups import RollupWriter, rollup_path_for
+from tipo_flags import add_flags
 
 # Inputs
 CSV_2025 = r"C:\Users\Amaya\OneDrive\Documentos\Personal\movimientos_bancarios_2025_claude_v2.csv"
@@ -13,66 +27,73 @@ EXCEL_2026 = r"C:\Users\Amaya\OneDrive\Documentos\Personal\Movimientos\movimient
 CSV_2025 = r"C:\Users\Amaya\OneDrive\Documentos\Personal\movimientos_bancarios_2025_claude_v2.csv"
 MOVIMIENTOS_DIR = r"C:\Users\Amaya\OneDrive\Documentos\Personal\Movimientos"
 OUTPUT_FILE = r"C:\Users\Amaya\OneDrive\Documentos\Personal\dashboard_finanzas_2025\data\movimientos.json"
+CHUNK_SIZE = 5000 # Rows classified per batch while streaming
+EXCEL_PATTERNS = ("movimientos_bancos_estandarizados*.xlsx",) # Statements read with --all-excels
+EXCEL_WORKERS = None # Process pool size for --all-excels (None = one per CPU)
+MAX_REMOVED_PARTITIONS = 2 # Month partitions a run may drop without --allow-removals
 
-def clean_currency(value_str):
-    """Convierte string de moneda a float (Legacy for CSV)."""
-    if not value_str or value_str == "N/A": return 0.0
-    cleaned = value_str.replace("$", "").replace(" ", "").strip()
-    if not cleaned: return 0.0
-    
-    # Patrón europeo: "1.800,00"
-    if re.search(r'\d+\.\d{3}', cleaned) and ',' in cleaned:
-        cleaned = cleaned.replace(".", "").replace(",", ".")
-    elif cleaned.endswith(",00"):
-        cleaned = cleaned.replace(",", ".")
-    else:
-        cleaned = cleaned.replace(",", "")
-    
-    try:
-        return float(cleaned)
-    except ValueError:
-        return 0.0
+CSV_COLUMNS = ('Banco', 'Tipo de transacción', 'Valor', 'Día de la transacción', 'Producto', 'Número producto',
+               'Detalle')
 
-def process_2025_csv():
-    """Reads 2025 Email Data from CSV."""
+def csv_chunk_to_movimientos(header, rows, report=None):
+    """Normalizes a chunk of 2025 CSV rows (lists from csv.reader) column-wise."""
+    # Transposed with zip_longest: short rows get None like csv.DictReader's restval
+    raw = dict(zip(header, itertools.zip_longest(*rows)))
+    def column(name):
+        return raw.get(name) or (None,) * len(rows)
+    # Logic for Debit *2186 legacy
+    producto, numero = fill_missing_product(pd.Series(column('Producto'), dtype=object),
+                                            pd.Series(column('Número producto'), dtype=object))
+    columns = {
+        "banco": column('Banco'),
+        "tipo": column('Tipo de transacción'),
+        "valor": parse_amounts(pd.Series(column('Valor'), dtype=object), report).fillna(0.0).tolist(),
+        "fecha": parse_dates(pd.Series(column('Día de la transacción'), dtype=object), report).tolist(),
+        "producto": producto.tolist(),
+        "numero_producto": numero.tolist(),
+        "detalle": column('Detalle'),
+        "categoria": (None,) * len(rows),
+    }
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+def iter_2025_csv(chunk_size=CHUNK_SIZE, strict=False, classify=True):
+    """Streams 2025 Email Data from CSV, classifying one chunk at a time.
+
+    With strict=True read errors (a missing file too) are raised instead of printed;
+    with classify=False categoria is left as None (see classify_movimientos).
+    """
     print(f"Reading 2025 Data: {CSV_2025}...")
-    movimientos = []
     if not os.path.exists(CSV_2025):
+        if strict:
+            # An empty source would make the delta sync delete its whole history
+            raise FileNotFoundError(f"2025 CSV not found: {CSV_2025}")
         print(f"⚠️ Warning: 2025 File not found.")
-        return []
+        return
         
+    cache = get_classification_cache()
+    report = NormalizationReport("2025 CSV")
     try:
         with open(CSV_2025, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                valor = clean_currency(row['Valor'])
-                fecha_full = row['Día de la transacción']
-                fecha_date = fecha_full.split(' ')[0] if ' ' in fecha_full else fecha_full
-                detalle = row['Detalle']
-                
-                # Logic for Debit *2186 legacy
-                prod_num = row.get('Número producto', '').strip()
-                producto_nombre = row['Producto']
-                if not prod_num or prod_num == 'N/A':
-                    prod_num = '*2186'
-                    if producto_nombre == 'N/A' or not producto_nombre:
-                        producto_nombre = 'Tarjeta Débito'
-
-                movimiento = {
-                    "banco": row['Banco'],
-                    "tipo": row['Tipo de transacción'],
-                    "valor": valor,
-                    "fecha": fecha_date,
-                    "producto": producto_nombre,
-                    "numero_producto": prod_num,
-                    "detalle": detalle,
-                    "categoria": get_category_for_merchant(detalle)
-                }
-                movimientos.append(movimiento)
+            reader = csv.reader(f)
+            header = next(reader, [])
+            while True:
+                rows = list(itertools.islice(reader, chunk_size))
+                if not rows:
+                    break
+                chunk = csv_chunk_to_movimientos(header, rows, report)
+                if classify:
+                    for m, categoria in zip(chunk, cache.classify_many(m['detalle'] for m in chunk)):
+                        m['categoria'] = categoria
+                yield from chunk
+        report.print()
     except Exception as e:
+        if strict:
+            raise
         print(f"Error processing 2025 CSV: {e}")
-        
-    return movimientos
+
+def process_2025_csv():
+    """Reads 2025 Email Data from CSV (as a compact MovimientoStore)."""
+    return MovimientoStore.from_movimientos(iter_2025_csv())
 
 def find_latest_excel():
     """Finds the latest bank standardization file."""
@@ -86,103 +107,350 @@ def find_latest_excel():
         return None
     return max(files, key=os.path.getmtime)
 
-def process_2026_excel():
+def find_all_excels():
+    """Finds every statement workbook in MOVIMIENTOS_DIR (sorted by name for a stable order)."""
+    files = set()
+    for pattern in EXCEL_PATTERNS:
+        files.update(glob.glob(os.path.join(MOVIMIENTOS_DIR, pattern)))
+    # Skip Excel lock files ("~$libro.xlsx") left while a workbook is open
+    return sorted(f for f in files if not os.path.basename(f).startswith('~$'))
+
+def _parse_workbook(excel_file):
+    """Process-pool worker: parses one workbook, classification is left to the parent."""
+    return process_2026_excel(excel_file, strict=True, classify=False)
+
+def parse_workbooks_parallel(excel_files, max_workers=EXCEL_WORKERS):
+    """Parses workbooks across a process pool, one file per worker.
+
+    Returns {path: future}; a failing workbook only fails its own future.
+    """
+    if not excel_files:
+        return {}
+    workers = min(max_workers or os.cpu_count() or 1, len(excel_files))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {path: pool.submit(_parse_workbook, path) for path in excel_files}
+    return futures
+
+def process_2026_excel(excel_file=None, strict=False, classify=True):
     """Reads 2026 Bank Data from Excel (User Updated)."""
-    excel_file = find_latest_excel()
+    excel_file = excel_file or find_latest_excel()
     
-    if not excel_file:
-         print(f"⚠️ Warning: No 'movimientos_bancos_estandarizados_*.xlsx' found in {MOVIMIENTOS_DIR}")
-         return []
+    if not excel_file or not os.path.exists(excel_file):
+        if strict:
+            # Same as the 2025 CSV: an empty source would make the sync delete its whole history
+            raise FileNotFoundError(f"2026 workbook not found: {excel_file or MOVIMIENTOS_DIR}")
+        print(f"⚠️ Warning: No 'movimientos_bancos_estandarizados_*.xlsx' found in {MOVIMIENTOS_DIR}")
+        return []
 
     print(f"Reading 2026 Data: {excel_file}...")
     movimientos = []
     
     try:
-        df = pd.read_excel(excel_file, sheet_name='Consolidado')
-        df['Fecha'] = df['Fecha'].astype(str).str.slice(0, 10)
-        
-        # Identify Category Column (User added 'Categoria ' with space?)
-        cat_col = None
-        if 'Categoria ' in df.columns:
-            cat_col = 'Categoria '
-        elif 'Categoria' in df.columns:
-            cat_col = 'Categoria'
-            
-        print(f"Using Category Column: {cat_col if cat_col else 'None (Auto-mapping)'}")
-        
-        for _, row in df.iterrows():
-            detalle = str(row['Detalle'])
-            banco = str(row['Banco'])
-            
-            # Determine Category
-            categoria = 'Otros'
-            if cat_col:
-                user_cat = str(row[cat_col]).strip()
-                if user_cat and user_cat.lower() != 'nan':
-                    categoria = user_cat
-            
-            # Fallback to auto-mapping if User Category is missing/Other
-            if categoria == 'Otros' or categoria == 'nan':
-                categoria = get_category_for_merchant(detalle)
-
-            # Infer Product/Number (Missing in v1 file)
-            producto = ''
-            numero = ''
-            
-            if 'Bancolombia' in banco:
-                producto = 'Cuenta Bancolombia'
-                numero = '' # User didn't provide number in v1
-            elif 'Itaú' in banco or 'Itau' in banco:
-                producto = 'Tarjeta Crédito'
-                numero = '*7729' # Inferred
-            else:
-                # Try to use columns if they exist (unlikely in v1)
-                producto = str(row.get('Producto', ''))
-                numero = str(row.get('Numero', ''))
-
-            movimiento = {
-                "banco": banco,
-                "tipo": str(row['Tipo']),
-                "valor": abs(float(row['Valor'])), # Force positive
-                "fecha": str(row['Fecha']),
-                "producto": producto,
-                "numero_producto": numero if pd.notna(numero) else '',
-                "detalle": detalle,
-                "categoria": categoria
-            }
-            movimientos.append(movimiento)
+        df = read_consolidado(excel_file)
+        movimientos = frame_to_movimientos(df, classify=classify, source=os.path.basename(excel_file))
     except Exception as e:
+        if strict:
+            raise
         print(f"❌ Error reading Excel: {e}")
     
     return movimientos
 
-def process_data():
-    all_movimientos = []
-    category_stats = {}
+def _as_text(series):
+    """Column-wise str(): missing values become 'nan' like str(float('nan'))."""
+    return series.astype(str).fillna('nan')
+
+def frame_to_movimientos(df, classify=True, source="Excel"):
+    """Normalizes a 'Consolidado' sheet column-wise into a MovimientoStore (iterates as dicts)."""
+    report = NormalizationReport(source)
+    detalle = _as_text(df['Detalle'])
+    banco = _as_text(df['Banco'])
+    
+    # Identify Category Column (User added 'Categoria ' with space?)
+    cat_col = None
+    if 'Categoria ' in df.columns:
+        cat_col = 'Categoria '
+    elif 'Categoria' in df.columns:
+        cat_col = 'Categoria'
+        
+    print(f"Using Category Column: {cat_col if cat_col else 'None (Auto-mapping)'}")
     
-    # 1. Process 2025 (Email)
-    data_2025 = process_2025_csv()
-    all_movimientos.extend(data_2025)
+    categoria = pd.Series('Otros', index=df.index, dtype=object)
+    if cat_col:
+        user_cat = _as_text(df[cat_col]).str.strip()
+        has_user_cat = (user_cat != '') & (user_cat.str.lower() != 'nan')
+        categoria = categoria.mask(has_user_cat, user_cat)
     
-    # 2. Process 2026 (Bank Excel)
-    data_2026 = process_2026_excel()
-    all_movimientos.extend(data_2026)
+    # Fallback to auto-mapping if User Category is missing/Other (once per distinct Detalle)
+    needs_mapping = categoria.isin(['Otros', 'nan'])
+    if classify and needs_mapping.any():
+        unique_detalles = detalle[needs_mapping].unique()
+        mapped = dict(zip(unique_detalles, get_classification_cache().classify_many(unique_detalles)))
+        categoria = categoria.mask(needs_mapping, detalle.map(mapped))
     
-    # Calc Stats
-    for m in all_movimientos:
-        cat = m['categoria']
-        category_stats[cat] = category_stats.get(cat, 0) + 1
+    # Infer Product/Number (Missing in v1 file): columns if they exist, else BANK_PRODUCT_RULES
+    producto = _as_text(df['Producto']) if 'Producto' in df.columns else pd.Series('', index=df.index, dtype=object)
+    numero = _as_text(df['Numero']) if 'Numero' in df.columns else pd.Series('', index=df.index, dtype=object)
+    producto, numero = apply_bank_product_rules(banco, producto, numero)
+    
+    out = pd.DataFrame({
+        "banco": banco,
+        "tipo": _as_text(df['Tipo']),
+        "valor": parse_amounts(df['Valor'], report).abs().fillna(0.0), # Force positive; unparseable -> 0 like the CSV
+        "fecha": parse_dates(df['Fecha'], report),
+        "producto": producto,
+        "numero_producto": numero,
+        "detalle": detalle,
+        "categoria": categoria,
+    })
+    report.print()
+    return MovimientoStore.from_frame(out)
 
-    # Save
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(all_movimientos, f, ensure_ascii=False, indent=2)
-        
-    print(f"✅ Total Procesados: {len(all_movimientos)} (2025: {len(data_2025)} + 2026: {len(data_2026)})")
+def iter_2026_excel(excel_file=None, strict=False, classify=True):
+    """Yields 2026 movimientos (the sheet is parsed in one go, rows are emitted lazily)."""
+    yield from process_2026_excel(excel_file, strict=strict, classify=classify)
+
+def _excel_reader(excel_file):
+    return lambda classify=True: iter_2026_excel(excel_file, strict=True, classify=classify)
+
+def _prefetched_reader(future):
+    def read(classify=True):
+        rows = future.result()
+        return iter(classify_movimientos(rows) if classify else rows)
+    return read
+
+def get_sources(excel_file=None, all_excels=False):
+    """(name, path, reader) for every input; reader(classify=True) yields movimientos.
+
+    With all_excels every workbook in MOVIMIENTOS_DIR is a source of its own
+    (named after the file, for attribution) instead of only the newest one.
+    """
+    sources = [
+        ("2025", CSV_2025, lambda classify=True: iter_2025_csv(strict=True, classify=classify)),  # 1. Process 2025 (Email)
+    ]
+    if all_excels:
+        for path in find_all_excels():
+            name = "2026_" + os.path.splitext(os.path.basename(path))[0]
+            sources.append((name, path, _excel_reader(path)))
+        if len(sources) == 1:
+            sources.append(("2026", None, _excel_reader(None)))  # No workbook at all: fails like a missing one
+    else:
+        excel_file = excel_file or find_latest_excel()
+        sources.append(("2026", excel_file, _excel_reader(excel_file)))  # 2. Process 2026 (Bank Excel)
+    return sources
+
+def prefetch_excel_sources(sources, skip=()):
+    """Parses the workbooks of sources not in skip in parallel; returns sources reading from those results."""
+    pending = [path for name, path, _ in sources if name.startswith("2026") and name not in skip and path]
+    if len(pending) < 2:
+        return sources
+    print(f"⚙️ Parsing {len(pending)} workbooks in parallel...")
+    futures = parse_workbooks_parallel(pending)
+    return [(name, path, _prefetched_reader(futures[path]) if path in futures else read)
+            for name, path, read in sources]
+
+def classify_movimientos(movimientos):
+    """Fills in categoria where it is missing or 'Otros' (once per distinct detalle)."""
+    if isinstance(movimientos, MovimientoStore):
+        movimientos.fill_categoria(get_classification_cache().classify_many)
+        return movimientos
+    pending = [m for m in movimientos if m.get('categoria') in (None, 'Otros', 'nan')]
+    categorias = get_classification_cache().classify_many([m['detalle'] for m in pending])
+    for m, categoria in zip(pending, categorias):
+        m['categoria'] = categoria
+    return movimientos
+
+class SourcesFailed(Exception):
+    """Some sources couldn't be read: the output would be missing their rows."""
+
+    def __init__(self, failed):
+        super().__init__(", ".join(f"{source} ({error})" for source, error in failed))
+        self.failed = failed
+
+
+class RemovalRefused(Exception):
+    """The new output would drop a source's rows or too many month partitions (see --allow-removals)."""
+
+    def __init__(self, emptied, removed):
+        reasons = [f"{source} no devolvió filas (antes {rows})" for source, rows in sorted(emptied.items())]
+        if len(removed) > MAX_REMOVED_PARTITIONS:
+            reasons.append(f"se eliminarían {len(removed)} particiones ({', '.join(removed)})")
+        super().__init__("; ".join(reasons) + ". Usa --allow-removals si es intencional.")
+        self.emptied = emptied
+        self.removed = removed
+
+
+def _iter_sources(sources, manifest, unchanged, report=None, failed=None):
+    """Yields (source, movimiento) for every source, from the manifest cache when unchanged.
+
+    Sources that fail are printed and appended to failed as (source, error).
+    """
+    for source, path, read in sources:
+        try:
+            if source in unchanged:
+                rows = manifest.cached_rows(source)
+            else:
+                rows = manifest.record(source, path, read())
+            if report:
+                rows = report.iter_stage(f"read_{source}", rows)
+            for m in rows:
+                yield source, m
+        except Exception as e:
+            # Keep going with the other sources (all errors are shown); the output isn't replaced
+            print(f"❌ Error processing {source} ({path}): {e}")
+            if failed is not None:
+                failed.append((source, e))
+
+def output_options(write_parquet=False, drop_duplicates=False, drop_near_duplicates=False, all_excels=False):
+    """Options that change the output; the manifest only reuses an output written with the same ones."""
+    return {"parquet": write_parquet, "drop_duplicates": drop_duplicates,
+            "drop_near_duplicates": drop_near_duplicates, "all_excels": all_excels}
+
+def outputs_current(manifest, output_file, options):
+    """True when output_file and its rollups, partitions (and Parquet copy) were written with these options."""
+    return (manifest.output_is_current(output_file, options)
+            and (not options["parquet"] or os.path.exists(parquet_path_for(output_file)))
+            and os.path.exists(rollup_path_for(output_file))
+            and os.path.exists(partition_index_path(output_file)))
+
+def write_outputs(tagged, output_file, manifest, options, report, failed=(), allow_removals=False):
+    """Writes (source, movimiento) pairs, with their class flags, to every output and saves the manifest.
+
+    One pass fills output_file (.json array or .ndjson), the monthly rollups, the month
+    partitions and the optional Parquet copy. If failed (see _iter_sources) is not empty
+    once the rows are consumed, SourcesFailed is raised and the previous outputs stay in place.
+    Unless allow_removals, the same happens (RemovalRefused) when a source that had rows now
+    reads none, or when more than MAX_REMOVED_PARTITIONS month partitions would disappear.
+    Returns {"count", "sources", "categorias"} (rows per source / per category).
+    """
+    stats = {"count": 0, "sources": {}, "categorias": {}}
+    rollup_writer = RollupWriter(rollup_path_for(output_file))
+    partitions = PartitionedWriter(partition_root_for(output_file))
+    writers = [open_writer(output_file), rollup_writer, partitions]
+    if options["parquet"]:
+        writers.append(ParquetWriter(parquet_path_for(output_file)))
+    with report.stage("write") as write_stage, FanoutWriter(*writers) as writer:
+        for source, m in tagged:
+            writer.write(add_flags(m))
+            stats["sources"][source] = stats["sources"].get(source, 0) + 1
+            cat = m['categoria']
+            stats["categorias"][cat] = stats["categorias"].get(cat, 0) + 1
+        if failed:
+            # Leaving those rows out would look like deletions to delta_sync/sync_partitions:
+            # the writers discard their temp files and the previous output stays in place
+            raise SourcesFailed(failed)
+        emptied = manifest.emptied_sources()
+        removed = partitions.pending_removals()
+        if not allow_removals and (emptied or len(removed) > MAX_REMOVED_PARTITIONS):
+            for source in emptied:
+                manifest.forget(source)  # Not cached as empty: the next run reads it again
+            raise RemovalRefused(emptied, removed)
+    write_stage.rows_out = stats["count"] = writer.count
+    manifest.save(output_file, options)
+    print(f"📦 Rollups mensuales: {len(rollup_writer.rollup.groups)} grupos en {rollup_path_for(output_file)}")
+    print(f"🗂️ Particiones: {len(partitions.changed)} cambiadas, {len(partitions.removed)} eliminadas"
+          f" en {partition_root_for(output_file)}")
+    return stats
+
+def process_data(output_file=OUTPUT_FILE, force=False, write_parquet=False,
+                 drop_duplicates=False, drop_near_duplicates=False, all_excels=False, allow_removals=False,
+                 report=None):
+    """Streams every source through classification into the output file.
+
+    Sources whose content did not change since the last run (see source_manifest)
+    are not read again: their cached normalized rows are reused.
+    With write_parquet, a columnar copy is written next to the JSON (movimientos.parquet).
+    Duplicates are always reported (see dedupe); drop_duplicates removes exact copies
+    while streaming, drop_near_duplicates also removes the later row of each
+    near-duplicate pair (this one needs the whole history in memory before writing).
+    With all_excels every workbook in MOVIMIENTOS_DIR is parsed, across a process pool.
+    Every row gets its class flags (is_expense, is_cc_payment, tipo_class... see tipo_flags.py).
+    Monthly rollups (see rollups.py) are aggregated in the same pass into movimientos_rollups.json.
+    A source that stops returning rows, or a run that would drop more than MAX_REMOVED_PARTITIONS
+    month partitions, leaves the output untouched unless allow_removals (see write_outputs).
+    Stage timings and throughput are saved as a run report (see instrumentation.py).
+    """
+    report = report or RunReport("process_data")
+    manifest = SourceManifest()
+    options = output_options(write_parquet, drop_duplicates, drop_near_duplicates, all_excels)
+    
+    sources = get_sources(all_excels=all_excels)
+    
+    unchanged = {name for name, path, _ in sources if not force and manifest.is_unchanged(name, path)}
+    if len(unchanged) == len(sources) and outputs_current(manifest, output_file, options):
+        print(f"✅ Sin cambios en las fuentes ({', '.join(sorted(unchanged))}); {output_file} ya está al día.")
+        manifest.save(output_file, options)
+        report.save()
+        return None
+    
+    rebuilt = [name for name, _, _ in sources if name not in unchanged]
+    print(f"🔁 Fuentes reconstruidas: {', '.join(rebuilt) if rebuilt else 'ninguna'}"
+          f" | reutilizadas: {', '.join(sorted(unchanged)) if unchanged else 'ninguna'}")
+    sources = prefetch_excel_sources(sources, skip=unchanged)
+    
+    dedupe = Deduplicator(drop_exact=drop_duplicates)
+    failed = []
+    tagged = report.iter_stage("dedupe", (
+        (source, m) for source, m in _iter_sources(sources, manifest, unchanged, report, failed)
+        if dedupe.add(m, source)))
+    near_pairs = None
+    if drop_near_duplicates:
+        held = MovimientoStore()
+        for source, m in tagged:
+            held.append(m, tag=source)
+        with report.stage("near_duplicates"):
+            near_pairs = dedupe.find_near_duplicates()
+        dropped = {later for _, later, _ in near_pairs}
+        tagged = (t for i, t in enumerate(held.tagged_rows()) if i not in dropped)
+    
+    # Save (.json array or .ndjson, written row by row; rollups; month partitions; optional Parquet copy)
+    try:
+        stats = write_outputs(tagged, output_file, manifest, options, report, failed, allow_removals)
+    except SourcesFailed as e:
+        print(f"❌ Salida no actualizada, fuentes con errores: {e}")
+        report.save()
+        raise
+    except RemovalRefused as e:
+        print(f"❌ Salida no actualizada: {e}")
+        report.save()
+        raise
+    category_stats = stats["categorias"]
+    
+    if near_pairs is None:
+        with report.stage("near_duplicates"):
+            near_pairs = dedupe.find_near_duplicates()
+    dedupe.report(near_pairs)
+    if drop_near_duplicates:
+        print(f"   {len({later for _, later, _ in near_pairs})} posibles duplicados eliminados.")
+    
+    total = stats["count"]
+    breakdown = " + ".join(f"{source}: {count}" for source, count in stats["sources"].items())
+    print(f"✅ Total Procesados: {total} ({breakdown})")
     
     print("\n📊 Categorías Globales:")
     for cat, count in sorted(category_stats.items(), key=lambda x: -x[1]):
-        pct = count / len(all_movimientos) * 100
+        pct = count / total * 100
         print(f"   {cat}: {count} ({pct:.1f}%)")
 
+    cache = get_classification_cache()
+    cache.print_stats()
+    cache.close()
+    report.save()
+    
+    return category_stats
+
 if __name__ == "__main__":
-    process_data()
+    # --force ignores the manifest and re-reads every source
+    # --parquet also writes data/movimientos.parquet
+    # --drop-duplicates / --drop-near-duplicates remove what the dedupe stage finds
+    # --all-excels reads every statement workbook, not just the newest
+    # --allow-removals accepts a source with no rows / more than MAX_REMOVED_PARTITIONS months removed
+    # --trace-memory / --profile <stage> add tracemalloc peaks / a cProfile dump to the run report
+    try:
+        process_data(force="--force" in sys.argv, write_parquet="--parquet" in sys.argv,
+                     drop_duplicates="--drop-duplicates" in sys.argv,
+                     drop_near_duplicates="--drop-near-duplicates" in sys.argv,
+                     all_excels="--all-excels" in sys.argv,
+                     allow_removals="--allow-removals" in sys.argv,
+                     report=RunReport("process_data", **report_options(sys.argv)))
+    except (SourcesFailed, RemovalRefused):
+        sys.exit(1)
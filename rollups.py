@@ -0,0 +1,112 @@
+# Monthly rollups of the movimientos: sum and count per
+# (family_id, month, miembro, categoria, tipo_class), so the dashboard summaries
+# read a few hundred groups instead of scanning the whole ledger.
+
+import hashlib
+import json
+import os
+
+from row_keys import DEFAULT_FAMILY_ID
+from tipo_flags import tipo_class
+
+ROLLUP_FIELDS = ('family_id', 'month', 'miembro', 'categoria', 'tipo_class')
+
+
+def rollup_key(m):
+    return (
+        m.get('family_id') or DEFAULT_FAMILY_ID,
+        str(m.get('fecha') or '')[:7],
+        m.get('miembro') or '',
+        m.get('categoria') or 'Otros',
+        tipo_class(m),
+    )
+
+
+def group_key(key):
+    """Stable id of a group, primary key of the Supabase table."""
+    return hashlib.sha256("\x1f".join(key).encode('utf-8')).hexdigest()[:32]
+
+
+def rollup_path_for(json_path):
+    """data/movimientos.json -> data/movimientos_rollups.json"""
+    return os.path.splitext(json_path)[0] + "_rollups.json"
+
+
+def _amount(m):
+    try:
+        valor = float(m.get('valor') or 0)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if valor != valor else valor  # NaN counts as 0, like parseFloat(...) || 0
+
+
+class MonthlyRollup:
+    """Additive aggregate, filled one row at a time (no second pass over the ledger)."""
+
+    def __init__(self):
+        self.groups = {}  # key -> [total, total_abs, count]
+
+    def add(self, m):
+        key = rollup_key(m)
+        valor = _amount(m)
+        g = self.groups.get(key)
+        if g is None:
+            self.groups[key] = [valor, abs(valor), 1]
+        else:
+            g[0] += valor
+            g[1] += abs(valor)
+            g[2] += 1
+
+    def rows(self):
+        """Groups as dicts (sorted), the format of the JSON file and the Supabase table."""
+        out = []
+        for key in sorted(self.groups):
+            total, total_abs, count = self.groups[key]
+            row = dict(zip(ROLLUP_FIELDS, key))
+            row.update({"group_key": group_key(key), "total": round(total, 2),
+                        "total_abs": round(total_abs, 2), "row_count": count})
+            out.append(row)
+        return out
+
+    def save(self, path):
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.rows(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+
+class RollupWriter:
+    """Writer-style wrapper (see movimientos_io.FanoutWriter): aggregates while the
+    output is streamed and saves the rollup file on a clean exit."""
+
+    def __init__(self, path):
+        self.path = path
+        self.rollup = MonthlyRollup()
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def write(self, movimiento):
+        self.rollup.add(movimiento)
+        self.count += 1
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.rollup.save(self.path)
+        return False
+
+
+def diff_rollups(previous_rows, current):
+    """Returns (rows to upsert, group_keys to delete) between stored rows and a MonthlyRollup."""
+    previous = {r['group_key']: r for r in previous_rows}
+    upserts = []
+    current_keys = set()
+    for row in current.rows():
+        current_keys.add(row['group_key'])
+        old = previous.get(row['group_key'])
+        if (old is None or int(old['row_count']) != row['row_count']
+                or round(float(old['total']), 2) != row['total']
+                or round(float(old['total_abs']), 2) != row['total_abs']):
+            upserts.append(row)
+    return upserts, [k for k in previous if k not in current_keys]
@@ -0,0 +1,41 @@
+# Natural keys and content hashes for movimientos
+# A movimiento is identified by fecha, valor, detalle, banco, producto, miembro and family_id.
+
+import hashlib
+
+NATURAL_KEY_FIELDS = ('fecha', 'valor', 'detalle', 'banco', 'producto', 'miembro', 'family_id')
+DEFAULT_FAMILY_ID = 'default'
+
+
+def natural_key(m):
+    """Normalized (fecha, valor, detalle, banco, producto, miembro, family_id)."""
+    try:
+        valor = f"{float(m.get('valor') or 0):.2f}"
+    except (TypeError, ValueError):
+        valor = str(m.get('valor'))
+    return (
+        str(m.get('fecha') or '')[:10],
+        valor,
+        (m.get('detalle') or '').strip(),
+        m.get('banco') or '',
+        m.get('producto') or '',
+        m.get('miembro') or '',
+        m.get('family_id') or DEFAULT_FAMILY_ID,
+    )
+
+
+def row_hash(key, occurrence=0):
+    """Hash of the natural key; occurrence tells apart identical legit movimientos (two equal Uber trips)."""
+    payload = "\x1f".join(key) + f"\x1f{occurrence}"
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+def assign_row_hashes(movimientos):
+    """Sets m['row_hash'] on every movimiento (the n-th identical row gets occurrence n)."""
+    seen = {}
+    for m in movimientos:
+        key = natural_key(m)
+        occurrence = seen.get(key, 0)
+        seen[key] = occurrence + 1
+        m['row_hash'] = row_hash(key, occurrence)
+    return movimientos
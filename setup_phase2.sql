@@ -37,3 +37,129 @@ where not exists (select 1 from public.family_members where family_id = 'default
 insert into public.family_members (family_id, name, initials, color)
 select 'default', 'Fabio', 'F', 'bg-green-500'
 where not exists (select 1 from public.family_members where family_id = 'default' and name = 'Fabio');
+
+-- 6. Índices compuestos para las consultas del dashboard (siempre filtran por familia)
+alter table public.movimientos
+add column if not exists miembro text;
+
+create index if not exists movimientos_family_fecha_id
+on public.movimientos (family_id, fecha, id);
+
+create index if not exists movimientos_family_categoria_fecha
+on public.movimientos (family_id, categoria, fecha);
+
+create index if not exists movimientos_family_miembro_fecha
+on public.movimientos (family_id, miembro, fecha);
+
+-- 7. Clase de tipo (mismas reglas que tipo_flags.py; sólo para filas sin tipo_class, ver 10.)
+-- gasto | abono_tc (pago de tarjeta, no es ingreso) | ingreso | otro
+create or replace function public.movimiento_tipo_class(p_tipo text, p_categoria text, p_detalle text)
+returns text
+language sql
+immutable
+as $$
+  select case
+    when p_tipo in ('Compra', 'Retiro', 'Débito', 'Gasto', 'Pago', 'Cargo') then 'gasto'
+    when (lower(coalesce(p_tipo, '')) like '%abono%'
+          or lower(coalesce(p_categoria, '')) like '%abono%'
+          or lower(coalesce(p_detalle, '')) like '%abono%')
+         and not (lower(coalesce(p_tipo, '')) like '%interes%'
+                  or lower(coalesce(p_categoria, '')) like '%interes%'
+                  or lower(coalesce(p_detalle, '')) like '%interes%') then 'abono_tc'
+    when p_tipo in ('Depósito', 'Transferencia Recibida', 'Ingreso', 'Sueldo', 'Salario') then 'ingreso'
+    else 'otro'
+  end
+$$;
+
+-- 8. Agregados por mes / miembro / categoría / clase de tipo, calculados en el servidor
+-- Uso (PostgREST): POST /rest/v1/rpc/movimientos_summary {"p_family_id": "default", "p_desde": "2026-01-01"}
+create or replace function public.movimientos_summary(
+  p_family_id text,
+  p_desde date default null,
+  p_hasta date default null,
+  p_miembros text[] default null
+)
+returns table (
+  month text,
+  miembro text,
+  categoria text,
+  tipo_class text,
+  total numeric,
+  total_abs numeric,
+  row_count bigint
+)
+language sql
+stable
+as $$
+  select
+    to_char(m.fecha, 'YYYY-MM') as month,
+    coalesce(m.miembro, '') as miembro,
+    coalesce(nullif(m.categoria, ''), 'Otros') as categoria,
+    coalesce(m.tipo_class, public.movimiento_tipo_class(m.tipo, m.categoria, m.detalle)) as tipo_class,
+    sum(coalesce(m.valor, 0)) as total,
+    sum(abs(coalesce(m.valor, 0))) as total_abs,
+    count(*) as row_count
+  from public.movimientos m
+  where m.family_id = p_family_id
+    and (p_desde is null or m.fecha >= p_desde)
+    and (p_hasta is null or m.fecha <= p_hasta)
+    and (p_miembros is null or coalesce(m.miembro, '') = any (p_miembros))
+  group by 1, 2, 3, 4
+  order by 1, 2, 3, 4
+$$;
+
+-- 9. Listado paginado por llave (fecha, id), del más reciente al más antiguo
+-- Primera página sin p_after_*; las siguientes con la fecha e id de la última fila recibida.
+-- A diferencia de offset, el costo de cada página no crece con la profundidad.
+create or replace function public.movimientos_page(
+  p_family_id text,
+  p_limit integer default 500,
+  p_after_fecha date default null,
+  p_after_id uuid default null,
+  p_tipo_class text default null
+)
+returns setof public.movimientos
+language sql
+stable
+as $$
+  select m.*
+  from public.movimientos m
+  where m.family_id = p_family_id
+    and (p_after_fecha is null or (m.fecha, m.id) < (p_after_fecha, p_after_id))
+    and (p_tipo_class is null
+         or coalesce(m.tipo_class, public.movimiento_tipo_class(m.tipo, m.categoria, m.detalle)) = p_tipo_class)
+  order by m.fecha desc, m.id desc
+  limit least(greatest(p_limit, 1), 1000)
+$$;
+
+-- 10. Banderas de clase por fila (process_data / sync_data las calculan una vez, ver tipo_flags.py)
+-- El dashboard filtra por booleanos en lugar de buscar 'abono' / 'interes' en cada render.
+alter table public.movimientos
+add column if not exists is_expense boolean,
+add column if not exists is_income boolean,
+add column if not exists is_cc_payment boolean,
+add column if not exists is_interest boolean,
+add column if not exists tipo_class text;
+
+-- Filas cargadas antes de las banderas (mismas reglas que tipo_flags.compute_flags)
+update public.movimientos m
+set is_interest = f.is_interest,
+    is_cc_payment = f.is_cc_payment,
+    is_expense = m.tipo in ('Compra', 'Retiro', 'Débito', 'Gasto', 'Pago', 'Cargo'),
+    is_income = m.tipo in ('Depósito', 'Transferencia Recibida', 'Ingreso', 'Sueldo', 'Salario')
+                and not f.is_cc_payment,
+    tipo_class = public.movimiento_tipo_class(m.tipo, m.categoria, m.detalle)
+from (
+  select id,
+         lower(coalesce(tipo, '') || ' ' || coalesce(categoria, '') || ' ' || coalesce(detalle, '')) like '%interes%'
+           as is_interest,
+         lower(coalesce(tipo, '') || ' ' || coalesce(categoria, '') || ' ' || coalesce(detalle, '')) like '%abono%'
+           and lower(coalesce(tipo, '') || ' ' || coalesce(categoria, '') || ' ' || coalesce(detalle, '')) not like '%interes%'
+           as is_cc_payment
+  from public.movimientos
+  where tipo_class is null
+) f
+where m.id = f.id;
+
+create index if not exists movimientos_family_tipo_class_fecha
+on public.movimientos (family_id, tipo_class, fecha);
@@ -0,0 +1,116 @@
+# Manifest of pipeline inputs for incremental re-processing
+# Each source is fingerprinted (path, size, mtime, sha256) and the normalized rows
+# it produced are kept as NDJSON, so unchanged sources are not read again.
+
+import hashlib
+import json
+import os
+
+from classification_cache import CACHE_DIR, mapping_version
+from movimientos_io import NdjsonWriter, iter_movimientos
+
+MANIFEST_FILE = os.path.join(CACHE_DIR, "source_manifest.json")
+ROWS_DIR = os.path.join(CACHE_DIR, "sources")
+# Bump when the normalization in process_data changes so cached rows are rebuilt
+PIPELINE_VERSION = 4
+HASH_BLOCK = 1024 * 1024
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def file_fingerprint(path, previous=None):
+    """Returns {path, size, mtime, sha256}; the hash is reused when size/mtime match."""
+    if not path or not os.path.exists(path):
+        return {"path": path, "exists": False}
+    st = os.stat(path)
+    fp = {"path": path, "exists": True, "size": st.st_size, "mtime": st.st_mtime}
+    if previous and previous.get("exists") and all(previous.get(k) == fp[k] for k in ("path", "size", "mtime")):
+        fp["sha256"] = previous["sha256"]
+    else:
+        fp["sha256"] = file_sha256(path)
+    return fp
+
+
+def _same_content(a, b):
+    if not a or not b or a.get("path") != b.get("path") or a.get("exists") != b.get("exists"):
+        return False
+    return not a.get("exists") or a.get("sha256") == b.get("sha256")
+
+
+class SourceManifest:
+    """Tracks which sources changed since the last process_data run."""
+
+    def __init__(self, path=MANIFEST_FILE, rows_dir=ROWS_DIR):
+        self.path = path
+        self.rows_dir = rows_dir
+        self.version = f"{PIPELINE_VERSION}:{mapping_version()}"
+        self.entries = {}
+        self.output = None
+        self.options = None
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.entries = data.get("sources", {})
+                self.output = data.get("output")
+                self.options = data.get("options")
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Warning: ignoring unreadable manifest {path}: {e}")
+        self._saved_rows = {name: entry.get("rows") for name, entry in self.entries.items()}
+
+    def rows_file(self, name):
+        return os.path.join(self.rows_dir, f"{name}.ndjson")
+
+    def is_unchanged(self, name, path):
+        """True if the source has the same content and was processed with the same mapping."""
+        entry = self.entries.get(name)
+        if not entry or entry.get("version") != self.version or not os.path.exists(self.rows_file(name)):
+            return False
+        current = file_fingerprint(path, entry.get("source"))
+        if not current["exists"] or not _same_content(current, entry.get("source")):
+            return False
+        entry["source"] = current  # refresh mtime after a no-content touch
+        return True
+
+    def cached_rows(self, name):
+        return iter_movimientos(self.rows_file(name))
+
+    def record(self, name, path, rows):
+        """Passes rows through while caching them; commits the entry only if the source is fully read."""
+        os.makedirs(self.rows_dir, exist_ok=True)
+        fingerprint = file_fingerprint(path)
+        with NdjsonWriter(self.rows_file(name)) as writer:
+            for m in rows:
+                writer.write(m)
+                yield m
+        self.entries[name] = {"source": fingerprint, "version": self.version, "rows": writer.count}
+
+    def emptied_sources(self):
+        """{name: previous rows} of the sources that had rows in the saved manifest and now read none."""
+        return {name: rows for name, rows in self._saved_rows.items()
+                if rows and self.entries.get(name, {}).get("rows") == 0}
+
+    def forget(self, name):
+        """Drops the entry and cached rows of a source, so the next run reads it again."""
+        self.entries.pop(name, None)
+        if os.path.exists(self.rows_file(name)):
+            os.remove(self.rows_file(name))
+
+    def output_is_current(self, output_file, options=None):
+        """True if output_file is the one last written, with the same process_data options."""
+        if (options or None) != self.options:
+            return False
+        return _same_content(file_fingerprint(output_file, self.output), self.output)
+
+    def save(self, output_file, options=None):
+        self.output = file_fingerprint(output_file)
+        self.options = options or None
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({"sources": self.entries, "output": self.output, "options": self.options}, f, ensure_ascii=False, indent=2)
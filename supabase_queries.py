@@ -0,0 +1,129 @@
+# Client for the server-side queries defined in setup_phase2.sql
+# movimientos_summary (aggregates) and movimientos_page (keyset pagination by fecha, id),
+# called through PostgREST (RestQueries) or straight on Postgres (PostgresQueries, psycopg2).
+
+import abc
+import sys
+from decimal import Decimal
+
+import requests
+
+from row_keys import DEFAULT_FAMILY_ID
+from upload_to_supabase import SUPABASE_URL, REQUEST_TIMEOUT, make_session
+
+PAGE_SIZE = 500  # movimientos_page caps a page at 1000 rows
+
+try:
+    import psycopg2
+    import psycopg2.extras
+except ImportError:  # Only needed for PostgresQueries
+    psycopg2 = None
+
+
+class QueryFailed(Exception):
+    """A query function could not be called (HTTP error, network error, missing function)."""
+
+
+def _plain(row):
+    """numeric comes back as Decimal from psycopg2 and dates as date objects: use JSON types."""
+    out = {}
+    for k, v in row.items():
+        if isinstance(v, Decimal):
+            v = float(v)
+        elif hasattr(v, 'isoformat'):
+            v = v.isoformat()
+        elif v is not None and not isinstance(v, (str, int, float, bool)):
+            v = str(v)  # uuid
+        out[k] = v
+    return out
+
+
+class _Queries(abc.ABC):
+    @abc.abstractmethod
+    def _call(self, function, params):
+        """Calls public.<function> with named params; returns its rows as JSON-typed dicts."""
+
+    def summary(self, family_id=DEFAULT_FAMILY_ID, desde=None, hasta=None, miembros=None):
+        """Rows {month, miembro, categoria, tipo_class, total, total_abs, row_count}."""
+        return self._call("movimientos_summary", {
+            "p_family_id": family_id,
+            "p_desde": desde,
+            "p_hasta": hasta,
+            "p_miembros": list(miembros) if miembros is not None else None,
+        })
+
+    def page(self, family_id=DEFAULT_FAMILY_ID, limit=PAGE_SIZE, after=None, tipo_class=None):
+        """One page, newest first; after is the (fecha, id) of the last row already seen."""
+        after_fecha, after_id = after if after else (None, None)
+        return self._call("movimientos_page", {
+            "p_family_id": family_id,
+            "p_limit": limit,
+            "p_after_fecha": after_fecha,
+            "p_after_id": after_id,
+            "p_tipo_class": tipo_class,
+        })
+
+    def iter_movimientos(self, family_id=DEFAULT_FAMILY_ID, page_size=PAGE_SIZE, tipo_class=None):
+        """Yields every movimiento of the family, one keyset page at a time."""
+        after = None
+        while True:
+            rows = self.page(family_id, page_size, after, tipo_class)
+            yield from rows
+            if len(rows) < page_size:
+                return
+            after = (rows[-1]['fecha'], rows[-1]['id'])
+
+
+class RestQueries(_Queries):
+    """Calls the functions as PostgREST RPCs (POST /rest/v1/rpc/<function>)."""
+
+    def __init__(self, session=None, url=SUPABASE_URL):
+        self.session = session or make_session(pool_size=1)
+        self.url = url
+
+    def _call(self, function, params):
+        try:
+            response = self.session.post(f"{self.url}/rest/v1/rpc/{function}", json=params, timeout=REQUEST_TIMEOUT)
+        except requests.RequestException as e:
+            raise QueryFailed(f"❌ Error calling {function}: {type(e).__name__}: {e}") from e
+        if response.status_code != 200:
+            raise QueryFailed(f"❌ Error calling {function}: {response.status_code} - {response.text[:200]}")
+        return response.json()
+
+
+class PostgresQueries(_Queries):
+    """Runs the same functions over a psycopg2 connection (local Postgres, scripts)."""
+
+    def __init__(self, conn_or_dsn):
+        if psycopg2 is None:
+            raise ImportError("psycopg2 is required for PostgresQueries (pip install psycopg2-binary)")
+        self.conn = psycopg2.connect(conn_or_dsn) if isinstance(conn_or_dsn, str) else conn_or_dsn
+
+    def _call(self, function, params):
+        args = ", ".join(f"{name} => %({name})s" for name in params)
+        try:
+            with self.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                cur.execute(f"select * from public.{function}({args})", params)
+                rows = [_plain(r) for r in cur.fetchall()]
+        except psycopg2.Error as e:
+            self.conn.rollback()
+            raise QueryFailed(f"❌ Error calling {function}: {e}") from e
+        self.conn.commit()
+        return rows
+
+
+if __name__ == "__main__":
+    # python supabase_queries.py [family_id]  ->  monthly gasto/ingreso totals from the server
+    queries = RestQueries()
+    totals = {}
+    try:
+        summary = queries.summary(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_FAMILY_ID)
+    except QueryFailed as e:
+        print(e)
+        sys.exit(1)
+    for r in summary:
+        month = totals.setdefault(r['month'], {"gasto": 0.0, "ingreso": 0.0})
+        if r['tipo_class'] in month:
+            month[r['tipo_class']] += float(r['total'])
+    for month, t in sorted(totals.items()):
+        print(f"   {month}: ingresos {t['ingreso']:,.0f} | gastos {t['gasto']:,.0f}")
@@ -10,7 +10,14 @@ create table public.movimientos (
   numero_producto text,
   valor numeric,
   tipo text,
-  categoria text
+  categoria text,
+  -- Clase del movimiento, calculada al procesar (ver tipo_flags.py)
+  is_expense boolean,
+  is_income boolean,
+  is_cc_payment boolean,
+  is_interest boolean,
+  tipo_class text, -- gasto | abono_tc | ingreso | otro
+  row_hash text unique -- Hash del contenido (ver row_keys.py) para sync incremental
 );
 
 -- Habilitar Row Level Security (RLS)
@@ -26,3 +33,38 @@ with check (true);
 create policy "Enable read access for all users" 
 on public.movimientos for select 
 using (true);
+
+-- Migración para tablas existentes: columna row_hash única.
+-- delta_sync.py calcula el hash localmente (fecha, valor, detalle, banco, producto, miembro, family_id)
+-- y sólo envía inserts/deletes de la diferencia; las filas antiguas sin hash se comparan por contenido.
+alter table public.movimientos
+add column if not exists row_hash text;
+
+create unique index if not exists movimientos_row_hash_key
+on public.movimientos (row_hash);
+
+-- Rollups mensuales (ver rollups.py): suma y conteo por familia, mes, miembro, categoría y clase de tipo.
+-- delta_sync.py sólo actualiza los grupos que cambiaron; el dashboard los usa para KPIs y el donut.
+create table if not exists public.movimientos_rollups (
+  group_key text primary key, -- Hash de (family_id, month, miembro, categoria, tipo_class)
+  family_id text not null,
+  month text not null, -- 'YYYY-MM'
+  miembro text not null default '',
+  categoria text not null,
+  tipo_class text not null, -- gasto | abono_tc | ingreso | otro
+  total numeric not null,
+  total_abs numeric not null,
+  row_count integer not null,
+  updated_at timestamp with time zone default timezone('utc'::text, now()) not null
+);
+
+create index if not exists movimientos_rollups_family_month
+on public.movimientos_rollups (family_id, month);
+
+alter table public.movimientos_rollups enable row level security;
+
+create policy "Enable all for anon (rollups)"
+on public.movimientos_rollups
+for all
+using (true)
+with check (true);
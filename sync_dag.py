@@ -0,0 +1,129 @@
+# Minimal in-process stage DAG for the sync
+# Stages run on a thread pool as soon as their dependencies finish; results are
+# passed in memory. The first failure or timeout stops the run (fail-fast).
+# A thread can't be killed: cancellable stages get a threading.Event that is set on
+# failure and must stop at the next safe point (e.g. between upload batches). A stage
+# still running after CANCEL_GRACE seconds is tracked, and no new run starts until it ends.
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+CANCEL_GRACE = 30  # Seconds a failed run waits for its running stages to stop
+
+_abandoned = {}  # future -> stage name, stages of failed runs that were still running
+_abandoned_lock = threading.Lock()
+
+
+class StageFailed(Exception):
+    """A stage raised or exceeded its timeout."""
+
+    def __init__(self, stage, reason):
+        super().__init__(f"Stage '{stage}' failed: {reason}")
+        self.stage = stage
+        self.reason = reason
+
+
+class Stage:
+    """func receives the results of deps as keyword arguments named after them.
+
+    A cancellable stage also gets cancel=threading.Event, set when the run fails.
+    """
+
+    def __init__(self, name, func, deps=(), timeout=None, cancellable=False):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.timeout = timeout
+        self.cancellable = cancellable
+
+
+def _check_graph(stages):
+    names = {s.name for s in stages}
+    for s in stages:
+        missing = [d for d in s.deps if d not in names]
+        if missing:
+            raise ValueError(f"Stage '{s.name}' depends on unknown stages: {missing}")
+    # Kahn's algorithm, only to reject cycles up front
+    pending = {s.name: set(s.deps) for s in stages}
+    while pending:
+        ready = [n for n, deps in pending.items() if not deps]
+        if not ready:
+            raise ValueError(f"Cycle between stages: {sorted(pending)}")
+        for n in ready:
+            del pending[n]
+        for deps in pending.values():
+            deps.difference_update(ready)
+
+
+def still_running():
+    """Names of the stages of failed runs that haven't stopped yet."""
+    with _abandoned_lock:
+        for future in [f for f in _abandoned if f.done()]:
+            del _abandoned[future]
+        return sorted(_abandoned.values())
+
+
+def run_dag(stages, max_workers=4, on_stage_done=None, cancel_grace=CANCEL_GRACE):
+    """Runs the stages and returns {name: result}.
+
+    Independent stages run in parallel. Raises StageFailed on the first error or
+    timeout: stages not yet started are cancelled, cancellable ones are told to stop
+    and the run waits up to cancel_grace seconds for the running ones. Refuses to
+    start (StageFailed) while a stage of an earlier failed run is still running.
+    """
+    _check_graph(stages)
+    busy = still_running()
+    if busy:
+        raise StageFailed(busy[0], "still running from a previous failed run, not starting a new one")
+    by_name = {s.name: s for s in stages}
+    results = {}
+    timings = {}
+    running = {}  # future -> (stage, started, deadline)
+    waiting = list(stages)
+    cancel = threading.Event()
+
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        while waiting or running:
+            for stage in [s for s in waiting if all(d in results for d in s.deps)]:
+                waiting.remove(stage)
+                kwargs = {d: results[d] for d in stage.deps}
+                if stage.cancellable:
+                    kwargs["cancel"] = cancel
+                started = time.perf_counter()
+                deadline = started + stage.timeout if stage.timeout else None
+                running[pool.submit(stage.func, **kwargs)] = (stage, started, deadline)
+
+            if not running:
+                raise StageFailed(waiting[0].name, "dependencies can never be satisfied")
+
+            deadlines = [d for _, _, d in running.values() if d is not None]
+            timeout = max(0.0, min(deadlines) - time.perf_counter()) if deadlines else None
+            finished, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+
+            now = time.perf_counter()
+            for future, (stage, started, deadline) in list(running.items()):
+                if future in finished:
+                    del running[future]
+                    error = future.exception()
+                    if error is not None:
+                        raise StageFailed(stage.name, f"{type(error).__name__}: {error}") from error
+                    results[stage.name] = future.result()
+                    timings[stage.name] = now - started
+                    if on_stage_done:
+                        on_stage_done(stage.name, timings[stage.name], results[stage.name])
+                elif deadline is not None and now >= deadline:
+                    raise StageFailed(stage.name, f"timeout after {by_name[stage.name].timeout}s")
+    except BaseException:
+        cancel.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+        _, alive = wait(list(running), timeout=cancel_grace)
+        if alive:
+            print(f"⚠️ Sin detenerse tras {cancel_grace}s: {', '.join(running[f][0].name for f in alive)}")
+            with _abandoned_lock:
+                _abandoned.update({f: running[f][0].name for f in alive})
+        raise
+    pool.shutdown(wait=False)
+
+    return results
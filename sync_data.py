@@ -1,22 +1,187 @@
-import subprocess
 import sys
 
-def run_script(script_name):
-    print(f"\n🚀 Running {script_name}...")
-    try:
-        result = subprocess.run([sys.executable, script_name], check=True, text=True)
-        print(f"✅ {script_name} completed successfully.")
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Error running {script_name}: {e}")
-        sys.exit(1)
+from classification_cache import get_classification_cache
+from dedupe import Deduplicator
+from instrumentation import RunReport, report_options
+from delta_sync import sync_delta, sync_partitions
+from movimiento_store import MovimientoStore, as_store
+from movimientos_io import partition_root_for
+from pg_copy_sync import copy_sync
+from process_data import (
+    OUTPUT_FILE, classify_movimientos, get_sources, output_options, outputs_current, prefetch_excel_sources,
+    write_outputs,
+)
+from source_manifest import SourceManifest
+from sync_dag import Stage, StageFailed, run_dag
+
+# Per-stage timeouts (seconds)
+READ_TIMEOUT = 600
+CLASSIFY_TIMEOUT = 300
+DEDUPE_TIMEOUT = 300
+WRITE_TIMEOUT = 600
+UPLOAD_TIMEOUT = 1800
+# Upload backends: REST delta of the changed month partitions (default), REST delta of the whole
+# output (delta_sync) or COPY over a direct Postgres connection (pg_copy_sync)
+UPLOAD_BACKENDS = {"partitions": sync_partitions, "rest": sync_delta, "copy": copy_sync}
+
+
+def build_stages(output_file=OUTPUT_FILE, force=False, write_parquet=False,
+                 drop_duplicates=False, drop_near_duplicates=False, upload=True, dry_run=False,
+                 all_excels=False, allow_removals=False, report=None, backend="partitions"):
+    """Declares the sync as a DAG; data moves between stages in memory.
+
+    read_2025  ─┐
+                ├─ classify ─ dedupe ─ write ─ upload
+    read_excel ─┘
+
+    read_excel parses several workbooks across a process pool with all_excels.
+    upload waits for write with every backend: Supabase never gets rows the local
+    output doesn't have (write raises instead of replacing it on errors).
+    Each stage records its timing, rows and memory in report (see instrumentation.py).
+    backend picks how upload reaches Supabase (see UPLOAD_BACKENDS).
+    write refuses to drop a source's rows or many month partitions unless allow_removals.
+    """
+    report = report or RunReport("sync_data")
+    manifest = SourceManifest()
+    options = output_options(write_parquet, drop_duplicates, drop_near_duplicates, all_excels)
+    sources = get_sources(all_excels=all_excels)
+    sync_upload = UPLOAD_BACKENDS[backend]
+
+    def reader(stage_name, selected):
+        def read_sources():
+            with report.stage(stage_name) as metrics:
+                results = []
+                unchanged = {name for name, path, _ in selected if not force and manifest.is_unchanged(name, path)}
+                for name, path, read in prefetch_excel_sources(selected, skip=unchanged):
+                    if name in unchanged:
+                        print(f"♻️ {name}: sin cambios, usando filas en caché")
+                        results.append({"name": name, "path": path, "fresh": False,
+                                        "rows": as_store(manifest.cached_rows(name))})
+                    else:
+                        results.append({"name": name, "path": path, "fresh": True,
+                                        "rows": as_store(read(classify=False))})
+                metrics.rows_out = sum(len(r["rows"]) for r in results)
+            return results
+        return read_sources
+
+    def classify(read_2025, read_excel):
+        tagged = MovimientoStore()
+        results = read_2025 + read_excel
+        with report.stage("classify", rows_in=sum(len(r["rows"]) for r in results)) as metrics:
+            for result in results:
+                if result["fresh"]:
+                    classify_movimientos(result["rows"])
+                    # Consume the tee so the manifest caches the classified rows
+                    for _ in manifest.record(result["name"], result["path"], result["rows"]):
+                        pass
+                tagged.extend(result["rows"], tag=result["name"])
+            metrics.rows_out = len(tagged)
+        cache = get_classification_cache()
+        cache.print_stats()
+        cache.close()
+        return {"rows": tagged, "changed": any(r["fresh"] for r in results)}
+
+    def dedupe(classify):
+        deduper = Deduplicator(drop_exact=drop_duplicates)
+        with report.stage("dedupe", rows_in=len(classify["rows"])) as metrics:
+            kept = MovimientoStore()
+            for s, m in classify["rows"].tagged_rows():
+                if deduper.add(m, s):
+                    kept.append(m, tag=s)
+            near_pairs = deduper.find_near_duplicates()
+            rows = kept
+            if drop_near_duplicates:
+                dropped = {later for _, later, _ in near_pairs}
+                rows = MovimientoStore()
+                for i, (s, m) in enumerate(kept.tagged_rows()):
+                    if i not in dropped:
+                        rows.append(m, tag=s)
+            metrics.rows_out = len(rows)
+        deduper.report(near_pairs)
+        if drop_near_duplicates:
+            print(f"   {len(kept) - len(rows)} posibles duplicados eliminados.")
+        return {"rows": rows, "changed": classify["changed"]}
+
+    def write(dedupe):
+        if not dedupe["changed"] and outputs_current(manifest, output_file, options):
+            print(f"✅ {output_file} ya está al día.")
+            manifest.save(output_file, options)
+            return 0
+        stats = write_outputs(dedupe["rows"].tagged_rows(), output_file, manifest, options, report,
+                              allow_removals=allow_removals)
+        print(f"💾 {stats['count']} movimientos escritos en {output_file}")
+        return stats["count"]
+
+    def upload_stage(dedupe, write, cancel):
+        # The store hands out fresh dicts: sync_delta adds family_id/row_hash without touching it
+        with report.stage("upload", rows_in=len(dedupe["rows"])) as metrics:
+            result = sync_upload(rows=list(dedupe["rows"]), dry_run=dry_run, cancel=cancel)
+        return upload_done(result, metrics)
+
+    def partition_upload_stage(write, cancel):
+        # Needs the partition index from write: only months whose checksum changed are compared and sent
+        with report.stage("upload") as metrics:
+            result = sync_partitions(partition_root_for(output_file), dry_run=dry_run, cancel=cancel)
+        return upload_done(result, metrics)
+
+    def upload_done(result, metrics):
+        if result is None:
+            raise RuntimeError(f"{backend} sync to Supabase did not complete")
+        metrics.rows_out = result["inserted"] + result.get("updated", 0) + result["deleted"]
+        report.record_http("upload", result.get("batch_latencies", []))
+        return result
+
+    stages = [
+        Stage("read_2025", reader("read_2025", [s for s in sources if s[0] == "2025"]), timeout=READ_TIMEOUT),
+        Stage("read_excel", reader("read_excel", [s for s in sources if s[0] != "2025"]), timeout=READ_TIMEOUT),
+        Stage("classify", classify, deps=("read_2025", "read_excel"), timeout=CLASSIFY_TIMEOUT),
+        Stage("dedupe", dedupe, deps=("classify",), timeout=DEDUPE_TIMEOUT),
+        Stage("write", write, deps=("dedupe",), timeout=WRITE_TIMEOUT),
+    ]
+    # Uploads stop between batches once the DAG fails or times out (see sync_dag.run_dag)
+    if upload and backend == "partitions":
+        stages.append(Stage("upload", partition_upload_stage, deps=("write",), timeout=UPLOAD_TIMEOUT,
+                            cancellable=True))
+    elif upload:
+        stages.append(Stage("upload", upload_stage, deps=("dedupe", "write"), timeout=UPLOAD_TIMEOUT,
+                            cancellable=True))
+    return stages
+
+
+def _stage_done(name, seconds, _result):
+    print(f"✅ {name} completed in {seconds:.2f}s.")
+
 
 if __name__ == "__main__":
     print("🔄 Starting Data Sync Process...")
-    
-    # 1. Process Data (Generate JSON)
-    run_script("process_data.py")
-    
-    # 2. Upload to Supabase
-    run_script("upload_to_supabase.py")
-    
+
+    # --trace-memory / --profile <stage> add tracemalloc peaks / a cProfile dump to the run report
+    # --backend rest syncs the whole output instead of the changed month partitions;
+    # --backend copy loads through COPY over SUPABASE_DB_URL instead of REST batches
+    # --allow-removals lets the run drop a source that reads no rows / several month partitions
+    report = RunReport("sync_data", **report_options(sys.argv))
+    backend = sys.argv[sys.argv.index("--backend") + 1] if "--backend" in sys.argv else "partitions"
+    if backend not in UPLOAD_BACKENDS:
+        print(f"❌ Backend desconocido: {backend} ({' | '.join(UPLOAD_BACKENDS)})")
+        sys.exit(1)
+    stages = build_stages(
+        force="--force" in sys.argv,
+        write_parquet="--parquet" in sys.argv,
+        drop_duplicates="--drop-duplicates" in sys.argv,
+        drop_near_duplicates="--drop-near-duplicates" in sys.argv,
+        upload="--no-upload" not in sys.argv,
+        dry_run="--dry-run" in sys.argv,
+        all_excels="--all-excels" in sys.argv,
+        allow_removals="--allow-removals" in sys.argv,
+        report=report,
+        backend=backend,
+    )
+    try:
+        run_dag(stages, on_stage_done=_stage_done)
+    except StageFailed as e:
+        print(f"❌ {e}")
+        report.save()
+        sys.exit(1)
+    report.save()
+
     print("\n✨ All data synchronized to Supabase!")
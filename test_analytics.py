@@ -0,0 +1,51 @@
+# analytics views over outputs written before the flags (python -m pytest test_analytics.py)
+
+import json
+
+import pytest
+
+import analytics
+from tipo_flags import FLAG_FIELDS, add_flags, compute_flags
+
+duckdb = pytest.importorskip("duckdb")
+
+ROWS = [
+    {"banco": "Itau", "tipo": "Compra", "valor": -50000.0, "fecha": "2026-01-05", "producto": "Crédito",
+     "numero_producto": "1234", "detalle": "EXITO", "categoria": "Mercado"},
+    {"banco": "Itau", "tipo": "Abono", "valor": 800000.0, "fecha": "2026-01-10", "producto": "Crédito",
+     "numero_producto": "1234", "detalle": "ABONO TARJETA", "categoria": None},
+    {"banco": "Itau", "tipo": "Abono", "valor": 1200.0, "fecha": "2026-01-11", "producto": "Ahorros",
+     "numero_producto": "2186", "detalle": "ABONO INTERESES", "categoria": None},
+    {"banco": "Bancolombia", "tipo": "Sueldo", "valor": 3000000.0, "fecha": "2026-01-30", "producto": "Ahorros",
+     "numero_producto": "2186", "detalle": "NOMINA", "categoria": "Ingresos"},
+]
+
+
+def _flags(conn):
+    columns, rows = analytics.run_sql(conn, f"select detalle, {', '.join(FLAG_FIELDS)} from movimientos")
+    return {r[0]: dict(zip(columns[1:], r[1:])) for r in rows}
+
+
+def test_pre_flag_json_gets_the_flags(tmp_path):
+    path = tmp_path / "movimientos.json"
+    path.write_text(json.dumps(ROWS), encoding="utf-8")
+    conn = analytics.connect(str(path))
+    assert _flags(conn) == {m["detalle"]: compute_flags(m) for m in ROWS}
+    assert analytics.run_query(conn, "abonos")[1] == [("abono_tc", 1, 800000.0), ("interes", 1, 1200.0)]
+    assert [r[0] for r in analytics.run_query(conn, "top_comercios")[1]] == ["EXITO"]
+
+
+def test_pre_flag_parquet_gets_the_flags(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "movimientos.json"
+    pq.write_table(pa.Table.from_pylist(ROWS), str(tmp_path / "movimientos.parquet"))
+    assert _flags(analytics.connect(str(path))) == {m["detalle"]: compute_flags(m) for m in ROWS}
+
+
+def test_stored_flags_win(tmp_path):
+    rows = [add_flags(dict(m)) for m in ROWS]
+    rows[0]["tipo_class"] = "otro"
+    path = tmp_path / "movimientos.json"
+    path.write_text(json.dumps(rows), encoding="utf-8")
+    assert _flags(analytics.connect(str(path)))["EXITO"]["tipo_class"] == "otro"
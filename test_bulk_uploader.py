@@ -0,0 +1,137 @@
+# BulkUploader against a local PostgREST-like stub (python -m pytest test_bulk_uploader.py)
+# The stub accepts JSON batches on /rest/v1/movimientos and can be told to reject large
+# payloads (413), fail the first requests (503), reject some rows (400) or answer slowly.
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from upload_to_supabase import BulkUploader, UploadAborted, UploadCheckpoint, make_session
+
+
+class StubState:
+    def __init__(self):
+        self.received = []       # Row numbers accepted, in arrival order
+        self.requests = 0
+        self.max_rows = None     # Larger batches get 413
+        self.fail_first = 0      # The first N requests get 503
+        self.reject_from = None  # Batches with a row >= this get 400
+        self.delay = 0.0
+        self.lock = threading.Lock()
+
+
+def _handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            batch = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            with state.lock:
+                state.requests += 1
+                attempt = state.requests
+            time.sleep(state.delay)
+            if attempt <= state.fail_first:
+                return self._reply(503)
+            if state.max_rows and len(batch) > state.max_rows:
+                return self._reply(413)
+            if state.reject_from is not None and any(r["n"] >= state.reject_from for r in batch):
+                return self._reply(400)
+            with state.lock:
+                state.received.extend(r["n"] for r in batch)
+            self._reply(201)
+
+        def _reply(self, status):
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+    return Handler
+
+
+@pytest.fixture
+def stub():
+    state = StubState()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(state))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state.url = f"http://127.0.0.1:{server.server_port}/rest/v1/movimientos"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+def _rows(n):
+    return [{"n": i} for i in range(n)]
+
+
+def _uploader(stub, **kwargs):
+    kwargs.setdefault("backoff_base", 0.001)
+    return BulkUploader(stub.url, session=make_session(4), **kwargs)
+
+
+def test_413_splits_the_batch(stub):
+    stub.max_rows = 40
+    uploader = _uploader(stub, max_in_flight=1, batch_size=200, min_batch_size=10)
+    assert uploader.upload(_rows(500)) == 500
+    assert sorted(stub.received) == list(range(500))
+    assert not uploader.failed_ranges
+    assert uploader.batch_size <= 200
+
+
+def test_retries_on_retry_status(stub):
+    stub.fail_first = 3
+    uploader = _uploader(stub, max_in_flight=1, batch_size=100)
+    assert uploader.upload(_rows(250)) == 250
+    assert sorted(stub.received) == list(range(250))
+    assert stub.requests > 3
+
+
+def test_non_retryable_status_fails_without_retries(stub):
+    stub.reject_from = 0
+    uploader = _uploader(stub, max_in_flight=1, batch_size=100)
+    assert uploader.upload(_rows(100)) == 0
+    assert uploader.failed_ranges == [(0, 100)]
+    assert stub.requests == 1
+
+
+def test_checkpoint_resumes_where_it_stopped(stub, tmp_path):
+    rows = _rows(300)
+    path = str(tmp_path / "checkpoint.json")
+    stub.reject_from = 200
+    first = _uploader(stub, max_in_flight=1, batch_size=50, max_batch_size=50)
+    assert first.upload(rows, UploadCheckpoint(path, "dataset-1")) == 200
+    assert first.failed_ranges
+
+    stub.reject_from = None
+    stub.received.clear()
+    checkpoint = UploadCheckpoint(path, "dataset-1")
+    assert checkpoint.uploaded_rows() == 200
+    second = _uploader(stub, max_in_flight=1, batch_size=50)
+    assert second.upload(rows, checkpoint) == 100
+    assert sorted(stub.received) == list(range(200, 300))
+
+    # Another dataset never reuses the checkpoint
+    assert UploadCheckpoint(path, "dataset-2").uploaded_rows() == 0
+
+
+def test_batch_size_adapts_to_latency(stub):
+    fast = _uploader(stub, max_in_flight=1, batch_size=10, max_batch_size=160, target_seconds=10.0)
+    fast.upload(_rows(1000))
+    assert fast.batch_size == 160
+
+    stub.delay = 0.05
+    slow = _uploader(stub, max_in_flight=1, batch_size=80, min_batch_size=5, target_seconds=0.01)
+    slow.upload(_rows(200))
+    assert slow.batch_size == 5
+
+
+def test_cancel_stops_sending_batches(stub):
+    cancel = threading.Event()
+    cancel.set()
+    uploader = _uploader(stub, max_in_flight=1, batch_size=50, cancel=cancel)
+    with pytest.raises(UploadAborted):
+        uploader.upload(_rows(200))
+    assert stub.requests == 0
@@ -0,0 +1,61 @@
+# Compiled merchant classifier vs. the original nested loops (python -m pytest test_category_mapping.py)
+
+import json
+import os
+import random
+
+import pytest
+
+from category_mapping import CATEGORY_MAPPING, FALLBACK_PATTERNS, MerchantClassifier
+
+DATA_FILE = os.path.join(os.path.dirname(__file__), "data", "movimientos.json")
+
+
+def reference_category(merchant_name, mapping=CATEGORY_MAPPING, fallback_patterns=FALLBACK_PATTERNS):
+    """First match in dict order, as get_category_for_merchant did before the automaton."""
+    if not merchant_name:
+        return "Otros"
+    merchant_upper = merchant_name.upper().strip()
+    for category, merchants in mapping.items():
+        for m in merchants:
+            if m.upper() in merchant_upper or merchant_upper in m.upper():
+                return category
+    for category, keywords in fallback_patterns.items():
+        for kw in keywords:
+            if kw in merchant_upper:
+                return category
+    return "Otros"
+
+
+def _samples(seed=7):
+    rng = random.Random(seed)
+    merchants = [m for ms in CATEGORY_MAPPING.values() for m in ms]
+    keywords = [kw for kws in FALLBACK_PATTERNS.values() for kw in kws]
+    samples = ["", "   ", None, "x", "ZZZ SIN CATEGORIA", "compra en uber trip", "pago pse epm bogota"]
+    for m in merchants + keywords:
+        samples += [m, m.lower(), f"COMPRA EN {m} 123", f"  {m}  ", m[1:-1], m[: max(1, len(m) // 2)]]
+    for _ in range(2000):
+        parts = rng.sample(merchants + keywords, 2)
+        cut = rng.randrange(len(parts[0]) + 1)
+        samples.append(f"{parts[0][cut:]} {parts[1][:rng.randrange(len(parts[1]) + 1)]}")
+    if os.path.exists(DATA_FILE):
+        with open(DATA_FILE, encoding="utf-8") as f:
+            samples += [m.get("detalle") for m in json.load(f)]
+    return samples
+
+
+def test_matches_reference_loop():
+    classifier = MerchantClassifier()
+    samples = _samples()
+    mismatches = [(s, classifier.classify(s), reference_category(s)) for s in samples
+                  if classifier.classify(s) != reference_category(s)]
+    assert mismatches == []
+    assert classifier.classify_many(samples) == [reference_category(s) for s in samples]
+
+
+@pytest.mark.parametrize("text", ["PAN", "PANADERIA CENTRAL", "CENTRAL", "ERIA", "BAR PAN", "NADA"])
+def test_order_decides_overlapping_matches(text):
+    mapping = {"B": ["PANADERIA", "BAR"], "A": ["PAN", "CENTRAL PARK"], "C": ["ERIA"]}
+    fallback = {"F": ["NAD", "CENTRAL"]}
+    classifier = MerchantClassifier(mapping, fallback)
+    assert classifier.classify(text) == reference_category(text, mapping, fallback)
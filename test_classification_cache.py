@@ -0,0 +1,35 @@
+# Persistent classification cache (python -m pytest test_classification_cache.py)
+
+from category_mapping import MerchantClassifier
+from classification_cache import ClassificationCache, mapping_version
+
+MAPPING = {"Mercado": ["EXITO"], "Transporte": ["UBER"]}
+
+
+def test_version_follows_the_classifier(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    assert ClassificationCache(path).version == mapping_version()
+
+    custom = MerchantClassifier(MAPPING, {})
+    cache = ClassificationCache(path, classifier=custom)
+    assert cache.version == mapping_version(MAPPING, {}) != mapping_version()
+    assert cache.classify_many(["Exito Calle 80", "uber trip", "RAPPI"]) == ["Mercado", "Transporte", "Otros"]
+    cache.close()
+
+    # Another mapping never reads the custom classifier's entries
+    other = ClassificationCache(path, classifier=MerchantClassifier({"Viajes": ["UBER"]}, {}))
+    assert other.classify_many(["uber trip"]) == ["Viajes"]
+    assert (other.disk_hits, other.misses) == (0, 1)
+    other.close()
+
+
+def test_entries_persist_across_runs(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = ClassificationCache(path, classifier=MerchantClassifier(MAPPING, {}))
+    cache.classify_many(["EXITO", "UBER TRIP"])
+    cache.close()
+
+    cache = ClassificationCache(path, classifier=MerchantClassifier(MAPPING, {}))
+    assert cache.classify_many([" exito ", "UBER TRIP", None]) == ["Mercado", "Transporte", "Otros"]
+    assert (cache.disk_hits, cache.misses) == (2, 0)
+    cache.close()
@@ -0,0 +1,52 @@
+# Exact and near-duplicate detection (python -m pytest test_dedupe.py)
+
+from dedupe import Deduplicator, merchant_key
+
+
+def _m(fecha, valor, detalle, banco="Itau", tipo="Compra"):
+    return {"fecha": fecha, "valor": valor, "detalle": detalle, "banco": banco, "producto": "Crédito", "tipo": tipo}
+
+
+def _run(rows, drop_exact=False):
+    dedupe = Deduplicator(drop_exact=drop_exact)
+    kept = [dedupe.add(m, source) for source, m in rows]
+    return dedupe, kept
+
+
+def test_merchant_key():
+    assert merchant_key("Compra en  Uber*Trip ") == "UBER TRIP"
+    assert merchant_key(None) == ""
+
+
+def test_exact_duplicates():
+    rows = [("2025", _m("2025-03-01", 26200, "JUAN VALDEZ")),
+            ("2025", _m("2025-03-01", 26200, "JUAN VALDEZ ")),  # Same natural key (detalle stripped)
+            ("2025", _m("2025-03-01", 26200, "JUAN VALDEZ", tipo="Retiro"))]
+    dedupe, kept = _run(rows)
+    assert kept == [True, True, True]
+    assert dedupe.exact_duplicates == [(0, 1)]
+    assert dedupe.find_near_duplicates() == [(1, 2, "same_merchant")]  # Nearest earlier match only
+
+    dedupe, kept = _run(rows, drop_exact=True)
+    assert kept == [True, False, True]
+    assert dedupe.find_near_duplicates() == [(0, 1, "same_merchant")]  # Indexes count kept rows only
+
+
+def test_near_duplicates_same_merchant_within_window():
+    rows = [("2025", _m("2025-03-01", 15000, "UBER TRIP")),
+            ("2025", _m("2025-03-03", 15000, "UBER TRIP")),    # 2 days later: pair
+            ("2025", _m("2025-03-10", 15000, "UBER TRIP")),    # 7 days later: no pair
+            ("2025", _m("2025-03-01", 15001, "UBER TRIP")),    # Other valor: no pair
+            ("2025", _m("2025-03-02", 15000, "RAPPI"))]        # Other merchant, same source: no pair
+    dedupe, _ = _run(rows)
+    assert dedupe.find_near_duplicates() == [(0, 1, "same_merchant")]
+
+
+def test_near_duplicates_across_sources():
+    rows = [("2025", _m("2025-03-01", 48000, "COMPRA EN EXITO CALLE 80")),
+            ("2026", _m("2025-03-02", 48000, "EXITO CALLE 80 BOGOTA", banco="Bancolombia")),
+            ("2026", _m("2025-03-02", 48000, "CARULLA", banco="Bancolombia"))]
+    dedupe, _ = _run(rows)
+    assert dedupe.find_near_duplicates() == [(0, 1, "cross_source")]
+    assert dedupe.report(dedupe.find_near_duplicates()) == {"exact": 0, "near": 1,
+                                                            "near_by_reason": {"cross_source": 1}}
@@ -0,0 +1,88 @@
+# Scoped, chunked deletes against an in-memory PostgREST (python -m pytest test_delete_supabase.py)
+
+import functools
+
+import pytest
+
+import delete_supabase
+import delta_sync
+from delete_supabase import delete_chunked, delete_scoped, scope_filters
+from rollups import MonthlyRollup
+
+
+def _row(i, fecha, miembro=None, family_id="default", banco="Itau"):
+    return {"id": f"{i:04d}", "fecha": fecha, "valor": 1000.0 * i, "detalle": f"D{i}", "banco": banco,
+            "producto": "Crédito", "miembro": miembro, "family_id": family_id, "tipo": "Compra",
+            "categoria": "Otros", "row_hash": f"h{i}"}
+
+
+@pytest.fixture
+def table(postgrest, tmp_path, monkeypatch):
+    """Pipeline rows (no miembro) interleaved by id with dashboard rows and another family."""
+    rows = []
+    for i in range(1, 13):
+        fecha = f"2026-0{1 + i % 3}-{10 + i:02d}"
+        if i % 4 == 0:
+            rows.append(_row(i, fecha, miembro="Isa"))
+        elif i % 5 == 0:
+            rows.append(_row(i, fecha, family_id="otra"))
+        else:
+            rows.append(_row(i, fecha))
+    postgrest.tables["movimientos"] = rows
+    monkeypatch.setattr(delete_supabase, "forget_synced_partitions",
+                        functools.partial(delta_sync.forget_synced_partitions, path=str(tmp_path / "state.json")))
+    return postgrest
+
+
+def _ids(postgrest):
+    return sorted(r["id"] for r in postgrest.tables["movimientos"])
+
+
+def test_scope_filters():
+    assert scope_filters() == [("family_id", "eq.default")]
+    assert scope_filters("casa", sin_miembro=True, miembro="Isa", desde="2026-01-01", hasta="2026-01-31") == [
+        ("family_id", "eq.casa"), ("miembro", "is.null"), ("fecha", "gte.2026-01-01"), ("fecha", "lte.2026-01-31")]
+    assert scope_filters(None, miembro="Isa", banco="Itau", producto="Crédito") == [
+        ("miembro", "eq.Isa"), ("banco", "eq.Itau"), ("producto", "eq.Crédito")]
+
+
+def test_delete_chunked_only_touches_the_scope(table):
+    in_scope = [r["id"] for r in table.tables["movimientos"] if r["family_id"] == "default" and not r["miembro"]]
+    touched = set()
+    filters = scope_filters(sin_miembro=True)
+    assert delete_chunked(table, filters, chunk=3, touched=touched) == len(in_scope) == 7
+
+    assert _ids(table) == sorted({"0004", "0008", "0012", "0005", "0010"})  # Inside the deleted id ranges, out of scope
+    deletes = [params for method, _, params in table.requests if method == "DELETE"]
+    assert len(deletes) == 3  # 3 + 3 + 1 rows
+    assert all(params[:len(filters)] == filters for params in deletes)
+    assert touched == {("default", "2026-01"), ("default", "2026-02"), ("default", "2026-03")}
+
+
+def test_delete_scoped_refreshes_touched_months(table):
+    full = MonthlyRollup()
+    for r in table.tables["movimientos"]:
+        if r["family_id"] == "default":
+            full.add(r)
+    table.tables["movimientos_rollups"] = full.rows()
+
+    assert delete_scoped(desde="2026-02-01", hasta="2026-02-28", sin_miembro=True, dry_run=True) == 0
+    assert len(table.tables["movimientos"]) == 12
+
+    assert delete_scoped(desde="2026-02-01", hasta="2026-02-28", sin_miembro=True) == 2
+    assert not [r for r in table.tables["movimientos"]
+                if r["family_id"] == "default" and not r["miembro"] and r["fecha"].startswith("2026-02")]
+
+    expected = MonthlyRollup()
+    for r in table.tables["movimientos"]:
+        if r["family_id"] == "default":
+            expected.add(r)
+    assert sorted((r["group_key"], r["row_count"]) for r in table.tables["movimientos_rollups"]) == \
+        sorted((r["group_key"], r["row_count"]) for r in expected.rows())
+
+
+def test_delete_scoped_needs_a_filter_or_all(table):
+    assert delete_scoped() is None
+    assert len(table.tables["movimientos"]) == 12
+    assert delete_scoped(family_id="otra", all_rows=True) == 2
+    assert {r["family_id"] for r in table.tables["movimientos"]} == {"default"}
@@ -0,0 +1,79 @@
+# delta_sync against an in-memory PostgREST (python -m pytest test_delta_sync.py)
+
+import pytest
+
+from delta_sync import compute_updates, rollup_after_sync, sync_partitions
+from movimientos_io import PartitionedWriter
+from rollups import MonthlyRollup
+from row_keys import assign_row_hashes
+
+ROWS = [
+    {"fecha": "2026-01-05", "valor": 50000.0, "detalle": "EXITO", "banco": "Itau", "producto": "Crédito",
+     "tipo": "Compra", "categoria": "Mercado"},
+    {"fecha": "2026-01-09", "valor": 15000.0, "detalle": "UBER TRIP", "banco": "Itau", "producto": "Crédito",
+     "tipo": "Compra", "categoria": "Transporte"},
+]
+
+
+def _rows(**categorias):
+    rows = [dict(m) for m in ROWS]
+    for m in rows:
+        m["categoria"] = categorias.get(m["detalle"].split()[0], m["categoria"])
+    return assign_row_hashes(rows)
+
+
+def _write_partitions(root, rows):
+    with PartitionedWriter(root) as writer:
+        for m in rows:
+            writer.write({k: v for k, v in m.items() if k != "row_hash"})
+
+
+def test_compute_updates_only_sends_local_reclassifications():
+    synced_rows = _rows()
+    synced = {m["row_hash"]: [m["tipo"], m["categoria"]] for m in synced_rows}
+    remote = {m["row_hash"]: dict(m) for m in synced_rows}
+    remote[synced_rows[0]["row_hash"]]["categoria"] = "Hogar"  # Edited in the dashboard
+
+    local = _rows(UBER="Viajes")  # Re-classified locally
+    assert [m["detalle"] for m in compute_updates(local, remote, synced)] == ["UBER TRIP"]
+    assert compute_updates(local, remote, {}) == []  # Never synced: the remote values win
+
+    rollup = rollup_after_sync(local, remote, [], updated=compute_updates(local, remote, synced))
+    assert {key[3] for key in rollup.groups} == {"Hogar", "Viajes"}
+
+
+def test_sync_partitions_keeps_dashboard_edits(tmp_path, postgrest):
+    root = str(tmp_path / "movimientos")
+    state = str(tmp_path / "partition_sync.json")
+    _write_partitions(root, _rows())
+    assert sync_partitions(root, state_path=state)["inserted"] == 2
+
+    table = postgrest.tables["movimientos"]
+    next(r for r in table if r["detalle"] == "EXITO")["categoria"] = "Hogar"  # saveEditCategory
+    _write_partitions(root, _rows(UBER="Viajes"))
+    result = sync_partitions(root, state_path=state)
+    assert (result["inserted"], result["updated"], result["deleted"]) == (0, 1, 0)
+    assert {r["detalle"]: r["categoria"] for r in table} == {"EXITO": "Hogar", "UBER TRIP": "Viajes"}
+
+    expected = MonthlyRollup()
+    for r in table:
+        expected.add({**r, "tipo_class": None})
+    assert sorted((r["group_key"], r["row_count"]) for r in postgrest.tables["movimientos_rollups"]) == \
+        sorted((r["group_key"], r["row_count"]) for r in expected.rows())
+
+
+def test_sync_partitions_skips_unchanged_partitions(tmp_path, postgrest):
+    root = str(tmp_path / "movimientos")
+    state = str(tmp_path / "partition_sync.json")
+    _write_partitions(root, _rows())
+    sync_partitions(root, state_path=state)
+    postgrest.requests.clear()
+    result = sync_partitions(root, state_path=state)
+    assert result["to_insert"] == result["to_update"] == result["to_delete"] == 0
+    assert not [r for r in postgrest.requests if r[1] == "movimientos"]
+
+
+@pytest.fixture(autouse=True)
+def _no_partition_state_leak(monkeypatch, tmp_path):
+    import delta_sync
+    monkeypatch.setattr(delta_sync, "PARTITION_STATE_FILE", str(tmp_path / "default_state.json"))
@@ -0,0 +1,46 @@
+# excel_reader engines and parsed-sheet cache (python -m pytest test_excel_reader.py)
+
+import os
+
+import pandas as pd
+import pytest
+
+import excel_reader
+
+SHEET = pd.DataFrame({
+    "Fecha": ["2026-01-05", "2026-01-06", "2026-01-07"],
+    "Tipo": ["Compra", "Compra", "Sueldo"],
+    "Valor": [50000, "$ 26.200", 3000000],
+    "Detalle": ["EXITO", "  ", "NOMINA"],
+    "Banco": ["Itau", "Itau", "Bancolombia"],
+    "Categoria ": ["Mercado", " ", None],
+})
+
+
+@pytest.fixture
+def workbook(tmp_path, monkeypatch):
+    monkeypatch.setattr(excel_reader, "EXCEL_CACHE_DIR", str(tmp_path / "excel"))
+    path = tmp_path / "movimientos_bancos_estandarizados_v1.xlsx"
+    SHEET.to_excel(path, sheet_name=excel_reader.SHEET_NAME, index=False)
+    return str(path)
+
+
+def test_engines_read_the_same_frame(workbook):
+    if not excel_reader.CALAMINE_AVAILABLE:
+        pytest.skip("python-calamine not installed")
+    openpyxl = excel_reader.read_consolidado(workbook, engine="openpyxl", use_cache=False)
+    calamine = excel_reader.read_consolidado(workbook, engine="calamine", use_cache=False)
+    pd.testing.assert_frame_equal(openpyxl, calamine)
+    assert openpyxl["Detalle"].isna().tolist() == [False, True, False]
+
+
+def test_cache_keeps_one_copy_per_workbook(workbook):
+    first = excel_reader.read_consolidado(workbook)
+    assert len(os.listdir(excel_reader.EXCEL_CACHE_DIR)) == 1
+    pd.testing.assert_frame_equal(excel_reader.read_consolidado(workbook), first)
+
+    SHEET.iloc[:2].to_excel(workbook, sheet_name=excel_reader.SHEET_NAME, index=False)
+    assert len(excel_reader.read_consolidado(workbook)) == 2
+    assert len(os.listdir(excel_reader.EXCEL_CACHE_DIR)) == 1
+    excel_reader.read_consolidado(workbook, columns=("Fecha", "Valor"))  # Other read options: another entry
+    assert len(os.listdir(excel_reader.EXCEL_CACHE_DIR)) == 2
@@ -0,0 +1,52 @@
+# Columnar MovimientoStore round trips (python -m pytest test_movimiento_store.py)
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from movimiento_store import FIELDS, MovimientoStore
+
+ROWS = [
+    {"banco": "Itau", "tipo": "Compra", "valor": 26200.0, "fecha": "2025-03-01", "producto": "Crédito",
+     "numero_producto": "1234", "detalle": "JUAN VALDEZ", "categoria": "Restaurantes"},
+    {"banco": "Itau", "tipo": "Compra", "valor": 0.125, "fecha": "01/03/2025", "producto": "Crédito",
+     "numero_producto": None, "detalle": "nan", "categoria": None},          # Not cents, not an ISO date
+    {"banco": None, "tipo": "Sueldo", "valor": None, "fecha": None, "producto": "",
+     "numero_producto": "2186", "detalle": "NOMINA", "categoria": "Ingresos"},
+    {"banco": "Itau", "tipo": "Compra", "valor": 1e300, "fecha": "2025-03-01", "producto": "Crédito",
+     "numero_producto": "1234", "detalle": "JUAN VALDEZ", "categoria": "Restaurantes"},
+]
+
+
+def _same(a, b):
+    """Row lists equal, NaN == NaN."""
+    def fix(rows):
+        return [{k: ("NaN" if isinstance(v, float) and math.isnan(v) else v) for k, v in m.items()} for m in rows]
+    return fix(a) == fix(b)
+
+
+def test_from_movimientos_round_trip():
+    irregular = {"fecha": "2025-04-02", "valor": 12000, "detalle": "UBER TRIP", "family_id": "casa"}
+    rows = ROWS + [irregular]
+    store = MovimientoStore.from_movimientos(rows)
+    assert list(store) == rows
+    assert store[-1] == irregular and type(store[-1]["valor"]) is int
+
+
+def test_from_frame_matches_to_dict():
+    df = pd.DataFrame(ROWS, columns=list(FIELDS), dtype=object).astype({"valor": float})
+    df.loc[1, "categoria"] = np.nan          # NaN and None stay apart
+    df.loc[2, "valor"] = np.nan
+    store = MovimientoStore.from_frame(df)
+    assert _same(list(store), df[list(FIELDS)].to_dict("records"))
+    assert store[1]["categoria"] is not None and store[0]["categoria"] == "Restaurantes"
+    assert np.isnan(store.amounts()[2]) and store.amounts()[0] == 26200.0
+
+
+def test_columnar_access():
+    store = MovimientoStore.from_movimientos(ROWS)
+    codes = store.column_codes("detalle")
+    assert [store.values("detalle")[c] for c in codes] == [m["detalle"] for m in ROWS]
+    assert store.isin("tipo", {"Sueldo"}).tolist() == [False, False, True, False]
+    assert store.mentions(("detalle",), "valdez").tolist() == [True, False, False, True]
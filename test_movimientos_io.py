@@ -0,0 +1,107 @@
+# Output writers, readers and month partitions (python -m pytest test_movimientos_io.py)
+
+import hashlib
+import json
+import os
+
+import pytest
+
+from movimientos_io import (
+    JsonArrayWriter, PartitionedWriter, iter_movimientos, load_partition_index, load_partitions, open_writer,
+    partition_file,
+)
+
+ROWS = [
+    {"banco": "Itau", "tipo": "Compra", "valor": 26200.0, "fecha": "2025-03-01", "producto": "Crédito",
+     "numero_producto": "1234", "detalle": "JUAN VALDEZ \"CAFÉ\"", "categoria": "Restaurantes"},
+    {"banco": "Bancolombia", "tipo": "Sueldo", "valor": 3000000, "fecha": None, "producto": "",
+     "numero_producto": None, "detalle": "NÓMINA\tÑ", "categoria": None, "extra": {"a": [1, 2.5, True]}},
+]
+
+
+@pytest.mark.parametrize("rows", [ROWS, ROWS[:1], []])
+def test_json_writer_matches_json_dump(tmp_path, rows):
+    path = tmp_path / "movimientos.json"
+    with JsonArrayWriter(str(path)) as writer:
+        for m in rows:
+            writer.write(m)
+    assert path.read_text(encoding="utf-8") == json.dumps(rows, ensure_ascii=False, indent=2)
+    assert writer.count == len(rows)
+
+
+@pytest.mark.parametrize("name", ["movimientos.json", "movimientos.ndjson"])
+def test_round_trip(tmp_path, name):
+    path = str(tmp_path / name)
+    with open_writer(path) as writer:
+        for m in ROWS:
+            writer.write(m)
+    assert list(iter_movimientos(path)) == ROWS
+
+
+def test_failed_write_keeps_previous_output(tmp_path):
+    path = tmp_path / "movimientos.json"
+    path.write_text("[]", encoding="utf-8")
+    with pytest.raises(RuntimeError):
+        with JsonArrayWriter(str(path)) as writer:
+            writer.write(ROWS[0])
+            raise RuntimeError("source failed")
+    assert path.read_text(encoding="utf-8") == "[]"
+    assert [p.name for p in tmp_path.iterdir()] == ["movimientos.json"]
+
+
+PARTITIONED = [
+    {"fecha": "2026-01-05", "valor": 50000.0, "detalle": "EXITO"},
+    {"fecha": "2026-02-10", "valor": 15000.0, "detalle": "UBER TRIP"},
+    {"fecha": "2026-02-11", "valor": 9000.0, "detalle": "RAPPI", "family_id": "casa"},
+    {"fecha": "sin fecha", "valor": 1.0, "detalle": "AJUSTE"},
+]
+
+
+def _write_partitions(root, rows):
+    with PartitionedWriter(root) as writer:
+        for m in rows:
+            writer.write(m)
+    return writer
+
+
+def test_partitions_and_checksums(tmp_path):
+    root = str(tmp_path / "movimientos")
+    writer = _write_partitions(root, PARTITIONED)
+    index = load_partition_index(root)
+    assert sorted(index) == ["casa/2026-02", "default/0000-00", "default/2026-01", "default/2026-02"]
+    assert writer.changed == sorted(index) and writer.removed == []
+    for key, entry in index.items():
+        with open(partition_file(root, key), "rb") as f:
+            content = f.read()
+        assert entry["sha256"] == hashlib.sha256(content).hexdigest()
+        assert entry["rows"] == len(content.splitlines())
+    assert load_partitions(root, family_id="default", desde="2026-02-01") == [PARTITIONED[1]]
+
+
+def test_only_changed_and_removed_partitions_are_reported(tmp_path):
+    root = str(tmp_path / "movimientos")
+    _write_partitions(root, PARTITIONED)
+    untouched = os.stat(partition_file(root, "default/2026-01")).st_mtime_ns
+
+    writer = _write_partitions(root, PARTITIONED)
+    assert (writer.changed, writer.removed) == ([], [])
+
+    rows = [dict(PARTITIONED[0]), dict(PARTITIONED[1], categoria="Transporte"), PARTITIONED[3]]
+    writer = _write_partitions(root, rows)
+    assert (writer.changed, writer.removed) == (["default/2026-02"], ["casa/2026-02"])
+    assert os.stat(partition_file(root, "default/2026-01")).st_mtime_ns == untouched
+    assert not os.path.exists(partition_file(root, "casa/2026-02"))
+    assert sorted(load_partition_index(root)) == ["default/0000-00", "default/2026-01", "default/2026-02"]
+
+
+def test_failed_partition_write_keeps_previous_index(tmp_path):
+    root = str(tmp_path / "movimientos")
+    _write_partitions(root, PARTITIONED)
+    before = load_partition_index(root)
+    with pytest.raises(RuntimeError):
+        with PartitionedWriter(root) as writer:
+            writer.write(PARTITIONED[0])
+            assert writer.pending_removals() == ["casa/2026-02", "default/0000-00", "default/2026-02"]
+            raise RuntimeError("source failed")
+    assert load_partition_index(root) == before
+    assert all(os.path.exists(partition_file(root, key)) for key in before)
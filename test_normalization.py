@@ -0,0 +1,59 @@
+# Column-wise normalization of amounts and dates (python -m pytest test_normalization.py)
+
+import math
+
+import pandas as pd
+import pytest
+
+import normalization
+from normalization import NormalizationReport, parse_amounts, parse_dates
+
+AMOUNTS = [
+    ("$ 26.200", 26200.0),
+    ("1.234", 1234.0),          # Dots in groups of three are thousands
+    ("1.5", 1.5),
+    ("1,5", 1.5),               # Lone comma before a non-group is the decimal point
+    ("1,800", 1800.0),
+    ("-1.800,50", -1800.5),
+    ("1,800.25", 1800.25),
+    (" 12.5 ", 12.5),
+    (1200, 1200.0),
+    ("", None),
+    ("$", None),
+    ("N/A", None),
+    (None, None),
+    ("abc", None),
+    ("12-5", None),
+]
+
+
+@pytest.fixture(params=["pyarrow", "pandas"])
+def engine(request, monkeypatch):
+    if request.param == "pandas":
+        monkeypatch.setattr(normalization, "pa", None)
+    elif normalization.pa is None:
+        pytest.skip("pyarrow not installed")
+    return request.param
+
+
+def test_parse_amounts(engine):
+    report = NormalizationReport("test")
+    values = parse_amounts(pd.Series([a for a, _ in AMOUNTS], dtype=object), report).tolist()
+    assert [None if math.isnan(v) else v for v in values] == [expected for _, expected in AMOUNTS]
+    assert report.rejected[("valor", "vacío")] == [4, ["", "$", "N/A", None]]
+    assert report.rejected[("valor", "inválido")] == [2, ["abc", "12-5"]]
+
+
+def test_parse_amounts_numeric_column():
+    report = NormalizationReport("test")
+    values = parse_amounts(pd.Series([1.5, None, 3]), report)
+    assert values.iloc[0] == 1.5 and math.isnan(values.iloc[1])
+    assert report.rejected[("valor", "vacío")][0] == 1
+
+
+def test_parse_dates():
+    report = NormalizationReport("test")
+    dates = parse_dates(pd.Series(["2025-03-01 10:00", "01/03/2025", pd.Timestamp("2026-01-05"), "mañana", None],
+                                  dtype=object), report)
+    assert dates.tolist() == ["2025-03-01", "2025-03-01", "2026-01-05", "mañana", "None"]
+    assert report.rejected[("fecha", "inválido")][0] == 2
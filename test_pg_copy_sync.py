@@ -0,0 +1,104 @@
+# COPY backend against Postgres (python -m pytest test_pg_copy_sync.py)
+# Runs on TEST_DATABASE_URL (see conftest.py) and is skipped without it.
+
+import copy
+
+import pytest
+
+from pg_copy_sync import CopyStream, copy_sync
+from rollups import MonthlyRollup, diff_rollups
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+ROWS = [
+    {"fecha": "2026-01-05", "valor": 50000.0, "detalle": "EXITO", "banco": "Itau", "producto": "Crédito",
+     "tipo": "Compra", "categoria": "Mercado"},
+    {"fecha": "2026-01-05", "valor": 50000.0, "detalle": "EXITO", "banco": "Itau", "producto": "Crédito",
+     "tipo": "Compra", "categoria": "Mercado"},  # Two identical legit purchases
+    {"fecha": "2026-01-20", "valor": 3000000.0, "detalle": "NOMINA", "banco": "Bancolombia",
+     "producto": "Ahorros", "tipo": "Sueldo", "categoria": "Ingresos"},
+    {"fecha": "2026-02-02", "valor": 800000.0, "detalle": "ABONO\tTARJETA\\", "banco": "Itau",
+     "producto": "Crédito", "tipo": "Abono", "categoria": None},
+    {"fecha": "2026-02-10", "valor": 15000.0, "detalle": "UBER TRIP", "banco": "Itau", "producto": "Crédito",
+     "tipo": "Compra", "categoria": "Transporte"},
+]
+
+
+@pytest.fixture
+def db(pg_dsn):
+    conn = psycopg2.connect(pg_dsn)
+    conn.autocommit = True
+    cur = conn.cursor()
+    yield pg_dsn, cur
+    conn.close()
+
+
+def _sync(dsn, rows, **kwargs):
+    return copy_sync(rows=copy.deepcopy(rows), dsn=dsn, **kwargs)
+
+
+def _count(cur):
+    cur.execute("select count(*), count(row_hash) from public.movimientos")
+    return cur.fetchone()
+
+
+def _assert_rollups_match_table(cur):
+    cur.execute("select fecha::text, valor::float, detalle, miembro, family_id, tipo, categoria, tipo_class"
+                " from public.movimientos")
+    names = [d[0] for d in cur.description]
+    expected = MonthlyRollup()
+    for row in cur.fetchall():
+        expected.add(dict(zip(names, row)))
+    cur.execute("select group_key, total, total_abs, row_count from public.movimientos_rollups")
+    remote = [dict(zip(("group_key", "total", "total_abs", "row_count"), r)) for r in cur.fetchall()]
+    assert diff_rollups(remote, expected) == ([], [])
+
+
+def test_copy_stream_escapes_and_nulls():
+    stream = CopyStream([{"a": "x\ty\\", "b": None, "c": True, "d": float("nan")}], columns=("a", "b", "c", "d"))
+    assert stream.read() == "x\\ty\\\\\t\\N\tt\t\\N\n"
+
+
+def test_copy_merge_is_idempotent(db):
+    dsn, cur = db
+    assert _sync(dsn, ROWS, dry_run=True)["to_insert"] == len(ROWS)
+    assert _count(cur) == (0, 0)
+
+    result = _sync(dsn, ROWS)
+    assert (result["inserted"], result["deleted"]) == (len(ROWS), 0)
+    assert _count(cur) == (len(ROWS), len(ROWS))
+    cur.execute("select detalle from public.movimientos where tipo = 'Abono'")
+    assert cur.fetchone()[0] == "ABONO\tTARJETA\\"
+    _assert_rollups_match_table(cur)
+
+    result = _sync(dsn, ROWS)
+    assert (result["inserted"], result["deleted"]) == (0, 0)
+    assert _count(cur) == (len(ROWS), len(ROWS))
+
+
+def test_deletes_only_pipeline_rows(db):
+    dsn, cur = db
+    _sync(dsn, ROWS)
+    cur.execute("insert into public.movimientos (fecha, valor, detalle, miembro, family_id)"
+                " values ('2026-01-07', 20000, 'D1', 'Isa', 'default')")  # Loaded from the dashboard
+    result = _sync(dsn, ROWS[:-1])
+    assert result["deleted"] == 1
+    cur.execute("select detalle from public.movimientos order by detalle")
+    assert [r[0] for r in cur.fetchall()] == sorted([m["detalle"] for m in ROWS[:-1]] + ["D1"])
+    _assert_rollups_match_table(cur)
+
+
+@pytest.mark.parametrize("allow_deletes", [False, True])
+def test_legacy_rows_are_not_duplicated(db, allow_deletes):
+    dsn, cur = db
+    # Uploaded before row_hash existed: no hash, both identical purchases included
+    for m in ROWS[:3]:
+        cur.execute("insert into public.movimientos (fecha, valor, detalle, banco, producto, tipo, categoria)"
+                    " values (%(fecha)s, %(valor)s, %(detalle)s, %(banco)s, %(producto)s, %(tipo)s, %(categoria)s)",
+                    m)
+    result = _sync(dsn, ROWS, allow_deletes=allow_deletes)
+    assert (result["inserted"], result["deleted"]) == (len(ROWS) - 3, 0)
+    assert _count(cur) == (len(ROWS), len(ROWS))
+    _assert_rollups_match_table(cur)
+    cur.execute("select sum(row_count) from public.movimientos_rollups")
+    assert cur.fetchone()[0] == len(ROWS)
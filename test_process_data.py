@@ -0,0 +1,106 @@
+# process_data end to end on a small 2025 CSV + 2026 workbook (python -m pytest test_process_data.py)
+
+import functools
+import os
+
+import pandas as pd
+import pytest
+
+import process_data
+from movimientos_io import load_partition_index, partition_index_path, partition_root_for
+from source_manifest import SourceManifest
+
+CSV = """Banco,Tipo de transacción,Valor,Día de la transacción,Producto,Número producto,Detalle
+Itau,Compra,"$ 26.200",2025-03-01,Crédito,1234,JUAN VALDEZ
+Bancolombia,Compra,12000,2025-04-02,Débito,2186,UBER TRIP
+"""
+WORKBOOK = pd.DataFrame({
+    "Fecha": ["2026-01-05", "2026-02-10"],
+    "Tipo": ["Compra", "Sueldo"],
+    "Valor": [50000, 3000000],
+    "Detalle": ["EXITO", "NOMINA"],
+    "Banco": ["Itau", "Bancolombia"],
+    "Categoria": ["Mercado", "Ingresos"],
+})
+
+
+@pytest.fixture
+def inputs(tmp_path, monkeypatch):
+    csv_file = tmp_path / "movimientos_2025.csv"
+    csv_file.write_text(CSV, encoding="utf-8")
+    mov_dir = tmp_path / "Movimientos"
+    mov_dir.mkdir()
+    workbook = mov_dir / "movimientos_bancos_estandarizados_v1.xlsx"
+    WORKBOOK.to_excel(workbook, sheet_name="Consolidado", index=False)
+    monkeypatch.setattr(process_data, "CSV_2025", str(csv_file))
+    monkeypatch.setattr(process_data, "MOVIMIENTOS_DIR", str(mov_dir))
+    monkeypatch.setattr(process_data, "SourceManifest", functools.partial(
+        SourceManifest, path=str(tmp_path / "manifest.json"), rows_dir=str(tmp_path / "sources")))
+    return {"output": str(tmp_path / "out" / "movimientos.json"), "workbook": workbook}
+
+
+def _snapshot(output):
+    """Bytes of the output and of every partition file."""
+    root = partition_root_for(output)
+    files = {output: open(output, "rb").read()}
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(dirpath, name)
+            files[path] = open(path, "rb").read()
+    return files
+
+
+@pytest.mark.parametrize("all_excels", [False, True])
+def test_missing_workbook_keeps_previous_output(inputs, all_excels):
+    output = inputs["output"]
+    os.makedirs(os.path.dirname(output))
+    process_data.process_data(output_file=output, all_excels=all_excels)
+    assert len(load_partition_index(partition_root_for(output))) == 4
+    before = _snapshot(output)
+
+    os.remove(inputs["workbook"])
+    with pytest.raises(process_data.SourcesFailed) as e:
+        process_data.process_data(output_file=output, all_excels=all_excels)
+    assert "2026" in str(e.value)
+    assert _snapshot(output) == before
+    assert os.path.exists(partition_index_path(output))
+
+
+def test_missing_workbook_raises_when_strict(inputs):
+    os.remove(inputs["workbook"])
+    with pytest.raises(FileNotFoundError):
+        process_data.process_2026_excel(strict=True)
+    assert process_data.process_2026_excel() == []
+
+
+def test_source_without_rows_is_not_a_deletion(inputs):
+    output = inputs["output"]
+    os.makedirs(os.path.dirname(output))
+    process_data.process_data(output_file=output)
+    before = _snapshot(output)
+
+    WORKBOOK.iloc[:0].to_excel(inputs["workbook"], sheet_name="Consolidado", index=False)
+    with pytest.raises(process_data.RemovalRefused) as e:
+        process_data.process_data(output_file=output)
+    assert e.value.emptied == {"2026": 2}
+    assert _snapshot(output) == before
+
+    process_data.process_data(output_file=output, allow_removals=True)
+    assert sorted(load_partition_index(partition_root_for(output))) == ["default/2025-03", "default/2025-04"]
+
+
+def test_many_removed_partitions_need_the_flag(inputs, monkeypatch):
+    output = inputs["output"]
+    os.makedirs(os.path.dirname(output))
+    process_data.process_data(output_file=output)
+    before = _snapshot(output)
+
+    monkeypatch.setattr(process_data, "MAX_REMOVED_PARTITIONS", 1)
+    WORKBOOK.assign(Fecha="2026-05-01").to_excel(inputs["workbook"], sheet_name="Consolidado", index=False)
+    with pytest.raises(process_data.RemovalRefused) as e:
+        process_data.process_data(output_file=output)
+    assert e.value.removed == ["default/2026-01", "default/2026-02"]
+    assert _snapshot(output) == before
+
+    process_data.process_data(output_file=output, allow_removals=True)
+    assert "default/2026-05" in load_partition_index(partition_root_for(output))
@@ -0,0 +1,70 @@
+# Input manifest for incremental re-processing (python -m pytest test_source_manifest.py)
+
+import os
+
+import pytest
+
+import source_manifest
+from source_manifest import SourceManifest
+
+ROWS = [{"fecha": "2025-03-01", "valor": 26200.0, "detalle": "JUAN VALDEZ"},
+        {"fecha": "2025-04-02", "valor": 12000.0, "detalle": "UBER TRIP"}]
+
+
+@pytest.fixture
+def paths(tmp_path):
+    source = tmp_path / "movimientos_2025.csv"
+    source.write_text("Banco,Valor\nItau,26200\n", encoding="utf-8")
+    output = tmp_path / "movimientos.json"
+    output.write_text("[]", encoding="utf-8")
+    return {"source": str(source), "output": str(output),
+            "manifest": {"path": str(tmp_path / "manifest.json"), "rows_dir": str(tmp_path / "sources")}}
+
+
+def _recorded(paths, rows=ROWS, options=None):
+    manifest = SourceManifest(**paths["manifest"])
+    assert list(manifest.record("2025", paths["source"], iter(rows))) == rows
+    manifest.save(paths["output"], options)
+    return SourceManifest(**paths["manifest"])
+
+
+def test_unchanged_source_is_skipped(paths):
+    manifest = _recorded(paths)
+    assert manifest.is_unchanged("2025", paths["source"])
+    assert list(manifest.cached_rows("2025")) == ROWS
+
+    st = os.stat(paths["source"])
+    os.utime(paths["source"], (st.st_atime, st.st_mtime + 10))  # Touched, same content
+    assert manifest.is_unchanged("2025", paths["source"])
+
+
+def test_content_change_invalidates(paths):
+    manifest = _recorded(paths)
+    with open(paths["source"], "a", encoding="utf-8") as f:
+        f.write("Bancolombia,12000\n")
+    assert not manifest.is_unchanged("2025", paths["source"])
+    os.remove(paths["source"])
+    assert not manifest.is_unchanged("2025", paths["source"])
+
+
+def test_pipeline_version_invalidates(paths, monkeypatch):
+    _recorded(paths)
+    monkeypatch.setattr(source_manifest, "PIPELINE_VERSION", source_manifest.PIPELINE_VERSION + 1)
+    assert not SourceManifest(**paths["manifest"]).is_unchanged("2025", paths["source"])
+
+
+def test_partial_read_is_not_recorded(paths):
+    manifest = SourceManifest(**paths["manifest"])
+    rows = manifest.record("2025", paths["source"], iter(ROWS))
+    next(rows)
+    rows.close()  # The source failed or the run stopped before the end
+    assert "2025" not in manifest.entries
+
+
+def test_output_options_invalidate(paths):
+    manifest = _recorded(paths, options={"parquet": False})
+    assert manifest.output_is_current(paths["output"], {"parquet": False})
+    assert not manifest.output_is_current(paths["output"], {"parquet": True})
+    with open(paths["output"], "w", encoding="utf-8") as f:
+        f.write("[{}]")
+    assert not manifest.output_is_current(paths["output"], {"parquet": False})
@@ -1,32 +1,122 @@
-import requests
+# Server-side queries (movimientos_summary / movimientos_page from setup_phase2.sql)
+# python -m pytest test_supabase_fetch.py: PostgresQueries against TEST_DATABASE_URL (see conftest.py),
+# RestQueries against a local stub. python test_supabase_fetch.py checks the live project instead.
+
 import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from row_keys import DEFAULT_FAMILY_ID
+from supabase_queries import PostgresQueries, QueryFailed, RestQueries
+from upload_to_supabase import make_session
+
+ROWS = [
+    # fecha, valor, tipo, categoria, detalle, miembro, family_id
+    ("2026-01-05", -50000, "Compra", "Mercado", "EXITO", "Isa", "default"),
+    ("2026-01-05", -20000, "Compra", "Mercado", "D1", "Isa", "default"),
+    ("2026-01-20", 3000000, "Sueldo", "Ingresos", "NOMINA", "Sebas", "default"),
+    ("2026-02-02", 800000, "Abono", None, "ABONO TARJETA", None, "default"),
+    ("2026-02-10", -15000, "Compra", "Transporte", "UBER TRIP", "Sebas", "default"),
+    ("2026-02-10", -99999, "Compra", "Mercado", "OTRA FAMILIA", None, "otra"),
+]
+
+
+@pytest.fixture
+def queries(pg_dsn):
+    import psycopg2
+    conn = psycopg2.connect(pg_dsn)
+    with conn.cursor() as cur:
+        cur.executemany("insert into public.movimientos (fecha, valor, tipo, categoria, detalle, miembro, family_id)"
+                        " values (%s, %s, %s, %s, %s, %s, %s)", ROWS)
+    conn.commit()
+    yield PostgresQueries(conn)
+    conn.close()
 
-SUPABASE_URL = "https://iikarklhudhsfvkhhyub.supabase.co"
-SUPABASE_KEY = "sb_publishable_PIdI08dSRTLPVauDLxX6Hg_yMEsxwU-" 
-TABLE_NAME = "movimientos"
 
-def test_fetch():
-    url = f"{SUPABASE_URL}/rest/v1/{TABLE_NAME}?select=*"
-    headers = {
-        "apikey": SUPABASE_KEY,
-        "Authorization": f"Bearer {SUPABASE_KEY}",
-        "Content-Type": "application/json"
+def test_summary_aggregates_by_month_miembro_categoria(queries):
+    summary = {(r['month'], r['miembro'], r['categoria'], r['tipo_class']): r for r in queries.summary()}
+    assert set(summary) == {
+        ("2026-01", "Isa", "Mercado", "gasto"),
+        ("2026-01", "Sebas", "Ingresos", "ingreso"),
+        ("2026-02", "", "Otros", "abono_tc"),
+        ("2026-02", "Sebas", "Transporte", "gasto"),
     }
-    
+    mercado = summary[("2026-01", "Isa", "Mercado", "gasto")]
+    assert mercado['total'] == -70000 and mercado['total_abs'] == 70000 and mercado['row_count'] == 2
+
+
+def test_summary_filters(queries):
+    assert {r['month'] for r in queries.summary(desde="2026-02-01")} == {"2026-02"}
+    assert {r['miembro'] for r in queries.summary(miembros=["Sebas"])} == {"Sebas"}
+    assert [r['total'] for r in queries.summary("otra")] == [-99999]
+
+
+def test_pages_cover_the_family_newest_first(queries):
+    rows = list(queries.iter_movimientos(page_size=2))
+    assert len(rows) == 5 and len({r['id'] for r in rows}) == 5
+    assert [r['fecha'] for r in rows] == sorted((r['fecha'] for r in rows), reverse=True)
+    assert {r['family_id'] for r in rows} == {DEFAULT_FAMILY_ID}
+    assert [r['detalle'] for r in queries.iter_movimientos(tipo_class="ingreso")] == ["NOMINA"]
+
+
+def test_postgres_errors_raise_query_failed(queries):
+    with pytest.raises(QueryFailed):
+        queries._call("movimientos_missing", {"p_family_id": DEFAULT_FAMILY_ID})
+    assert len(queries.page(limit=10)) == 5  # The connection is usable after the error
+
+
+@pytest.fixture
+def rpc_stub():
+    calls = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            calls.append((self.path, json.loads(self.rfile.read(int(self.headers["Content-Length"])))))
+            status, body = (200, b'[{"month": "2026-01"}]') if self.path.endswith("/movimientos_summary") \
+                else (404, b'{"message": "function not found"}')
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield RestQueries(make_session(1), url=f"http://127.0.0.1:{server.server_port}"), calls
+    server.shutdown()
+    server.server_close()
+
+
+def test_rest_calls_rpc_and_raises_query_failed(rpc_stub):
+    queries, calls = rpc_stub
+    assert queries.summary(desde="2026-01-01") == [{"month": "2026-01"}]
+    assert calls[0] == ("/rest/v1/rpc/movimientos_summary", {
+        "p_family_id": DEFAULT_FAMILY_ID, "p_desde": "2026-01-01", "p_hasta": None, "p_miembros": None})
+    with pytest.raises(QueryFailed, match="404"):
+        queries.page()
+
+
+def check_live(family_id=DEFAULT_FAMILY_ID):
+    """Keyset pages + server-side summary against the configured Supabase project."""
+    queries = RestQueries()
     try:
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            data = response.json()
-            print(f"✅ Success! Status: {response.status_code}")
-            print(f"📊 Records retrieved: {len(data)}")
-            if len(data) > 0:
-                print("Sample record:", data[0])
-            else:
-                print("⚠️ Warning: 0 records returned. RLS Policy for SELECT might be missing.")
-        else:
-            print(f"❌ Error: {response.status_code} - {response.text}")
-    except Exception as e:
-        print(f"Exception: {e}")
+        first_page = queries.page(family_id, limit=1)
+        if not first_page:
+            print("⚠️ Warning: 0 records returned. RLS Policy for SELECT might be missing.")
+            return
+        print("✅ Success! Sample record:", first_page[0])
+
+        total = sum(1 for _ in queries.iter_movimientos(family_id))
+        print(f"📊 Records retrieved (paged): {total}")
+
+        summary = queries.summary(family_id)
+        print(f"📦 Summary groups: {len(summary)} ({sum(r['row_count'] for r in summary)} rows aggregated)")
+    except QueryFailed as e:
+        print(e)
 
 if __name__ == "__main__":
-    test_fetch()
+    check_live()
@@ -0,0 +1,85 @@
+# Watch mode change detection and debounce (python -m pytest test_watch_sync.py)
+
+import os
+import threading
+import time
+
+import pytest
+
+import process_data
+import watch_sync
+from watch_sync import ChangeQueue, PollingWatcher, is_watched
+
+DEBOUNCE = 0.3
+
+
+def test_wait_times_out_without_changes():
+    queue = ChangeQueue(DEBOUNCE)
+    start = time.monotonic()
+    assert queue.wait(timeout=0.05) == set()
+    assert time.monotonic() - start < DEBOUNCE
+
+
+def test_burst_is_released_once_quiet(tmp_path):
+    queue = ChangeQueue(DEBOUNCE)
+    a, b = str(tmp_path / "a.xlsx"), str(tmp_path / "b.xlsx")
+
+    def burst():
+        for path in (a, b, a):  # Excel: temp file, rename, save again
+            queue.touch(path)
+            time.sleep(DEBOUNCE / 3)
+
+    writer = threading.Thread(target=burst)
+    start = time.monotonic()
+    writer.start()
+    assert queue.wait(timeout=5) == {a, b}
+    elapsed = time.monotonic() - start
+    writer.join()
+    # Released DEBOUNCE after the last touch, not after the first
+    assert elapsed >= 2 * DEBOUNCE / 3 + DEBOUNCE - 0.05
+    assert queue.wait(timeout=0.05) == set()
+
+
+def test_wait_returns_early_when_still_settling():
+    queue = ChangeQueue(DEBOUNCE)
+    queue.touch("a.xlsx")
+    assert queue.wait(timeout=DEBOUNCE / 3) == set()  # Not quiet yet: nothing released
+    assert queue.wait(timeout=5) == {os.path.abspath("a.xlsx")}
+
+
+@pytest.fixture
+def folders(tmp_path, monkeypatch):
+    mov_dir = tmp_path / "Movimientos"
+    mov_dir.mkdir()
+    csv_file = tmp_path / "movimientos_2025.csv"
+    csv_file.write_text("Banco\n", encoding="utf-8")
+    monkeypatch.setattr(process_data, "MOVIMIENTOS_DIR", str(mov_dir))
+    monkeypatch.setattr(process_data, "CSV_2025", str(csv_file))
+    return mov_dir, csv_file
+
+
+def test_is_watched(folders):
+    mov_dir, csv_file = folders
+    assert is_watched(str(csv_file))
+    assert is_watched(str(mov_dir / "movimientos_bancos_estandarizados_v2.xlsx"))
+    assert not is_watched(str(mov_dir / "~$movimientos_bancos_estandarizados_v2.xlsx"))
+    assert not is_watched(str(mov_dir / "notas.xlsx"))
+    assert not is_watched(None)
+
+
+def test_polling_watcher_reports_changed_files(folders):
+    mov_dir, csv_file = folders
+    queue = ChangeQueue(0)
+    watcher = PollingWatcher(queue, interval=0.05)
+    workbook = mov_dir / "movimientos_bancos_estandarizados_v1.xlsx"
+    workbook.write_bytes(b"x")
+    (mov_dir / "~$movimientos_bancos_estandarizados_v1.xlsx").write_bytes(b"lock")
+    watcher.start()
+    try:
+        assert queue.wait(timeout=5) == {str(workbook)}
+        with open(csv_file, "a", encoding="utf-8") as f:
+            f.write("Itau\n")
+        assert queue.wait(timeout=5) == {str(csv_file)}
+    finally:
+        watcher.stop()
+    assert watch_sync.watched_dirs() == sorted({str(mov_dir), str(csv_file.parent)})
@@ -0,0 +1,69 @@
+# Transaction class flags, computed once per movimiento at ingest time
+# is_expense / is_income / is_cc_payment / is_interest and tipo_class are written to the
+# output and the Supabase table, so the dashboard, the rollups and the debug scripts
+# filter on them instead of re-scanning tipo/categoria/detalle for 'abono' and 'interes'.
+
+import numpy as np
+
+EXPENSE_TIPOS = {'Compra', 'Retiro', 'Débito', 'Gasto', 'Pago', 'Cargo'}
+INCOME_TIPOS = {'Depósito', 'Transferencia Recibida', 'Ingreso', 'Sueldo', 'Salario'}
+MENTION_FIELDS = ('tipo', 'categoria', 'detalle')
+FLAG_FIELDS = ('is_expense', 'is_income', 'is_cc_payment', 'is_interest', 'tipo_class')
+
+
+def _mentions(m, word):
+    return any(word in (m.get(f) or '').lower() for f in MENTION_FIELDS)
+
+
+def compute_flags(m):
+    """{is_expense, is_income, is_cc_payment, is_interest, tipo_class} of a movimiento.
+
+    is_expense: an expense tipo (credit card payments only count with the dashboard toggle).
+    is_cc_payment: mentions 'abono' but not 'interes' (a card payment, never income).
+    tipo_class: 'gasto', 'abono_tc', 'ingreso' or 'otro' (the rollup class).
+    """
+    tipo = m.get('tipo')
+    is_expense = tipo in EXPENSE_TIPOS
+    is_interest = _mentions(m, 'interes')
+    is_cc_payment = not is_interest and _mentions(m, 'abono')
+    is_income = tipo in INCOME_TIPOS and not is_cc_payment
+    if is_expense:
+        tipo_class = 'gasto'
+    elif is_cc_payment:
+        tipo_class = 'abono_tc'
+    elif is_income:
+        tipo_class = 'ingreso'
+    else:
+        tipo_class = 'otro'
+    return {'is_expense': is_expense, 'is_income': is_income, 'is_cc_payment': is_cc_payment,
+            'is_interest': is_interest, 'tipo_class': tipo_class}
+
+
+def add_flags(m):
+    """Sets the flags on m (in place) and returns it."""
+    m.update(compute_flags(m))
+    return m
+
+
+def ensure_flags(movimientos):
+    """Adds the flags to the movimientos that don't have them yet (outputs written before them)."""
+    for m in movimientos:
+        if m.get('tipo_class') is None:
+            add_flags(m)
+    return movimientos
+
+
+def tipo_class(m):
+    """The stored tipo_class, computed when m predates the flags."""
+    return m.get('tipo_class') or compute_flags(m)['tipo_class']
+
+
+def flag_masks(store):
+    """The flags of a MovimientoStore as numpy columns (evaluated per distinct value)."""
+    is_expense = store.isin('tipo', EXPENSE_TIPOS)
+    is_interest = store.mentions(MENTION_FIELDS, 'interes')
+    is_cc_payment = ~is_interest & store.mentions(MENTION_FIELDS, 'abono')
+    is_income = store.isin('tipo', INCOME_TIPOS) & ~is_cc_payment
+    tipo_class = np.select([is_expense, is_cc_payment, is_income], ['gasto', 'abono_tc', 'ingreso'], 'otro')
+    return {'is_expense': is_expense, 'is_income': is_income, 'is_cc_payment': is_cc_payment,
+            'is_interest': is_interest, 'tipo_class': tipo_class}
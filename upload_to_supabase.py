@@ -1,6 +1,20 @@
+import hashlib
 import json
-import requests
 import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from classification_cache import CACHE_DIR
+from instrumentation import RunReport, report_options
+from movimientos_io import load_movimientos, parquet_path_for
+from row_keys import assign_row_hashes
+from tipo_flags import ensure_flags
 
 # Configuration
 SUPABASE_URL = "https://iikarklhudhsfvkhhyub.supabase.co"
@@ -8,58 +22,289 @@ SUPABASE_KEY = "sb_publishable_PIdI08dSRTLPVauDLxX6Hg_yMEsxwU-" # Anon Key provi
 TABLE_NAME = "movimientos"
 
 JSON_FILE = r"C:\Users\Amaya\OneDrive\Documentos\Personal\dashboard_finanzas_2025\data\movimientos.json"
+CHECKPOINT_FILE = os.path.join(CACHE_DIR, "upload_checkpoint.json")
+
+# Bulk upload tuning
+MAX_IN_FLIGHT = 4           # Concurrent batches on the wire
+INITIAL_BATCH_SIZE = 500
+MIN_BATCH_SIZE = 50
+MAX_BATCH_SIZE = 5000
+TARGET_BATCH_SECONDS = 1.0  # Batch size grows/shrinks to keep each request around this
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5          # Seconds; doubled on every retry (plus jitter)
+REQUEST_TIMEOUT = 60
+RETRY_STATUS = {429, 500, 502, 503, 504}
 
-def upload_data():
-    if not os.path.exists(JSON_FILE):
-        print(f"Error: {JSON_FILE} not found.")
-        return
 
-    with open(JSON_FILE, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    print(f"Loaded {len(data)} records from JSON.")
-    
-    # Prepare Headers
-    headers = {
-        "apikey": SUPABASE_KEY,
-        "Authorization": f"Bearer {SUPABASE_KEY}",
+class UploadAborted(Exception):
+    """Raised on errors that no retry can fix (missing table, RLS/auth)."""
+
+
+def make_session(pool_size=MAX_IN_FLIGHT, key=SUPABASE_KEY):
+    """HTTP session with a connection pool sized for the in-flight batches."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({
+        "apikey": key,
+        "Authorization": f"Bearer {key}",
         "Content-Type": "application/json",
-        "Prefer": "return=representation" # Return inserted rows (optional)
-    }
-    
-    # Supabase REST API Endpoint
-    url = f"{SUPABASE_URL}/rest/v1/{TABLE_NAME}"
-    
-    # Insert in batches to avoid payload limits
-    BATCH_SIZE = 100
-    total_uploaded = 0
-    
-    # Clean data keys to match likely DB columns (lowercase, no spaces)
-    # JSON keys: banco, tipo, valor, fecha, producto, numero_producto, detalle, categoria
-    # These are safe snake_case or single words.
-    
-    for i in range(0, len(data), BATCH_SIZE):
-        batch = data[i:i+BATCH_SIZE]
-        
-        try:
-            response = requests.post(url, json=batch, headers=headers)
-            
-            if response.status_code in [200, 201]:
-                total_uploaded += len(batch)
-                print(f"uploaded batch {i//BATCH_SIZE + 1}: {len(batch)} rows.")
-            else:
-                print(f"Error uploading batch {i}: {response.status_code} - {response.text}")
-                # Analyze common errors
-                if response.status_code == 404:
-                    print(f"❌ Table '{TABLE_NAME}' does not exist. Please create it in Supabase.")
-                    break
-                elif response.status_code == 401:
-                    print("❌ Unauthorized. Check RLS policies (need INSERT access for Anon Key) or use Service Role Key.")
+        "Prefer": "return=minimal", # Do not send inserted rows back
+    })
+    return session
+
+
+def dataset_fingerprint(rows):
+    """Identifies the data being uploaded so a checkpoint is only reused for the same rows."""
+    h = hashlib.sha256()
+    for m in rows:
+        h.update(json.dumps(m, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+class UploadCheckpoint:
+    """Row ranges already inserted, persisted so an interrupted upload can resume."""
+
+    def __init__(self, path, dataset):
+        self.path = path
+        self.dataset = dataset
+        self.done = []
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    saved = json.load(f)
+                if saved.get("dataset") == dataset:
+                    self.done = [tuple(r) for r in saved.get("done", [])]
+            except (OSError, ValueError):
+                pass
+
+    def uploaded_rows(self):
+        return sum(end - start for start, end in self.done)
+
+    def pending_ranges(self, total):
+        """[start, end) ranges not yet uploaded."""
+        pending = []
+        cursor = 0
+        for start, end in sorted(self.done):
+            if start > cursor:
+                pending.append((cursor, start))
+            cursor = max(cursor, end)
+        if cursor < total:
+            pending.append((cursor, total))
+        return pending
+
+    def mark_done(self, start, end):
+        with self._lock:
+            merged = []
+            for s, e in sorted(self.done + [(start, end)]):
+                if merged and s <= merged[-1][1]:
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+                else:
+                    merged.append((s, e))
+            self.done = merged
+            self._save()
+
+    def _save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"dataset": self.dataset, "done": self.done}, f)
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class BulkUploader:
+    """Concurrent, retrying batch inserter for a PostgREST table."""
+
+    def __init__(self, url, session=None, max_in_flight=MAX_IN_FLIGHT, batch_size=INITIAL_BATCH_SIZE,
+                 min_batch_size=MIN_BATCH_SIZE, max_batch_size=MAX_BATCH_SIZE, max_retries=MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE, target_seconds=TARGET_BATCH_SECONDS, cancel=None):
+        self.url = url
+        self.session = session or make_session(max_in_flight)
+        self.max_in_flight = max_in_flight
+        self.batch_size = batch_size
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.target_seconds = target_seconds
+        self.cancel = cancel  # threading.Event: once set, no new batch is sent
+        self.failed_ranges = []
+        self.batch_latencies = []
+        self._lock = threading.Lock()
+
+    def _sleep_before_retry(self, attempt, response=None):
+        delay = self.backoff_base * (2 ** attempt) * (1 + random.random())
+        if response is not None and response.headers.get("Retry-After", "").isdigit():
+            delay = max(delay, int(response.headers["Retry-After"]))
+        time.sleep(delay)
+
+    def _post(self, batch):
+        """POSTs one batch, retrying 5xx/429/network errors with exponential backoff."""
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                response = self.session.post(self.url, json=batch, timeout=REQUEST_TIMEOUT)
+            except requests.exceptions.InvalidJSONError as e:
+                # The batch itself can't be serialized (NaN/inf values): retrying won't help
+                return False, f"{type(e).__name__}: {e}"
+            except requests.RequestException as e:
+                if attempt == self.max_retries:
+                    return False, f"{type(e).__name__}: {e}"
+                self._sleep_before_retry(attempt)
+                continue
+
+            elapsed = time.perf_counter() - started
+            if response.status_code in (200, 201, 204):
+                with self._lock:
+                    self.batch_latencies.append(elapsed)
+                    self._adapt(elapsed)
+                return True, None
+            if response.status_code == 404:
+                raise UploadAborted(f"❌ Table '{TABLE_NAME}' does not exist. Please create it in Supabase.")
+            if response.status_code in (401, 403):
+                raise UploadAborted("❌ Unauthorized. Check RLS policies (need INSERT access for Anon Key) or use Service Role Key.")
+            if response.status_code == 413 and len(batch) > 1:
+                return False, "413"
+            if response.status_code not in RETRY_STATUS or attempt == self.max_retries:
+                return False, f"{response.status_code} - {response.text[:200]}"
+            self._sleep_before_retry(attempt, response)
+        return False, "retries exhausted"
+
+    def _adapt(self, elapsed):
+        """Grows the batch while requests are fast, shrinks it when they get slow."""
+        if elapsed < self.target_seconds / 2:
+            self.batch_size = min(self.max_batch_size, self.batch_size * 2)
+        elif elapsed > self.target_seconds * 2:
+            self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+
+    def _upload_range(self, rows, start, end):
+        ok, error = self._post(rows[start:end])
+        if error == "413":
+            # Payload too large: split in halves and send them in turn
+            with self._lock:
+                self.batch_size = max(self.min_batch_size, (end - start) // 2)
+            mid = (start + end) // 2
+            done_left = self._upload_range(rows, start, mid)
+            done_right = self._upload_range(rows, mid, end)
+            return done_left + done_right
+        if not ok:
+            print(f"Error uploading rows {start}-{end}: {error}")
+            with self._lock:
+                self.failed_ranges.append((start, end))
+            return []
+        return [(start, end)]
+
+    def upload(self, rows, checkpoint=None):
+        """Uploads rows (skipping ranges already in the checkpoint). Returns rows inserted.
+
+        Raises UploadAborted if cancel is set before every batch was sent (in-flight ones finish).
+        """
+        pending = checkpoint.pending_ranges(len(rows)) if checkpoint else [(0, len(rows))]
+        uploaded = 0
+        in_flight = set()
+        aborted = None
+
+        def next_batches():
+            for start, end in pending:
+                cursor = start
+                while cursor < end:
+                    size = self.batch_size
+                    yield cursor, min(end, cursor + size)
+                    cursor = min(end, cursor + size)
+
+        batches = next_batches()
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            exhausted = False
+            while True:
+                if aborted is None and not exhausted and self.cancel is not None and self.cancel.is_set():
+                    aborted = UploadAborted("⏹️ Upload cancelled, remaining batches not sent.")
+                while not exhausted and aborted is None and len(in_flight) < self.max_in_flight:
+                    batch = next(batches, None)
+                    if batch is None:
+                        exhausted = True
+                        break
+                    in_flight.add(pool.submit(self._upload_range, rows, *batch))
+                if not in_flight:
                     break
-        except Exception as e:
-            print(f"Exception: {e}")
-            
-    print(f"✅ Upload process finished. Total uploaded: {total_uploaded}/{len(data)}")
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    try:
+                        done = future.result()
+                    except UploadAborted as e:
+                        aborted = e
+                        continue
+                    for start, end in done:
+                        uploaded += end - start
+                        if checkpoint:
+                            checkpoint.mark_done(start, end)
+                        print(f"uploaded rows {start}-{end} ({end - start} rows, next batch size {self.batch_size}).")
+        if aborted:
+            raise aborted
+        return uploaded
+
+
+def upload_data(json_file=JSON_FILE, max_in_flight=MAX_IN_FLIGHT, resume=True, report=None):
+    if not os.path.exists(json_file) and not os.path.exists(parquet_path_for(json_file)):
+        print(f"Error: {json_file} not found.")
+        return
+
+    report = report or RunReport("upload")
+    # Uses movimientos.parquet when process_data wrote one (faster than re-parsing JSON)
+    with report.stage("load") as load_stage:
+        data = load_movimientos(json_file)
+        load_stage.rows_out = len(data)
+
+    print(f"Loaded {len(data)} records from pipeline output.")
+    with report.stage("hash") as hash_stage:
+        ensure_flags(data)
+        assign_row_hashes(data)
+        fingerprint = dataset_fingerprint(data)
+        hash_stage.rows_out = len(data)
+
+    # Supabase REST API Endpoint (rows already present by row_hash are skipped, not duplicated)
+    url = f"{SUPABASE_URL}/rest/v1/{TABLE_NAME}?on_conflict=row_hash"
+
+    # JSON keys: banco, tipo, valor, fecha, producto, numero_producto, detalle, categoria,
+    # is_expense, is_income, is_cc_payment, is_interest, tipo_class, row_hash
+    # These are safe snake_case or single words.
+    checkpoint = UploadCheckpoint(CHECKPOINT_FILE if resume else None, fingerprint)
+    already = checkpoint.uploaded_rows()
+    if already:
+        print(f"↩️ Resuming upload: {already} rows already uploaded in a previous run.")
+
+    session = make_session(max_in_flight)
+    session.headers["Prefer"] = "return=minimal,resolution=ignore-duplicates"
+    uploader = BulkUploader(url, session=session, max_in_flight=max_in_flight)
+    started = time.perf_counter()
+    try:
+        with report.stage("upload", rows_in=len(data) - already) as upload_stage:
+            total_uploaded = uploader.upload(data, checkpoint)
+            upload_stage.rows_out = total_uploaded
+    except UploadAborted as e:
+        print(e)
+        report.record_http("upload", uploader.batch_latencies)
+        report.save()
+        return
+    elapsed = time.perf_counter() - started
+
+    if uploader.failed_ranges:
+        print(f"⚠️ {len(uploader.failed_ranges)} batches failed after retries; run again to resume them.")
+    else:
+        checkpoint.clear()
+    rate = total_uploaded / elapsed if elapsed else 0
+    print(f"✅ Upload process finished. Total uploaded: {already + total_uploaded}/{len(data)} "
+          f"({elapsed:.1f}s, {rate:.0f} rows/s)")
+    report.record_http("upload", uploader.batch_latencies)
+    report.save()
 
 if __name__ == "__main__":
-    upload_data()
+    # --trace-memory / --profile <stage> add tracemalloc peaks / a cProfile dump to the run report
+    upload_data(report=RunReport("upload", **report_options(sys.argv)))
@@ -0,0 +1,223 @@
+# Watch mode: re-runs the sync when a statement workbook or the 2025 CSV changes
+# Uses inotify (through watchdog) when it is installed and polls mtime/size otherwise.
+# Bursts of writes (Excel saves through temp files and renames) are debounced: a run
+# starts once the watched files have been quiet for DEBOUNCE_SECONDS. Each run only
+# re-reads the sources whose content changed (the rest come from the source manifest
+# cache, see source_manifest.py) and delta_sync only pushes rows whose row_hash isn't in
+# Supabase yet, so a new workbook costs one workbook read and its own rows uploaded.
+#
+#   python watch_sync.py [--all-excels] [--parquet] [--drop-duplicates] [--drop-near-duplicates] [--no-upload]
+#                        [--dry-run] [--poll] [--backend partitions|rest|copy]
+
+import fnmatch
+import os
+import sys
+import threading
+import time
+
+import process_data
+from instrumentation import RunReport
+from sync_dag import StageFailed, run_dag, still_running
+from sync_data import _stage_done, build_stages
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # Polling fallback (pip install watchdog for inotify)
+    FileSystemEventHandler = object
+    Observer = None
+
+DEBOUNCE_SECONDS = 3.0
+POLL_INTERVAL = 5.0
+IGNORED_PREFIXES = ('~$', '.~lock', '.')  # Office lock files and hidden temp files
+
+
+def watched_dirs():
+    """MOVIMIENTOS_DIR and the folder of the 2025 CSV (read at call time, they can be patched)."""
+    dirs = [process_data.MOVIMIENTOS_DIR, os.path.dirname(process_data.CSV_2025)]
+    return sorted({os.path.abspath(d) for d in dirs if d and os.path.isdir(d)})
+
+
+def is_watched(path):
+    """True for the 2025 CSV and the workbooks find_all_excels() would pick up."""
+    if not path:
+        return False
+    path = os.path.abspath(path)
+    name = os.path.basename(path)
+    if name.startswith(IGNORED_PREFIXES):
+        return False
+    if path == os.path.abspath(process_data.CSV_2025):
+        return True
+    return (os.path.dirname(path) == os.path.abspath(process_data.MOVIMIENTOS_DIR)
+            and any(fnmatch.fnmatch(name, p) for p in process_data.EXCEL_PATTERNS))
+
+
+class ChangeQueue:
+    """Paths that changed, released once none of them changed for `debounce` seconds."""
+
+    def __init__(self, debounce=DEBOUNCE_SECONDS):
+        self.debounce = debounce
+        self._paths = set()
+        self._last_change = None
+        self._cond = threading.Condition()
+
+    def touch(self, path):
+        with self._cond:
+            self._paths.add(os.path.abspath(path))
+            self._last_change = time.monotonic()
+            self._cond.notify_all()
+
+    def wait(self, timeout=None):
+        """Blocks until a quiet burst is ready; returns its paths (empty on timeout)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if self._paths and now - self._last_change >= self.debounce:
+                    paths, self._paths = self._paths, set()
+                    return paths
+                wait = None
+                if self._paths:
+                    wait = self._last_change + self.debounce - now
+                if deadline is not None:
+                    if now >= deadline:
+                        return set()
+                    wait = deadline - now if wait is None else min(wait, deadline - now)
+                self._cond.wait(wait)
+
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, queue):
+        super().__init__()
+        self.queue = queue
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        # Moves count for both ends: Excel renames its temp file over the workbook
+        for path in (event.src_path, getattr(event, 'dest_path', None)):
+            if is_watched(path):
+                self.queue.touch(path)
+
+
+class InotifyWatcher:
+    """watchdog observer (inotify on Linux, FSEvents/ReadDirectoryChangesW elsewhere)."""
+
+    def __init__(self, queue):
+        self.observer = Observer()
+        handler = _EventHandler(queue)
+        for d in watched_dirs():
+            self.observer.schedule(handler, d, recursive=False)
+
+    def start(self):
+        self.observer.start()
+
+    def stop(self):
+        self.observer.stop()
+        self.observer.join()
+
+
+class PollingWatcher:
+    """Compares (mtime, size) of the watched files every `interval` seconds."""
+
+    def __init__(self, queue, interval=POLL_INTERVAL):
+        self.queue = queue
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="watch-poll", daemon=True)
+        self._snapshot = self.snapshot()
+
+    @staticmethod
+    def snapshot():
+        files = {}
+        for d in watched_dirs():
+            with os.scandir(d) as entries:
+                for entry in entries:
+                    if entry.is_file() and is_watched(entry.path):
+                        st = entry.stat()
+                        files[os.path.abspath(entry.path)] = (st.st_mtime_ns, st.st_size)
+        return files
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                current = self.snapshot()
+            except OSError as e:  # e.g. the synced folder is briefly unavailable
+                print(f"⚠️ No se pudo revisar la carpeta: {e}")
+                continue
+            for path in set(current) | set(self._snapshot):
+                if current.get(path) != self._snapshot.get(path):
+                    self.queue.touch(path)
+            self._snapshot = current
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def make_watcher(queue, poll=False):
+    if Observer is not None and not poll:
+        return InotifyWatcher(queue)
+    return PollingWatcher(queue)
+
+
+def run_sync(options, changed=()):
+    """One sync run; errors are printed so the daemon keeps watching (the next change retries).
+
+    run_dag refuses to start while a stage of a failed run (e.g. an upload past its
+    timeout) is still running, so two runs never write or upload at the same time.
+    """
+    if changed:
+        print(f"\n📂 Cambios: {', '.join(sorted(os.path.basename(p) for p in changed))}")
+    report = RunReport("watch_sync")
+    try:
+        run_dag(build_stages(report=report, **options), on_stage_done=_stage_done)
+    except StageFailed as e:
+        print(f"❌ {e}")
+        return False
+    finally:
+        report.save()
+    print("✨ Sincronizado, esperando cambios...")
+    return True
+
+
+def watch(options, poll=False, debounce=DEBOUNCE_SECONDS, initial_sync=True):
+    """Runs forever (until Ctrl+C): one sync per debounced burst of changes."""
+    if not watched_dirs():
+        print(f"❌ No existe ninguna carpeta a vigilar ({process_data.MOVIMIENTOS_DIR})")
+        return
+    queue = ChangeQueue(debounce)
+    watcher = make_watcher(queue, poll)
+    mode = "polling" if isinstance(watcher, PollingWatcher) else "inotify"
+    print(f"👀 Vigilando {', '.join(watched_dirs())} ({mode}, debounce {debounce:.0f}s)")
+    watcher.start()
+    try:
+        if initial_sync:
+            # Catch up with whatever changed while the daemon was not running
+            run_sync(options)
+        while True:
+            changed = queue.wait()
+            if not run_sync(options, changed) and still_running():
+                # A stage of the failed run is still finishing: retry these files after it
+                for path in changed:
+                    queue.touch(path)
+    except KeyboardInterrupt:
+        print("\n👋 Watch mode detenido.")
+    finally:
+        watcher.stop()
+
+
+if __name__ == "__main__":
+    # --poll forces the polling watcher even when watchdog is installed
+    watch({
+        "write_parquet": "--parquet" in sys.argv,
+        "drop_duplicates": "--drop-duplicates" in sys.argv,
+        "drop_near_duplicates": "--drop-near-duplicates" in sys.argv,
+        "upload": "--no-upload" not in sys.argv,
+        "dry_run": "--dry-run" in sys.argv,
+        "all_excels": "--all-excels" in sys.argv,
+        "backend": sys.argv[sys.argv.index("--backend") + 1] if "--backend" in sys.argv else "partitions",
+    }, poll="--poll" in sys.argv)